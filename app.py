@@ -1,94 +1,93 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
-import json
-import pandas as pd
-import numpy as np
 import os
+from batch_scoring import parse_batch_body, score_batch
+from model_loader import ModelRegistry, MODEL_WATCH_INTERVAL, admin_token_ok
+from prediction_cache import PredictionCache
+from stage_metrics import StageMetrics
+from app_logging import get_logger
+from fast_json import use_fast_json, json_response, dumps, now_iso
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+use_fast_json(app)
+logger = get_logger('app')
 
-# Global variables for model and features
-model = None
-selected_features = []
+# Global model state (model, features, encoder and version live in one swappable bundle)
+registry = ModelRegistry()
+prediction_cache = PredictionCache()
+latency = StageMetrics()
+
+# Cached predictions belong to the previous model
+registry.on_swap(lambda bundle: prediction_cache.clear())
+
+# Map frontend fields to model features (you'll need to adjust this);
+# /predict and /predict/batch both take the frontend names
+FEATURE_MAPPING = {
+    'loanUsage': 'Loan_usage',
+    'country': 'country', 
+    'daysActive': 'number_day/day',
+    'fundedLoans': 'number_fund_loan',
+    'managementScore': 'managingday/day_score',
+    'dailyActivity': 'manager_day/day'
+}
+
+def frontend_to_model(data):
+    """Rename the frontend fields present in data to model feature names"""
+    return {model_feature: data[frontend_key]
+            for frontend_key, model_feature in FEATURE_MAPPING.items() if frontend_key in data}
 
 def load_model():
     """Load the trained model and feature list"""
-    global model, selected_features
-    
     try:
-        # Load model
-        model_path = os.path.join('models', 'financial_risk_model.pkl')
-        model = joblib.load(model_path)
-        print("✅ Model loaded successfully")
-        
-        # Load feature configuration
-        features_path = os.path.join('models', 'selected_features.json')
-        with open(features_path, 'r') as f:
-            feature_config = json.load(f)
-            selected_features = feature_config.get('selected_features', [])
-        print("✅ Features loaded successfully")
-        print(f"📊 Model expects {len(selected_features)} features: {selected_features}")
+        bundle = registry.reload()
+        logger.info("✅ Model loaded successfully")
+        logger.info("✅ Features loaded successfully")
+        logger.info("📊 Model expects %d features: %s", len(bundle.selected_features), bundle.selected_features)
         
         return True
     except Exception as e:
-        print(f"❌ Error loading model: {e}")
+        logger.error("❌ Error loading model: %s", e)
         return False
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    bundle = registry.current()
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None,
-        'features_loaded': len(selected_features) > 0
+        'model_loaded': bundle is not None,
+        'features_loaded': bundle is not None and len(bundle.selected_features) > 0,
+        'model_version': bundle.version if bundle else None
     })
 
 @app.route('/predict', methods=['POST'])
 def predict_risk():
     """Predict financial risk based on input features"""
     try:
-        if model is None:
+        stopwatch = latency.stopwatch()
+        
+        # Use one bundle for the whole request, even if a reload happens meanwhile
+        bundle = registry.current()
+        if bundle is None:
             return jsonify({'error': 'Model not loaded'}), 500
         
         # Get JSON data from request
         data = request.get_json()
+        stopwatch.lap('parse')
         
-        # Extract features (this will need to match your model's expected features)
-        input_features = {}
-        
-        # Map frontend fields to model features (you'll need to adjust this)
-        feature_mapping = {
-            'loanUsage': 'Loan_usage',
-            'country': 'country', 
-            'daysActive': 'number_day/day',
-            'fundedLoans': 'number_fund_loan',
-            'managementScore': 'managingday/day_score',
-            'dailyActivity': 'manager_day/day'
-        }
+        # Encode the frontend fields like /predict/batch does (missing features are 0)
+        feature_vector, missing_features = bundle.encoder.encode(frontend_to_model(data))
+        features_array = feature_vector.reshape(1, -1)
+        stopwatch.lap('encode')
         
-        # Create feature vector
-        feature_vector = []
-        for feature in selected_features:
-            # Try to map from frontend input
-            frontend_field = None
-            for frontend_key, model_feature in feature_mapping.items():
-                if model_feature == feature:
-                    frontend_field = frontend_key
-                    break
-            
-            if frontend_field and frontend_field in data:
-                feature_vector.append(data[frontend_field])
-            else:
-                # If feature not provided, use default (you might want to handle this differently)
-                feature_vector.append(0)
-        
-        # Convert to numpy array and reshape for prediction
-        features_array = np.array(feature_vector).reshape(1, -1)
-        
-        # Make prediction
-        risk_probability = model.predict_proba(features_array)[0][1]  # Probability of class 1 (risky)
+        # Make prediction (or reuse it for a resubmitted profile)
+        cache_key = PredictionCache.make_key(features_array, bundle.generation)
+        risk_probability = prediction_cache.get(cache_key)
+        if risk_probability is None:
+            risk_probability = bundle.model.predict_proba(features_array)[0][1]  # Probability of class 1 (risky)
+            prediction_cache.put(cache_key, risk_probability)
+        stopwatch.lap('inference')
         
         # Determine risk level
         if risk_probability < 0.3:
@@ -99,37 +98,100 @@ def predict_risk():
             risk_level = 'High'
         else:
             risk_level = 'Critical'
+        stopwatch.lap('bucket')
         
-        return jsonify({
+        response = json_response(app, dumps({
             'riskScore': round(risk_probability, 4),
             'riskLevel': risk_level,
             'confidence': round(risk_probability * 100, 2),
-            'featuresUsed': selected_features,
-            'timestamp': pd.Timestamp.now().isoformat()
-        })
+            'featuresUsed': bundle.selected_features,
+            'timestamp': now_iso()
+        }))
+        stopwatch.lap('serialize')
+        stopwatch.total()
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Score many applicants (JSON array or NDJSON body) with one model call"""
+    try:
+        stopwatch = latency.stopwatch()
+        bundle = registry.current()
+        if bundle is None:
+            return jsonify({'error': 'Model not loaded'}), 500
+
+        try:
+            records, errors = parse_batch_body(request.get_data(), request.content_type or '')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        stopwatch.lap('batch_parse')
+
+        # Same frontend field names as /predict
+        records = [frontend_to_model(r) if isinstance(r, dict) else r for r in records]
+        results = score_batch(bundle.model, bundle.encoder, records, errors)
+        stopwatch.lap('batch_score')
+
+        response = json_response(app, dumps({
+            'results': results,
+            'count': len(results),
+            'failed': sum(1 for r in results if 'error' in r),
+            'timestamp': now_iso()
+        }))
+        stopwatch.lap('batch_serialize')
+        stopwatch.total('batch_total')
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency and prediction cache counters"""
+    return jsonify({
+        'latency': latency.stats(),
+        'prediction_cache': prediction_cache.stats()
+    })
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Load, validate and atomically swap in the model files on disk"""
+    if not admin_token_ok(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        bundle = registry.reload()
+    except Exception as e:
+        return jsonify({'error': f'Reload failed, keeping current model: {e}'}), 500
+    
+    return jsonify({'message': 'Model reloaded', 'model_version': bundle.version})
+
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
-    if model is None:
+    bundle = registry.current()
+    if bundle is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
+    model = bundle.model
     return jsonify({
         'model_type': str(type(model)),
-        'features_count': len(selected_features),
-        'features': selected_features,
+        'model_version': bundle.version,
+        'features_count': len(bundle.selected_features),
+        'features': bundle.selected_features,
         'model_params': model.get_params() if hasattr(model, 'get_params') else 'Not available'
     })
 
 if __name__ == '__main__':
-    print("🚀 Starting Financial Risk API Server...")
+    logger.info("🚀 Starting Financial Risk API Server...")
     
     # Load model on startup
     if load_model():
-        print("📊 Model loaded successfully!")
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        logger.info("📊 Model loaded successfully!")
+        if MODEL_WATCH_INTERVAL > 0:
+            registry.watch(MODEL_WATCH_INTERVAL)
+        app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=os.getenv('FLASK_DEBUG', '1') == '1')
     else:
-        print("❌ Failed to load model. Please check your model files.")
+        logger.error("❌ Failed to load model. Please check your model files.")
@@ -1,117 +1,112 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
-import json
-import pandas as pd
 import numpy as np
 import os
+from batch_scoring import parse_batch_body, score_batch
+from model_loader import ModelRegistry, MODEL_WATCH_INTERVAL, admin_token_ok
+from prediction_cache import PredictionCache
+from micro_batcher import MicroBatcher
+from stage_metrics import StageMetrics
+from app_logging import get_logger
+from fast_json import use_fast_json, json_response, dumps, now_iso
 
 app = Flask(__name__)
 CORS(app)
+use_fast_json(app)
+logger = get_logger('app_complete')
 
-# Global variables
-model = None
-selected_features = []
+# Global variables (model, features, encoder and version live in one swappable bundle)
+registry = ModelRegistry()
+prediction_cache = PredictionCache()
+latency = StageMetrics()
+batcher = None
+
+# Cached predictions belong to the previous model
+registry.on_swap(lambda bundle: prediction_cache.clear())
+
+# Micro-batching of concurrent /predict calls (set MICRO_BATCH_MAX_SIZE=1 to disable)
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '32'))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '2'))
+
+def score_matrix(features_array, model):
+    """Probability of class 1 (risky) for every row of a feature matrix"""
+    return model.predict_proba(features_array)[:, 1]
+
+def start_batcher():
+    """Start the request coalescer used by /predict"""
+    global batcher
+    if batcher is None and MICRO_BATCH_MAX_SIZE > 1:
+        batcher = MicroBatcher(score_matrix, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS)
+        logger.info("🧺 Micro-batching enabled (max %d rows / %s ms)", MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS)
 
 def load_model():
     """Load the trained model and feature list"""
-    global model, selected_features
-    
     try:
-        # Load model
-        model_path = os.path.join('models', 'financial_risk_model.pkl')
-        model = joblib.load(model_path)
-        print("✅ Model loaded successfully")
-        
-        # Load feature configuration
-        features_path = os.path.join('models', 'selected_features.json')
-        with open(features_path, 'r') as f:
-            feature_config = json.load(f)
-            selected_features = feature_config.get('selected_features', [])
-        print("✅ Features loaded successfully")
-        print(f"📊 Model expects {len(selected_features)} features")
+        bundle = registry.reload()
+        logger.info("✅ Model loaded successfully")
+        logger.info("✅ Features loaded successfully")
+        logger.info("📊 Model expects %d features", len(bundle.selected_features))
         
+        start_batcher()
         return True
     except Exception as e:
-        print(f"❌ Error loading model: {e}")
+        logger.error("❌ Error loading model: %s", e)
         return False
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    bundle = registry.current()
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None,
-        'features_loaded': len(selected_features) > 0,
-        'required_features': selected_features
+        'model_loaded': bundle is not None,
+        'features_loaded': bundle is not None and len(bundle.selected_features) > 0,
+        'required_features': bundle.selected_features if bundle else [],
+        'model_version': bundle.version if bundle else None
     })
 
 @app.route('/predict', methods=['POST'])
 def predict_risk():
     try:
-        if model is None:
+        stopwatch = latency.stopwatch()
+        
+        # Use one bundle for the whole request, even if a reload happens meanwhile
+        bundle = registry.current()
+        if bundle is None:
             return jsonify({'error': 'Model not loaded'}), 500
         
         # Get JSON data from request
         data = request.get_json()
-        print("📥 Received data with keys:", list(data.keys()))
+        stopwatch.lap('parse')
+        logger.debug("📥 Received data with keys: %s", list(data.keys()))
         
         # Create feature vector in exact order expected by model
-        feature_vector = []
-        missing_features = []
-        
-        for feature in selected_features:
-            if feature in data:
-                # Convert categorical features to numerical if needed
-                value = data[feature]
-                
-                # Handle specific categorical conversions
-                if feature == 'Loan_usage' and isinstance(value, str):
-                    usage_map = {'Personal': 1, 'Business': 2, 'Education': 3, 'Emergency': 4, 'Other': 5}
-                    value = usage_map.get(value, 0)
-                
-                elif feature == 'county' and isinstance(value, str):
-                    county_map = {'Nairobi': 1, 'Mombasa': 2, 'Kisumu': 3, 'Nakuru': 4, 'Eldoret': 5, 'Other': 6}
-                    value = county_map.get(value, 0)
-                
-                elif feature == 'Sex' and isinstance(value, str):
-                    value = 1 if value == 'Male' else 2
-                
-                elif feature == 'Marital' and isinstance(value, str):
-                    marital_map = {'Single': 1, 'Married': 2, 'Divorced': 3, 'Widowed': 4}
-                    value = marital_map.get(value, 0)
-                
-                elif feature == 'Education' and isinstance(value, str):
-                    education_map = {'Primary': 1, 'Secondary': 2, 'College': 3, 'University': 4, 'Postgraduate': 5}
-                    value = education_map.get(value, 0)
-                
-                elif feature == 'financial_status' and isinstance(value, str):
-                    status_map = {'Poor': 1, 'Fair': 2, 'Good': 3, 'Excellent': 4}
-                    value = status_map.get(value, 0)
-                
-                feature_vector.append(float(value))
-            else:
-                missing_features.append(feature)
-                # Use safe default for missing features
-                feature_vector.append(0.0)
+        feature_vector, missing_features = bundle.encoder.encode(data)
+        stopwatch.lap('encode')
         
         if missing_features:
-            print(f"⚠️ Missing features: {missing_features}")
-        
-        print(f"📊 Feature vector created: {len(feature_vector)} values")
+            logger.debug("⚠️ Missing features: %s", missing_features)
         
-        # Convert to numpy array and reshape for prediction
-        features_array = np.array(feature_vector).reshape(1, -1)
-        
-        # Make prediction
+        # Make prediction (coalesced with concurrent requests when batching is on)
         try:
-            risk_probability = model.predict_proba(features_array)[0][1]  # Probability of class 1 (risky)
-            print(f"🎯 Model prediction: {risk_probability:.4f}")
+            cache_key = PredictionCache.make_key(feature_vector, bundle.generation)
+            risk_probability = prediction_cache.get(cache_key)
+            if risk_probability is not None:
+                logger.debug("🎯 Cached prediction: %.4f", risk_probability)
+            else:
+                if batcher is not None:
+                    risk_probability = batcher.submit(feature_vector, bundle.model)
+                else:
+                    features_array = np.array(feature_vector).reshape(1, -1)
+                    risk_probability = score_matrix(features_array, bundle.model)[0]
+                prediction_cache.put(cache_key, risk_probability)
+                logger.debug("🎯 Model prediction: %.4f", risk_probability)
         except Exception as e:
-            print(f"❌ Prediction error: {e}")
+            logger.error("❌ Prediction error: %s", e)
             # Fallback to simple heuristic
             management_score = data.get('managingday2day_score', 50)
             risk_probability = 0.3 + (100 - management_score) * 0.005
             risk_probability = min(risk_probability, 0.95)
+        stopwatch.lap('inference')
         
         # Determine risk level
         if risk_probability < 0.3:
@@ -122,37 +117,106 @@ def predict_risk():
             risk_level = 'High'
         else:
             risk_level = 'Critical'
+        stopwatch.lap('bucket')
         
-        return jsonify({
+        response = json_response(app, dumps({
             'riskScore': round(risk_probability, 4),
             'riskLevel': risk_level,
             'confidence': round(risk_probability * 100, 2),
             'featuresUsed': len(feature_vector),
             'missingFeatures': missing_features,
-            'timestamp': pd.Timestamp.now().isoformat()
-        })
+            'timestamp': now_iso()
+        }))
+        stopwatch.lap('serialize')
+        stopwatch.total()
+        return response
         
     except Exception as e:
-        print(f"❌ Overall error: {e}")
+        logger.error("❌ Overall error: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Score many applicants (JSON array or NDJSON body) with one model call"""
+    try:
+        stopwatch = latency.stopwatch()
+        bundle = registry.current()
+        if bundle is None:
+            return jsonify({'error': 'Model not loaded'}), 500
+
+        try:
+            records, errors = parse_batch_body(request.get_data(), request.content_type or '')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        stopwatch.lap('batch_parse')
+
+        logger.debug("📥 Received batch with %d applicants", len(records))
+        results = score_batch(bundle.model, bundle.encoder, records, errors)
+        stopwatch.lap('batch_score')
+        failed = sum(1 for r in results if 'error' in r)
+        if failed:
+            logger.debug("⚠️ %d applicants could not be scored", failed)
+
+        response = json_response(app, dumps({
+            'results': results,
+            'count': len(results),
+            'failed': failed,
+            'timestamp': now_iso()
+        }))
+        stopwatch.lap('batch_serialize')
+        stopwatch.total('batch_total')
+        return response
+
+    except Exception as e:
+        logger.error("❌ Batch prediction error: %s", e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency, micro-batching and prediction cache metrics"""
+    return jsonify({
+        'latency': latency.stats(),
+        'micro_batcher': batcher.stats() if batcher is not None else None,
+        'prediction_cache': prediction_cache.stats()
+    })
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Load, validate and atomically swap in the model files on disk"""
+    if not admin_token_ok(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        bundle = registry.reload()
+    except Exception as e:
+        logger.error("❌ Model reload failed, keeping current model: %s", e)
+        return jsonify({'error': f'Reload failed, keeping current model: {e}'}), 500
+    
+    logger.info("🔄 Model reloaded (version %s)", bundle.version)
+    return jsonify({'message': 'Model reloaded', 'model_version': bundle.version})
+
 @app.route('/model-info', methods=['GET'])
 def model_info():
-    if model is None:
+    bundle = registry.current()
+    if bundle is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
     return jsonify({
-        'model_type': str(type(model)),
-        'features_count': len(selected_features),
-        'features': selected_features
+        'model_type': str(type(bundle.model)),
+        'model_version': bundle.version,
+        'features_count': len(bundle.selected_features),
+        'features': bundle.selected_features
     })
 
 if __name__ == '__main__':
-    print("🚀 Starting Complete Financial Risk API Server...")
+    logger.info("🚀 Starting Complete Financial Risk API Server...")
     
     # Load model on startup
     if load_model():
-        print("📊 Model loaded successfully!")
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        logger.info("📊 Model loaded successfully!")
+        if MODEL_WATCH_INTERVAL > 0:
+            registry.watch(MODEL_WATCH_INTERVAL)
+            logger.info("👀 Watching model files every %ss", MODEL_WATCH_INTERVAL)
+        app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=os.getenv('FLASK_DEBUG', '1') == '1')
     else:
-        print("❌ Failed to load model. Please check your model files.")
+        logger.error("❌ Failed to load model. Please check your model files.")
@@ -0,0 +1,60 @@
+"""Level-gated, buffered logging for the API servers.
+
+Log calls below LOG_LEVEL return straight away. Records that pass are
+handed to a queue and written to stdout by a background listener thread,
+so request threads never wait on console I/O. LOG_LEVEL=OFF silences
+everything.
+
+    LOG_LEVEL=DEBUG   per-request detail (received keys, predictions)
+    LOG_LEVEL=INFO    startup, reloads, warnings and errors (default)
+    LOG_LEVEL=OFF     nothing
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+_root = logging.getLogger('creditvision')
+_listener = None
+
+
+def _configure():
+    global _listener
+    _root.propagate = False
+    if LOG_LEVEL in ('OFF', 'NONE'):
+        _root.setLevel(logging.CRITICAL + 1)
+        _root.addHandler(logging.NullHandler())
+        return
+
+    _root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(logging.Formatter('%(message)s'))
+    _root.addHandler(logging.handlers.QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_listener.stop)
+    os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    """fork() doesn't copy the listener thread; give the child its own queue and listener"""
+    global _listener
+    records = queue.SimpleQueue()
+    for handler in _root.handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = records
+    _listener = logging.handlers.QueueListener(records, *_listener.handlers)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    if not _root.handlers:
+        _configure()
+    return _root.getChild(name)
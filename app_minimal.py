@@ -1,270 +1,349 @@
 import http.server
 import socketserver
-import json
 import sqlite3
-import hashlib
-import secrets
+import threading
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qs
 import os
+from password_hasher import password_hasher
+from fast_json import loads, dumps
+from token_auth import TokenSigner, bearer_token
+from prediction_log import PredictionLog
+from pending_registrations import ExpiringMap, Sweeper, new_pending_id, new_verification_code
 
-PORT = 5000
+PORT = int(os.getenv('PORT', '5000'))
 
 # Simple in-memory database (for demo - would use SQLite in production)
 users_db = {}
-predictions_db = []
+
+# Predictions are appended to segment files under PREDICTION_LOG_DIR and
+# replayed on startup; only the newest are kept in memory (see prediction_log.py)
+prediction_log = PredictionLog()
+
+# Secondary indexes into users_db, kept in sync by add_user
+users_by_email = {}
+users_by_phone = {}
+
+# Held while checking for a taken email/phone and adding the user, so two
+# verifications can't both pass the check (async_server runs handlers in threads)
+users_lock = threading.Lock()
+
+# Signups wait here until verified; only verified users enter users_db
+# (entries expire after PENDING_TTL_SECONDS and are swept in the background)
+pending_users = ExpiringMap()
+pending_sweeper = Sweeper(pending_users.sweep).start()
+
+# Access tokens are signed, so checking one needs no lookup (see token_auth.py)
+token_signer = TokenSigner()
+
+def add_user(user_id, user_data):
+    users_db[user_id] = user_data
+    users_by_email[user_data['email']] = user_id
+    users_by_phone[user_data['phone_number']] = user_id
+
+def user_for_token(token):
+    """User id owning a valid access token, or None"""
+    claims = token_signer.verify(token) if token else None
+    if claims is None or claims['sub'] not in users_db:
+        return None
+    return claims['sub']
+
+# Route handlers take the parsed JSON body and return (status, response).
+# They are shared by SimpleAuthAPI below and by async_server.py.
+
+def error_response(message):
+    return 400, {'error': message}
+
+def register_user(data):
+    try:
+        # Basic validation
+        required_fields = ['full_name', 'email', 'phone_number', 'verification_method']
+        for field in required_fields:
+            if field not in data:
+                return error_response(f'Missing field: {field}')
+
+        # Check if user already exists
+        if data['email'] in users_by_email:
+            return error_response('Email already registered')
+        if data['phone_number'] in users_by_phone:
+            return error_response('Phone number already registered')
+
+        # The user is added once the code is verified (the id carries over)
+        user_id = new_pending_id()
+        verification_code = new_verification_code()
+
+        pending_users.put(user_id, {
+            'full_name': data['full_name'],
+            'email': data['email'],
+            'phone_number': data['phone_number'],
+            'verification_method': data['verification_method'],
+            'verification_code': verification_code,
+            'created_at': datetime.now().isoformat()
+        })
+
+        # In a real app, you'd send email/SMS here
+        print(f"🔐 New user registered: {data['email']}")
+        print(f"📧 Verification code: {verification_code}")
+
+        return 200, {
+            'message': 'Registration successful. Please check your email/SMS for verification code.',
+            'user_id': user_id,
+            'verification_code': verification_code,  # Only for demo!
+            'requires_code_input': data['verification_method'] == 'sms'
+        }
+
+    except Exception as e:
+        return error_response(str(e))
+
+def verify_sms(data):
+    try:
+        user_id = data.get('user_id')
+        code = data.get('code')
+
+        pending = pending_users.get(user_id)
+        if pending is None:
+            return error_response('User not found')
+
+        if pending['verification_code'] != code:
+            return error_response('Invalid verification code')
+
+        with users_lock:
+            # Another signup may have verified this email or phone number first
+            if pending['email'] in users_by_email or pending['phone_number'] in users_by_phone:
+                pending_users.pop(user_id)
+                return error_response('Email or phone number already registered')
+
+            pending = pending_users.pop(user_id)
+            if pending is None:
+                return error_response('User not found')
+            del pending['verification_code']
+            add_user(user_id, dict(pending, verified=True, password_hash=None))
+        return 200, {'message': 'Phone verified successfully'}
+
+    except Exception as e:
+        return error_response(str(e))
+
+def check_new_password(data):
+    """Validate a set-password request: (error response, None) or (None, (user_id, password))"""
+    try:
+        user_id = data.get('user_id')
+        password = data.get('password')
+
+        if user_id not in users_db:
+            return error_response('User not found'), None
+
+        # Simple password validation
+        if len(password) < 8:
+            return error_response('Password must be at least 8 characters'), None
+
+        return None, (user_id, password)
+
+    except Exception as e:
+        return error_response(str(e)), None
+
+def store_password(user_id, password_hash):
+    users_db[user_id]['password_hash'] = password_hash
+    return 200, {'message': 'Password set successfully'}
+
+def set_password(data):
+    response, checked = check_new_password(data)
+    if response is not None:
+        return response
+    user_id, password = checked
+    try:
+        return store_password(user_id, password_hasher.hash(password))
+    except Exception as e:
+        return error_response(str(e))
+
+def find_login(data):
+    """Look up a login's user: (error response, None) or (None, (user_id, password, stored hash))"""
+    try:
+        email = data.get('email')
+        password = data.get('password')
+
+        # Find user by email
+        user_id = users_by_email.get(email)
+        if user_id is None:
+            return error_response('User not found'), None
+        return None, (user_id, password, users_db[user_id]['password_hash'])
+
+    except Exception as e:
+        return error_response(str(e)), None
+
+def finish_login(user_id, matches, new_hash):
+    """Response for a login once the password has been checked"""
+    if not matches:
+        return error_response('Invalid password')
+    user_data = users_db[user_id]
+    # Legacy SHA-256 hashes are upgraded on success
+    if new_hash:
+        user_data['password_hash'] = new_hash
+
+    if not user_data['verified']:
+        return error_response('Please verify your account first')
+
+    # Signed token carrying the user id; verified without a lookup
+    token = token_signer.issue(user_id)
+
+    return 200, {
+        'message': 'Login successful',
+        'access_token': token,
+        'user': {
+            'id': user_id,
+            'full_name': user_data['full_name'],
+            'email': user_data['email']
+        }
+    }
+
+def login_user(data):
+    response, found = find_login(data)
+    if response is not None:
+        return response
+    user_id, password, stored = found
+    try:
+        return finish_login(user_id, *password_hasher.verify(password, stored))
+    except Exception as e:
+        return error_response(str(e))
+
+def predict_risk(data):
+    try:
+        # Simple risk prediction based on management score
+        management_score = data.get('managingday2day_score', 50)
+
+        # Mock risk calculation
+        base_risk = 0.3
+        risk_adjustment = (100 - management_score) * 0.005
+        risk_score = min(base_risk + risk_adjustment, 0.95)
+
+        # Determine risk level
+        if risk_score < 0.3:
+            risk_level = 'Low'
+        elif risk_score < 0.6:
+            risk_level = 'Medium'
+        elif risk_score < 0.8:
+            risk_level = 'High'
+        else:
+            risk_level = 'Critical'
+
+        # Save prediction (the log assigns the id)
+        prediction = prediction_log.append({
+            'risk_score': risk_score,
+            'risk_level': risk_level,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        return 200, {
+            'riskScore': round(risk_score, 4),
+            'riskLevel': risk_level,
+            'confidence': round(risk_score * 100, 2),
+            'predictionId': prediction['id'],
+            'timestamp': prediction['timestamp']
+        }
+
+    except Exception as e:
+        return error_response(str(e))
+
+def get_me(token, data):
+    user_id = user_for_token(token)
+    if user_id is None:
+        return 401, {'error': 'Invalid or expired token'}
+    user_data = users_db[user_id]
+    return 200, {
+        'user': {
+            'id': user_id,
+            'full_name': user_data['full_name'],
+            'email': user_data['email'],
+            'phone_number': user_data['phone_number']
+        }
+    }
+
+def logout_user(token, data):
+    claims = token_signer.verify(token) if token else None
+    if claims is None:
+        return 401, {'error': 'Invalid or expired token'}
+    token_signer.revoke(claims)
+    return 200, {'message': 'Logged out'}
+
+def list_users():
+    users_list = [{'id': uid, **data} for uid, data in users_db.items()]
+    return 200, {'users': users_list}
+
+POST_ROUTES = {
+    '/api/auth/register': register_user,
+    '/api/auth/login': login_user,
+    '/api/predict': predict_risk,
+    '/api/auth/verify-sms': verify_sms,
+    '/api/auth/set-password': set_password
+}
+
+# Routes that need the bearer token: (method, path) -> handler(token, data)
+AUTH_ROUTES = {
+    ('GET', '/api/auth/me'): get_me,
+    ('POST', '/api/auth/logout'): logout_user
+}
 
 class SimpleAuthAPI(http.server.SimpleHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
         self.end_headers()
-    
+
     def do_GET(self):
         parsed_path = urlparse(self.path)
-        
-        if parsed_path.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            response = {'status': 'healthy', 'mode': 'minimal'}
-            self.wfile.write(json.dumps(response).encode())
-            
+
+        auth_handler = AUTH_ROUTES.get(('GET', parsed_path.path))
+        if auth_handler is not None:
+            self.send_json_response(*auth_handler(bearer_token(self.headers.get('Authorization')), {}))
+
+        elif parsed_path.path == '/health':
+            self.send_success_response({'status': 'healthy', 'mode': 'minimal'})
+
         elif parsed_path.path == '/api/admin/users':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            users_list = [{'id': uid, **data} for uid, data in users_db.items()]
-            self.wfile.write(json.dumps({'users': users_list}).encode())
-            
+            self.send_json_response(*list_users())
+
         else:
             super().do_GET()
-    
+
     def do_POST(self):
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length)
-        data = json.loads(post_data.decode('utf-8'))
-        
-        if self.path == '/api/auth/register':
-            self.handle_register(data)
-        elif self.path == '/api/auth/login':
-            self.handle_login(data)
-        elif self.path == '/api/predict':
-            self.handle_predict(data)
-        elif self.path == '/api/auth/verify-sms':
-            self.handle_verify_sms(data)
-        elif self.path == '/api/auth/set-password':
-            self.handle_set_password(data)
-        else:
+        data = loads(post_data) if post_data else {}
+
+        auth_handler = AUTH_ROUTES.get(('POST', self.path))
+        if auth_handler is not None:
+            self.send_json_response(*auth_handler(bearer_token(self.headers.get('Authorization')), data))
+            return
+
+        handler = POST_ROUTES.get(self.path)
+        if handler is None:
             self.send_error(404)
-    
-    def handle_register(self, data):
-        try:
-            # Basic validation
-            required_fields = ['full_name', 'email', 'phone_number', 'verification_method']
-            for field in required_fields:
-                if field not in data:
-                    self.send_error_response(f'Missing field: {field}')
-                    return
-            
-            # Check if user already exists
-            for user_id, user_data in users_db.items():
-                if user_data['email'] == data['email']:
-                    self.send_error_response('Email already registered')
-                    return
-                if user_data['phone_number'] == data['phone_number']:
-                    self.send_error_response('Phone number already registered')
-                    return
-            
-            # Create new user
-            user_id = secrets.token_hex(8)
-            verification_code = ''.join(secrets.choice('0123456789') for i in range(6))
-            
-            users_db[user_id] = {
-                'full_name': data['full_name'],
-                'email': data['email'],
-                'phone_number': data['phone_number'],
-                'verification_method': data['verification_method'],
-                'verification_code': verification_code,
-                'verified': False,
-                'password_hash': None,
-                'created_at': datetime.now().isoformat()
-            }
-            
-            # In a real app, you'd send email/SMS here
-            print(f"🔐 New user registered: {data['email']}")
-            print(f"📧 Verification code: {verification_code}")
-            
-            response = {
-                'message': 'Registration successful. Please check your email/SMS for verification code.',
-                'user_id': user_id,
-                'verification_code': verification_code,  # Only for demo!
-                'requires_code_input': data['verification_method'] == 'sms'
-            }
-            
-            self.send_success_response(response)
-            
-        except Exception as e:
-            self.send_error_response(str(e))
-    
-    def handle_verify_sms(self, data):
-        try:
-            user_id = data.get('user_id')
-            code = data.get('code')
-            
-            if user_id not in users_db:
-                self.send_error_response('User not found')
-                return
-            
-            user = users_db[user_id]
-            if user['verification_code'] == code:
-                user['verified'] = True
-                response = {'message': 'Phone verified successfully'}
-                self.send_success_response(response)
-            else:
-                self.send_error_response('Invalid verification code')
-                
-        except Exception as e:
-            self.send_error_response(str(e))
-    
-    def handle_set_password(self, data):
-        try:
-            user_id = data.get('user_id')
-            password = data.get('password')
-            
-            if user_id not in users_db:
-                self.send_error_response('User not found')
-                return
-            
-            # Simple password validation
-            if len(password) < 8:
-                self.send_error_response('Password must be at least 8 characters')
-                return
-            
-            # Hash password (simple demo hashing)
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            users_db[user_id]['password_hash'] = password_hash
-            
-            response = {'message': 'Password set successfully'}
-            self.send_success_response(response)
-            
-        except Exception as e:
-            self.send_error_response(str(e))
-    
-    def handle_login(self, data):
-        try:
-            email = data.get('email')
-            password = data.get('password')
-            
-            # Find user by email
-            user_id = None
-            user_data = None
-            for uid, data in users_db.items():
-                if data['email'] == email:
-                    user_id = uid
-                    user_data = data
-                    break
-            
-            if not user_id or not user_data:
-                self.send_error_response('User not found')
-                return
-            
-            # Check password
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            if user_data['password_hash'] != password_hash:
-                self.send_error_response('Invalid password')
-                return
-            
-            if not user_data['verified']:
-                self.send_error_response('Please verify your account first')
-                return
-            
-            # Create simple token (in real app, use JWT)
-            token = secrets.token_hex(16)
-            user_data['token'] = token
-            
-            response = {
-                'message': 'Login successful',
-                'access_token': token,
-                'user': {
-                    'id': user_id,
-                    'full_name': user_data['full_name'],
-                    'email': user_data['email']
-                }
-            }
-            
-            self.send_success_response(response)
-            
-        except Exception as e:
-            self.send_error_response(str(e))
-    
-    def handle_predict(self, data):
-        try:
-            # Simple risk prediction based on management score
-            management_score = data.get('managingday2day_score', 50)
-            
-            # Mock risk calculation
-            base_risk = 0.3
-            risk_adjustment = (100 - management_score) * 0.005
-            risk_score = min(base_risk + risk_adjustment, 0.95)
-            
-            # Determine risk level
-            if risk_score < 0.3:
-                risk_level = 'Low'
-            elif risk_score < 0.6:
-                risk_level = 'Medium'
-            elif risk_score < 0.8:
-                risk_level = 'High'
-            else:
-                risk_level = 'Critical'
-            
-            # Save prediction
-            prediction_id = len(predictions_db) + 1
-            predictions_db.append({
-                'id': prediction_id,
-                'risk_score': risk_score,
-                'risk_level': risk_level,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            response = {
-                'riskScore': round(risk_score, 4),
-                'riskLevel': risk_level,
-                'confidence': round(risk_score * 100, 2),
-                'predictionId': prediction_id,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            self.send_success_response(response)
-            
-        except Exception as e:
-            self.send_error_response(str(e))
-    
-    def send_success_response(self, data):
-        self.send_response(200)
+            return
+
+        self.send_json_response(*handler(data))
+
+    def send_json_response(self, status, data):
+        self.send_response(status)
         self.send_header('Content-type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
-    
+        self.wfile.write(dumps(data))
+
+    def send_success_response(self, data):
+        self.send_json_response(200, data)
+
     def send_error_response(self, message):
-        self.send_response(400)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps({'error': message}).encode())
+        self.send_json_response(400, {'error': message})
 
-print(f"🚀 Starting Minimal Financial Risk API on port {PORT}")
-print("🔐 Authentication: Enabled (in-memory)")
-print("📊 Predictions: Mock system")
-print(f"🔗 Access at: http://localhost:{PORT}")
+if __name__ == '__main__':
+    print(f"🚀 Starting Minimal Financial Risk API on port {PORT}")
+    print("🔐 Authentication: Enabled (in-memory)")
+    print("📊 Predictions: Mock system")
+    print(f"🔗 Access at: http://localhost:{PORT}")
 
-with socketserver.TCPServer(("", PORT), SimpleAuthAPI) as httpd:
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\n🛑 Server stopped")
+    with socketserver.TCPServer(("", PORT), SimpleAuthAPI) as httpd:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Server stopped")
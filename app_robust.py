@@ -1,61 +1,84 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
-import pandas as pd
 import numpy as np
 import os
 import sys
+from itertools import chain
+from feature_encoder import FeatureEncoder
+from batch_scoring import parse_batch_body, risk_levels_for
+from model_loader import load_inference_model, MODEL_PATH, NATIVE_MODEL_PATH, NATIVE_MODEL_DIR, FEATURES_PATH
+from stage_metrics import StageMetrics
+from app_logging import get_logger
+from fast_json import use_fast_json, json_response, dumps, now_iso
 
 app = Flask(__name__)
 CORS(app)
+use_fast_json(app)
+logger = get_logger('app_robust')
 
 # Global variables
 selected_features = []
 model_loaded = False
+encoder = None
+latency = StageMetrics()
+
+# Value types the fallback scorer accepts (bool is what JSON true/false decode to)
+NUMERIC_TYPES = {int, float, bool}
 
 def load_model():
     """Try to load model, but provide graceful fallback"""
-    global selected_features, model_loaded
+    global selected_features, model_loaded, encoder
     
     try:
-        # Try to import joblib and load model
-        import joblib
-        model_path = os.path.join('models', 'financial_risk_model.pkl')
-        
         # Check if model file exists
-        if not os.path.exists(model_path):
-            print("❌ Model file not found")
+        if not any(os.path.exists(p) for p in (MODEL_PATH, NATIVE_MODEL_PATH, NATIVE_MODEL_DIR)):
+            logger.error("❌ Model file not found")
             return False
             
-        # Try to load the model
-        model = joblib.load(model_path)
-        print("✅ Model loaded successfully with joblib")
+        # Try to load the model (sklearn pickle or native engine, see model_loader.py)
+        model = load_inference_model()
+        logger.info("✅ Model loaded successfully")
         model_loaded = True
         
     except Exception as e:
-        print(f"⚠️ Model loading failed: {e}")
-        print("🔧 Using advanced mock prediction system")
+        logger.warning("⚠️ Model loading failed: %s", e)
+        logger.info("🔧 Using advanced mock prediction system")
         model_loaded = False
     
     try:
         # Load feature configuration
-        features_path = os.path.join('models', 'selected_features.json')
-        with open(features_path, 'r') as f:
+        with open(FEATURES_PATH, 'r') as f:
             feature_config = json.load(f)
             selected_features = feature_config.get('selected_features', [])
-        print("✅ Features loaded successfully")
-        print(f"📊 Model expects {len(selected_features)} features")
+        encoder = FeatureEncoder(selected_features)
+        logger.info("✅ Features loaded successfully")
+        logger.info("📊 Model expects %d features", len(selected_features))
         return True
     except Exception as e:
-        print(f"❌ Error loading features: {e}")
+        logger.error("❌ Error loading features: %s", e)
         return False
 
 class AdvancedRiskPredictor:
     """Advanced mock predictor that mimics real model behavior"""
     
+    # feature -> (offset, divisor, cap, scale); every feature contributes
+    # (offset - min(value / divisor, cap)) * scale * weight
+    FEATURE_TRANSFORMS = {
+        'managingday2day_score': (100, 1, np.inf, 0.005),
+        'manage_day2day': (10, 1, 10, 0.03),
+        'tot_savings': (1, 5000, 1, 0.4),
+        'Financial_literacy_index_fnl': (100, 1, np.inf, 0.004),
+        'financial_status': (4, 1, np.inf, 0.1),
+        'Age': (1, 60, 1, 0.2),
+    }
+    # Everything else contributes value * 0.01 * weight
+    DEFAULT_TRANSFORM = (0, 1, np.inf, -0.01)
+    
     def __init__(self, feature_names):
         self.feature_names = feature_names
         self.feature_weights = self._calculate_feature_weights()
+        self._compile()
     
     def _calculate_feature_weights(self):
         """Calculate realistic weights based on feature importance"""
@@ -84,6 +107,62 @@ class AdvancedRiskPredictor:
             
         return weights
     
+    def _compile(self):
+        """Turn the per-feature weights and transforms into arrays (batches) and a flat plan (single rows)"""
+        transforms = np.array([self.FEATURE_TRANSFORMS.get(f, self.DEFAULT_TRANSFORM) for f in self.feature_names],
+                              dtype=np.float64).reshape(-1, 4)
+        self.offsets, self.divisors, self.caps, self.scales = (transforms[:, i].reshape(1, -1) for i in range(4))
+        self.weights = np.array([self.feature_weights[f] for f in self.feature_names], dtype=np.float64).reshape(1, -1)
+        # divisor is None where there is no cap, so predict() can skip the min()
+        self._plan = [
+            (feature, offset, divisor if cap != np.inf else None, cap, scale, weight)
+            for feature, (offset, divisor, cap, scale), weight
+            in zip(self.feature_names, transforms.tolist(), self.weights[0].tolist())
+        ]
+    
+    def to_matrix(self, records, errors=None):
+        """(N, F) float64 matrix of the records' feature values, NaN where absent.
+        
+        Non-numeric values raise TypeError, or, when an `errors` dict is
+        passed, are recorded there by row index and leave that row empty.
+        """
+        rows = [[record.get(f, np.nan) for f in self.feature_names] if isinstance(record, dict) else []
+                for record in records]
+        if not set(map(type, chain.from_iterable(rows))) <= NUMERIC_TYPES:
+            for i, row in enumerate(rows):
+                bad = next((f for f, v in zip(self.feature_names, row) if type(v) not in NUMERIC_TYPES), None)
+                if bad is None:
+                    continue
+                message = f"Feature '{bad}' must be numeric"
+                if errors is None:
+                    raise TypeError(message)
+                errors.setdefault(i, message)
+        empty = [np.nan] * len(self.feature_names)
+        for i in errors or ():
+            rows[i] = empty
+        return np.array(rows, dtype=np.float64).reshape(len(records), len(self.feature_names))
+    
+    def predict_matrix(self, matrix):
+        """Risk scores for an (N, F) matrix, NaN marking absent features"""
+        if matrix.shape[1] == 0:
+            return np.full(len(matrix), 0.3)
+        present = ~np.isnan(matrix)
+        contributions = np.where(
+            present, (self.offsets - np.minimum(matrix / self.divisors, self.caps)) * self.scales * self.weights, 0.0
+        )
+        applied_weights = np.where(present, self.weights, 0.0)
+        
+        # cumsum adds left to right like predict() does, so both give identical scores
+        weighted_contributions = np.cumsum(contributions, axis=1)[:, -1]
+        total_applied_weight = np.cumsum(applied_weights, axis=1)[:, -1]
+        
+        base_risk = np.full(len(matrix), 0.3)
+        scored = total_applied_weight > 0
+        base_risk[scored] += weighted_contributions[scored] / total_applied_weight[scored]
+        
+        # Ensure reasonable bounds
+        return np.clip(base_risk, 0.05, 0.95)
+    
     def predict(self, feature_data):
         """Generate realistic risk prediction based on feature weights"""
         base_risk = 0.3
@@ -92,65 +171,31 @@ class AdvancedRiskPredictor:
         weighted_contributions = 0
         total_applied_weight = 0
         
-        for i, feature in enumerate(self.feature_names):
+        for feature, offset, divisor, cap, scale, weight in self._plan:
             if feature in feature_data:
                 value = feature_data[feature]
-                weight = self.feature_weights[feature]
-                
-                # Normalize and scale contributions
-                if feature == 'managingday2day_score':
-                    contribution = (100 - value) * 0.005 * weight
-                elif feature == 'manage_day2day':
-                    contribution = (10 - min(value, 10)) * 0.03 * weight
-                elif feature == 'tot_savings':
-                    contribution = (1 - min(value / 5000, 1)) * 0.4 * weight
-                elif feature == 'Financial_literacy_index_fnl':
-                    contribution = (100 - value) * 0.004 * weight
-                elif feature == 'financial_status':
-                    contribution = (4 - value) * 0.1 * weight
-                elif feature == 'Age':
-                    contribution = (1 - min(value / 60, 1)) * 0.2 * weight
-                else:
-                    contribution = value * 0.01 * weight
-                
-                weighted_contributions += contribution
+                if divisor is not None:
+                    value = min(value / divisor, cap)
+                weighted_contributions += (offset - value) * scale * weight
                 total_applied_weight += weight
         
         if total_applied_weight > 0:
             base_risk += weighted_contributions / total_applied_weight
         
         # Ensure reasonable bounds
-        risk_score = max(0.05, min(0.95, base_risk))
-        
-        return risk_score
-
-def convert_to_numerical(key, value):
-    """Convert categorical values to numerical for processing"""
-    if isinstance(value, str):
-        if key == 'Loan_usage':
-            mapping = {'Personal': 1, 'Business': 2, 'Education': 3, 'Emergency': 4, 'Other': 5}
-            return mapping.get(value, 0)
-        elif key == 'county':
-            mapping = {'Nairobi': 1, 'Mombasa': 2, 'Kisumu': 3, 'Nakuru': 4, 'Eldoret': 5, 'Other': 6}
-            return mapping.get(value, 0)
-        elif key == 'Sex':
-            return 1 if value == 'Male' else 2
-        elif key == 'Marital':
-            mapping = {'Single': 1, 'Married': 2, 'Divorced': 3, 'Widowed': 4}
-            return mapping.get(value, 0)
-        elif key == 'Education':
-            mapping = {'Primary': 1, 'Secondary': 2, 'College': 3, 'University': 4, 'Postgraduate': 5}
-            return mapping.get(value, 0)
-        elif key == 'financial_status':
-            mapping = {'Poor': 1, 'Fair': 2, 'Good': 3, 'Excellent': 4}
-            return mapping.get(value, 0)
-        elif key == 'Quintiles':
-            return int(value) if value.isdigit() else 3
-    return value
+        return max(0.05, min(0.95, base_risk))
 
 # Initialize predictor
 predictor = None
 
+def get_predictor():
+    """Build the fallback predictor on first use"""
+    global predictor
+    if predictor is None and selected_features:
+        predictor = AdvancedRiskPredictor(selected_features)
+        logger.info("🎯 Advanced predictor initialized")
+    return predictor
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -164,20 +209,18 @@ def health_check():
 @app.route('/predict', methods=['POST'])
 def predict_risk():
     try:
+        stopwatch = latency.stopwatch()
+        
         # Get JSON data from request
         data = request.get_json()
-        print("📥 Received data with keys:", list(data.keys()))
+        stopwatch.lap('parse')
+        logger.debug("📥 Received data with keys: %s", list(data.keys()))
         
-        # Initialize predictor if not done
-        global predictor
-        if predictor is None and selected_features:
-            predictor = AdvancedRiskPredictor(selected_features)
-            print("🎯 Advanced predictor initialized")
+        predictor = get_predictor()
         
         # Convert categorical data to numerical
-        processed_data = {}
-        for key, value in data.items():
-            processed_data[key] = convert_to_numerical(key, value)
+        processed_data = {key: encoder.convert(key, value) for key, value in data.items()}
+        stopwatch.lap('encode')
         
         # Generate prediction
         if model_loaded:
@@ -186,8 +229,9 @@ def predict_risk():
         else:
             # Use advanced mock prediction
             risk_probability = predictor.predict(processed_data)
+        stopwatch.lap('inference')
         
-        print(f"🎯 Predicted risk: {risk_probability:.4f}")
+        logger.debug("🎯 Predicted risk: %.4f", risk_probability)
         
         # Determine risk level
         if risk_probability < 0.3:
@@ -198,21 +242,90 @@ def predict_risk():
             risk_level = 'High'
         else:
             risk_level = 'Critical'
+        stopwatch.lap('bucket')
         
-        return jsonify({
+        response = json_response(app, dumps({
             'riskScore': round(risk_probability, 4),
             'riskLevel': risk_level,
             'confidence': round(risk_probability * 100, 2),
             'featuresUsed': len(selected_features),
             'predictionMode': 'advanced_mock',
-            'timestamp': pd.Timestamp.now().isoformat(),
+            'timestamp': now_iso(),
             'note': 'Using advanced mock prediction - model compatibility issue'
-        })
+        }))
+        stopwatch.lap('serialize')
+        stopwatch.total()
+        return response
         
     except Exception as e:
-        print(f"❌ Prediction error: {e}")
+        logger.error("❌ Prediction error: %s", e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Score many applicants (JSON array or NDJSON body) in one predict_matrix call"""
+    try:
+        stopwatch = latency.stopwatch()
+        predictor = get_predictor()
+        if predictor is None:
+            return jsonify({'error': 'Features not loaded'}), 500
+        
+        try:
+            records, errors = parse_batch_body(request.get_data(), request.content_type or '')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        stopwatch.lap('batch_parse')
+        
+        processed = [
+            {key: encoder.convert(key, value) for key, value in record.items()} if i not in errors else None
+            for i, record in enumerate(records)
+        ]
+        matrix = predictor.to_matrix(processed, errors)
+        if model_loaded:
+            # Same placeholder as /predict while the real model isn't wired in
+            probabilities = np.full(len(records), 0.5)
+        else:
+            probabilities = predictor.predict_matrix(matrix)
+        levels = risk_levels_for(probabilities)
+        absent = np.isnan(matrix)
+        
+        results = []
+        for i in range(len(records)):
+            if i in errors:
+                results.append({'index': i, 'error': errors[i]})
+                continue
+            risk_probability = float(probabilities[i])
+            results.append({
+                'index': i,
+                'riskScore': round(risk_probability, 4),
+                'riskLevel': str(levels[i]),
+                'confidence': round(risk_probability * 100, 2),
+                'missingFeatures': [f for f, missing in zip(selected_features, absent[i]) if missing]
+            })
+        stopwatch.lap('batch_score')
+        
+        response = json_response(app, dumps({
+            'results': results,
+            'count': len(results),
+            'failed': len(errors),
+            'predictionMode': 'advanced_mock',
+            'timestamp': now_iso()
+        }))
+        stopwatch.lap('batch_serialize')
+        stopwatch.total('batch_total')
+        return response
+        
+    except Exception as e:
+        logger.error("❌ Batch prediction error: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency of /predict"""
+    return jsonify({
+        'latency': latency.stats()
+    })
+
 @app.route('/model-info', methods=['GET'])
 def model_info():
     return jsonify({
@@ -224,12 +337,12 @@ def model_info():
     })
 
 if __name__ == '__main__':
-    print("🚀 Starting Robust Financial Risk API Server...")
+    logger.info("🚀 Starting Robust Financial Risk API Server...")
     
     # Load model configuration
     if load_model():
-        print("📊 Backend ready!")
-        print("💡 Using advanced mock prediction system")
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        logger.info("📊 Backend ready!")
+        logger.info("💡 Using advanced mock prediction system")
+        app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=os.getenv('FLASK_DEBUG', '1') == '1')
     else:
-        print("❌ Failed to load model configuration")
+        logger.error("❌ Failed to load model configuration")
@@ -1,40 +1,80 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from auth import init_auth, register_auth_routes
-from models import db, User, PredictionHistory
+from auth import init_auth, register_auth_routes, profile_cache, revoked_tokens, verification_dispatcher, pending_sweeper
+from models import db, User, PredictionHistory, upgrade_schema
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import json
-import pandas as pd
+import base64
+from datetime import datetime
 import numpy as np
 import os
+from model_loader import ModelRegistry, MODEL_WATCH_INTERVAL, admin_token_ok
+from prediction_cache import PredictionCache
+from history_writer import HistoryWriter
+from stage_metrics import StageMetrics
+from app_logging import get_logger
+from fast_json import use_fast_json, json_response, dumps, now_iso
 
 app = Flask(__name__)
 CORS(app)
+use_fast_json(app)
+logger = get_logger('app_with_auth')
 
 # Initialize authentication
 init_auth(app)
 register_auth_routes(app)
 
-# Global variables for ML model
-selected_features = []
-model_loaded = False
+# Global model state (model, features, encoder and version live in one swappable bundle)
+registry = ModelRegistry()
+prediction_cache = PredictionCache()
+latency = StageMetrics()
 
-# ... [Include all your existing ML model loading and prediction code here] ...
+# Cached predictions belong to the previous model
+registry.on_swap(lambda bundle: prediction_cache.clear())
+
+# Prediction history is written in batches off the request path
+history_writer = HistoryWriter(app)
+
+# What PredictionHistory keeps of each request: 'json' (raw request body),
+# 'vector' (packed float32 feature vector) or 'both'
+HISTORY_INPUT_STORAGE = os.getenv('HISTORY_INPUT_STORAGE', 'json')
+
+def load_model():
+    """Load the trained model and feature list"""
+    try:
+        bundle = registry.reload()
+        logger.info("✅ Model loaded successfully (%d features)", len(bundle.selected_features))
+        return True
+    except Exception as e:
+        logger.error("❌ Error loading model: %s", e)
+        return False
 
 @app.route('/api/predict', methods=['POST'])
 @jwt_required()
 def predict_risk():
     try:
         user_id = get_jwt_identity()
+        stopwatch = latency.stopwatch()
         
         # Get JSON data from request
         data = request.get_json()
-        print("📥 Received prediction request from user:", user_id)
+        stopwatch.lap('parse')
+        logger.debug("📥 Received prediction request from user: %s", user_id)
         
-        # Your existing prediction logic here...
-        # [Include the prediction code from app_robust.py]
+        # Use one bundle for the whole request, even if a reload happens meanwhile
+        bundle = registry.current()
+        if bundle is None:
+            return jsonify({'error': 'Model not loaded'}), 500
         
-        risk_probability = 0.5  # Placeholder - use your actual prediction logic
+        # Encode features in model order and reuse cached scores for resubmissions
+        feature_vector, missing_features = bundle.encoder.encode(data)
+        stopwatch.lap('encode')
+        cache_key = PredictionCache.make_key(feature_vector, bundle.generation)
+        risk_probability = prediction_cache.get(cache_key)
+        if risk_probability is None:
+            risk_probability = float(bundle.model.predict_proba(feature_vector.reshape(1, -1))[0][1])
+            prediction_cache.put(cache_key, risk_probability)
+        stopwatch.lap('inference')
         
         # Determine risk level
         if risk_probability < 0.3:
@@ -45,53 +85,151 @@ def predict_risk():
             risk_level = 'High'
         else:
             risk_level = 'Critical'
+        stopwatch.lap('bucket')
         
-        # Save prediction to history
-        prediction = PredictionHistory(
+        # Save prediction to history (the id is assigned before the row is written)
+        prediction_id = history_writer.add(
             user_id=user_id,
             risk_score=risk_probability,
             risk_level=risk_level,
-            input_data=json.dumps(data)
+            input_data=dumps(data).decode() if HISTORY_INPUT_STORAGE != 'vector' else None,
+            feature_vector=feature_vector.astype('<f4').tobytes() if HISTORY_INPUT_STORAGE != 'json' else None,
+            model_version=str(bundle.version)
         )
-        db.session.add(prediction)
-        db.session.commit()
+        stopwatch.lap('db_write')
         
-        return jsonify({
+        response = json_response(app, dumps({
             'riskScore': round(risk_probability, 4),
             'riskLevel': risk_level,
             'confidence': round(risk_probability * 100, 2),
-            'predictionId': prediction.id,
-            'timestamp': pd.Timestamp.now().isoformat()
-        })
+            'predictionId': prediction_id,
+            'timestamp': now_iso()
+        }))
+        stopwatch.lap('serialize')
+        stopwatch.total()
+        return response
         
     except Exception as e:
-        print(f"❌ Prediction error: {e}")
+        logger.error("❌ Prediction error: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# Response field -> PredictionHistory column, for ?fields=
+HISTORY_FIELDS = {
+    'id': PredictionHistory.id,
+    'riskScore': PredictionHistory.risk_score,
+    'riskLevel': PredictionHistory.risk_level,
+    'createdAt': PredictionHistory.created_at,
+    'inputData': PredictionHistory.input_data,
+    'featureVector': PredictionHistory.feature_vector,
+    'modelVersion': PredictionHistory.model_version
+}
+DEFAULT_HISTORY_FIELDS = ['id', 'riskScore', 'riskLevel', 'createdAt']
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '10'))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '500'))
+
+def encode_history_cursor(created_at, prediction_id):
+    raw = json.dumps([created_at.isoformat(), prediction_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    created_at, prediction_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(prediction_id)
+
 @app.route('/api/predictions/history', methods=['GET'])
 @jwt_required()
 def get_prediction_history():
+    """Newest-first history, paged by keyset: ?limit=&cursor=&fields=a,b"""
     user_id = get_jwt_identity()
     
-    predictions = PredictionHistory.query.filter_by(user_id=user_id).order_by(
-        PredictionHistory.created_at.desc()
-    ).limit(10).all()
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else DEFAULT_HISTORY_FIELDS
+    unknown = [f for f in fields if f not in HISTORY_FIELDS]
+    if unknown:
+        return jsonify({'error': f'Unknown fields: {", ".join(unknown)}',
+                        'available': list(HISTORY_FIELDS)}), 400
+    
+    # Only the requested columns are loaded; created_at and id are always
+    # needed to build the next cursor
+    columns = [PredictionHistory.created_at, PredictionHistory.id] + [HISTORY_FIELDS[f] for f in fields]
+    query = db.session.query(*columns).filter(PredictionHistory.user_id == user_id)
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, prediction_id = decode_history_cursor(cursor)
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.or_(
+            PredictionHistory.created_at < created_at,
+            db.and_(PredictionHistory.created_at == created_at, PredictionHistory.id < prediction_id)
+        ))
+    
+    # One extra row tells us whether there is another page
+    rows = query.order_by(
+        PredictionHistory.created_at.desc(), PredictionHistory.id.desc()
+    ).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    predictions = []
+    for row in rows:
+        item = dict(zip(fields, row[2:]))
+        if 'createdAt' in item:
+            item['createdAt'] = item['createdAt'].isoformat()
+        if item.get('featureVector') is not None:
+            item['featureVector'] = np.frombuffer(item['featureVector'], dtype='<f4').tolist()
+        predictions.append(item)
     
     return jsonify({
-        'predictions': [
-            {
-                'id': p.id,
-                'riskScore': p.risk_score,
-                'riskLevel': p.risk_level,
-                'createdAt': p.created_at.isoformat()
-            } for p in predictions
-        ]
+        'predictions': predictions,
+        'nextCursor': encode_history_cursor(rows[-1][0], rows[-1][1]) if has_more else None
     })
 
-# Create database tables
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Load, validate and atomically swap in the model files on disk"""
+    if not admin_token_ok(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        bundle = registry.reload()
+    except Exception as e:
+        logger.error("❌ Model reload failed, keeping current model: %s", e)
+        return jsonify({'error': f'Reload failed, keeping current model: {e}'}), 500
+    
+    return jsonify({'message': 'Model reloaded', 'model_version': bundle.version})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency, cache, history writer, token revocation and verification counters"""
+    return jsonify({
+        'latency': latency.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'history_writer': history_writer.stats(),
+        'profile_cache': profile_cache.stats(),
+        'revoked_tokens': revoked_tokens.stats(),
+        'verification_dispatch': verification_dispatcher.stats(),
+        'pending_sweeper': pending_sweeper.stats()
+    })
+
+# Create database tables (and columns/indexes added to tables that already exist)
 with app.app_context():
     db.create_all()
+    upgrade_schema(db.engine)
+
+def post_fork():
+    """Called by prefork.py in each worker: don't reuse the master's pooled connections"""
+    with app.app_context():
+        db.engine.dispose(close=False)
 
 if __name__ == '__main__':
-    print("🚀 Starting Financial Risk API with Authentication...")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    logger.info("🚀 Starting Financial Risk API with Authentication...")
+    if load_model() and MODEL_WATCH_INTERVAL > 0:
+        registry.watch(MODEL_WATCH_INTERVAL)
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=os.getenv('FLASK_DEBUG', '1') == '1')
@@ -0,0 +1,308 @@
+"""Asyncio HTTP server for the prediction API.
+
+A non-blocking alternative to app_minimal.py's single-threaded TCPServer
+and the Flask dev servers. One event loop handles all connections (with
+HTTP/1.1 keep-alive), so a slow client no longer blocks everyone else.
+CPU-bound model inference runs in a bounded thread pool; when too many
+predictions are queued the server answers 503 instead of piling up work.
+
+Routes:
+    GET  /health
+    POST /predict, /predict/batch       real model (see model_loader.py)
+    POST /api/predict and /api/auth/*   same handlers as app_minimal.py
+    GET  /api/auth/me                   bearer token, as in app_minimal.py
+
+Usage:
+    PORT=5000 INFERENCE_ENGINE=native python async_server.py
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+import app_minimal
+from batch_scoring import parse_batch_body, score_batch, risk_level_for
+from model_loader import ModelRegistry
+from password_hasher import password_hasher
+from prediction_cache import PredictionCache
+from fast_json import loads, dumps, now_iso
+from token_auth import bearer_token
+
+PORT = int(os.getenv('PORT', '5000'))
+INFERENCE_WORKERS = int(os.getenv('ASYNC_INFERENCE_WORKERS', str(os.cpu_count() or 1)))
+MAX_PENDING_PREDICTIONS = int(os.getenv('ASYNC_MAX_PENDING', '1024'))
+KEEPALIVE_TIMEOUT = float(os.getenv('ASYNC_KEEPALIVE_TIMEOUT', '15'))
+REQUEST_TIMEOUT = float(os.getenv('ASYNC_REQUEST_TIMEOUT', '30'))
+MAX_BODY_BYTES = int(os.getenv('ASYNC_MAX_BODY_BYTES', str(16 * 1024 * 1024)))
+
+CORS_HEADERS = (
+    'Access-Control-Allow-Origin: *\r\n'
+    'Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n'
+    'Access-Control-Allow-Headers: Content-Type, Authorization\r\n'
+)
+
+registry = ModelRegistry()
+prediction_cache = PredictionCache()
+registry.on_swap(lambda bundle: prediction_cache.clear())
+
+executor = ThreadPoolExecutor(INFERENCE_WORKERS, thread_name_prefix='inference')
+pending_predictions = 0
+
+
+def score_one(bundle, data):
+    """Encode and score one applicant (runs in the inference pool)"""
+    feature_vector, missing_features = bundle.encoder.encode(data)
+    cache_key = PredictionCache.make_key(feature_vector, bundle.generation)
+    risk_probability = prediction_cache.get(cache_key)
+    if risk_probability is None:
+        risk_probability = float(bundle.model.predict_proba(feature_vector.reshape(1, -1))[0][1])
+        prediction_cache.put(cache_key, risk_probability)
+
+    return 200, {
+        'riskScore': round(risk_probability, 4),
+        'riskLevel': risk_level_for(risk_probability),
+        'confidence': round(risk_probability * 100, 2),
+        'featuresUsed': len(feature_vector),
+        'missingFeatures': missing_features,
+        'timestamp': now_iso()
+    }
+
+
+def score_many(bundle, body, content_type):
+    """Parse and score a /predict/batch body (runs in the inference pool)"""
+    try:
+        records, errors = parse_batch_body(body, content_type)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    results = score_batch(bundle.model, bundle.encoder, records, errors)
+    return 200, {
+        'results': results,
+        'count': len(results),
+        'failed': sum(1 for r in results if 'error' in r),
+        'timestamp': now_iso()
+    }
+
+
+async def run_inference(fn, *args):
+    """Run CPU-bound work in the bounded pool, shedding load when it is full"""
+    global pending_predictions
+    if pending_predictions >= MAX_PENDING_PREDICTIONS:
+        return 503, {'error': 'Server busy, try again'}
+    pending_predictions += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        pending_predictions -= 1
+
+
+async def dispatch(method, path, headers, body):
+    """Route one request; returns (status, response dict)"""
+    if method == 'OPTIONS':
+        return 200, None
+
+    auth_handler = app_minimal.AUTH_ROUTES.get((method, path))
+    if auth_handler is not None:
+        try:
+            data = loads(body) if body else {}
+        except ValueError:
+            return 400, {'error': 'Invalid JSON body'}
+        return auth_handler(bearer_token(headers.get('authorization')), data)
+
+    if method == 'GET':
+        if path == '/health':
+            bundle = registry.current()
+            return 200, {
+                'status': 'healthy',
+                'mode': 'async',
+                'model_loaded': bundle is not None,
+                'model_version': bundle.version if bundle else None,
+                'pending_predictions': pending_predictions
+            }
+        return 404, {'error': 'Not found'}
+
+    if method != 'POST':
+        return 405, {'error': 'Method not allowed'}
+
+    if path in ('/predict', '/predict/batch'):
+        bundle = registry.current()
+        if bundle is None:
+            return 500, {'error': 'Model not loaded'}
+        if path == '/predict/batch':
+            return await run_inference(score_many, bundle, body, headers.get('content-type', ''))
+        try:
+            data = loads(body)
+        except ValueError:
+            return 400, {'error': 'Invalid JSON body'}
+        return await run_inference(score_one, bundle, data)
+
+    handler = app_minimal.POST_ROUTES.get(path)
+    if handler is None:
+        return 404, {'error': 'Not found'}
+    try:
+        data = loads(body)
+    except ValueError:
+        return 400, {'error': 'Invalid JSON body'}
+    if handler is app_minimal.login_user:
+        return await login(data)
+    if handler is app_minimal.set_password:
+        return await set_password(data)
+    if handler is app_minimal.predict_risk:
+        # prediction_log writes to disk, so keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, handler, data)
+    # register and verify-sms only touch in-memory dicts; running them on the
+    # loop keeps their check-then-insert steps from interleaving
+    return handler(data)
+
+
+async def login(data):
+    """app_minimal.login_user, awaiting the hasher pool instead of blocking a thread on it"""
+    response, found = app_minimal.find_login(data)
+    if response is not None:
+        return response
+    user_id, password, stored = found
+    try:
+        matches, new_hash = await asyncio.wrap_future(password_hasher.submit_verify(password, stored))
+        return app_minimal.finish_login(user_id, matches, new_hash)
+    except Exception as e:
+        return app_minimal.error_response(str(e))
+
+
+async def set_password(data):
+    """app_minimal.set_password, awaiting the hasher pool"""
+    response, checked = app_minimal.check_new_password(data)
+    if response is not None:
+        return response
+    user_id, password = checked
+    try:
+        password_hash = await asyncio.wrap_future(password_hasher.submit_hash(password))
+        return app_minimal.store_password(user_id, password_hash)
+    except Exception as e:
+        return app_minimal.error_response(str(e))
+
+
+# Status line and fixed headers per (status, keep_alive), built once;
+# only Content-Length and the body change per response
+_response_heads = {}
+
+
+def response_head(status, keep_alive):
+    head = _response_heads.get((status, keep_alive))
+    if head is None:
+        head = _response_heads[(status, keep_alive)] = (
+            f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+            'Content-Type: application/json\r\n'
+            f'{CORS_HEADERS}'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+            'Content-Length: '
+        ).encode('latin-1')
+    return head
+
+
+def build_response(status, payload, keep_alive):
+    body = b'' if payload is None else dumps(payload)
+    return b''.join((response_head(status, keep_alive), str(len(body)).encode(), b'\r\n\r\n', body))
+
+
+async def read_headers(reader):
+    """Header lines up to the blank line, as a dict keyed by lower-case name"""
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def handle_connection(reader, writer):
+    """Serve requests on one connection until it closes or goes idle"""
+    try:
+        while True:
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            except ValueError:
+                # Longer than the StreamReader limit
+                writer.write(build_response(414, {'error': 'Request line too long'}, False))
+                break
+            if not request_line:
+                break
+
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                writer.write(build_response(400, {'error': 'Bad request line'}, False))
+                break
+
+            # Headers and body get REQUEST_TIMEOUT each, so a slow client can't hold the connection
+            try:
+                headers = await asyncio.wait_for(read_headers(reader), REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                writer.write(build_response(408, {'error': 'Timed out reading request headers'}, False))
+                break
+            except ValueError:
+                writer.write(build_response(431, {'error': 'Request header too large'}, False))
+                break
+
+            # The body isn't read on these errors, so the connection can't be reused
+            if 'transfer-encoding' in headers:
+                writer.write(build_response(411, {'error': 'Chunked bodies are not supported; send Content-Length'},
+                                            False))
+                break
+            try:
+                length = int(headers.get('content-length') or 0)
+                if length < 0:
+                    raise ValueError
+            except ValueError:
+                writer.write(build_response(400, {'error': 'Invalid Content-Length'}, False))
+                break
+            if length > MAX_BODY_BYTES:
+                writer.write(build_response(413, {'error': 'Request body too large'}, False))
+                break
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT) if length else b''
+            except asyncio.TimeoutError:
+                writer.write(build_response(408, {'error': 'Timed out reading request body'}, False))
+                break
+
+            connection = headers.get('connection', '').lower()
+            if version == 'HTTP/1.0':
+                keep_alive = connection == 'keep-alive'
+            else:
+                keep_alive = connection != 'close'
+
+            try:
+                status, payload = await dispatch(method, urlparse(target).path, headers, body)
+            except Exception as e:
+                status, payload = 500, {'error': str(e)}
+            writer.write(build_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host='0.0.0.0', port=PORT):
+    server = await asyncio.start_server(handle_connection, host, port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    print(f"🚀 Starting Async Financial Risk API on port {PORT}")
+    try:
+        registry.reload()
+        print(f"📊 Model loaded (version {registry.current().version})")
+    except Exception as e:
+        print(f"⚠️ Model not loaded, /predict disabled: {e}")
+    print(f"⚙️ Inference pool: {INFERENCE_WORKERS} threads, max {MAX_PENDING_PREDICTIONS} pending")
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n🛑 Server stopped")
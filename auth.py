@@ -1,29 +1,115 @@
 from flask import Flask, request, jsonify, url_for, render_template_string
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from models import db, bcrypt, User, PredictionHistory
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+from models import db, User, PendingRegistration, PredictionHistory
 import re
 import os
-from datetime import timedelta
+import sqlite3
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
+from app_logging import get_logger
+from prediction_cache import PredictionCache
+from token_auth import RevocationSet
+from verification_dispatch import VerificationDispatcher
+from pending_registrations import PENDING_TTL_SECONDS, Sweeper, new_pending_id, new_verification_code
 
 # Email and SMS configuration (you'll need to set these environment variables)
 EMAIL_API_KEY = os.getenv('SENDGRID_API_KEY', 'your_sendgrid_key')
 SMS_API_KEY = os.getenv('TWILIO_API_KEY', 'your_twilio_key')
 
+logger = get_logger('auth')
+
+# Connection pool for the auth/history database (see engine_options)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '0') == '1'
+
+# SQLite settings for single-node deployments: WAL lets readers run while a
+# write commits, and synchronous=NORMAL is durable in WAL mode short of power loss
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper()
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_STATEMENT_CACHE = int(os.getenv('SQLITE_STATEMENT_CACHE', '256'))
+
+if SQLITE_JOURNAL_MODE not in ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'):
+    raise ValueError(f'Unknown SQLITE_JOURNAL_MODE: {SQLITE_JOURNAL_MODE}')
+if SQLITE_SYNCHRONOUS not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+    raise ValueError(f'Unknown SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}')
+
+# JWTs are verified by signature alone; logout adds the token's jti here
+# (bounded, in-process - see token_auth.py)
+revoked_tokens = RevocationSet()
+
+# /api/auth/me answers from this cache for PROFILE_CACHE_TTL seconds
+# instead of loading the user on every call
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', '60'))
+profile_cache = PredictionCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+
+# Deletes expired pending registrations every PENDING_SWEEP_INTERVAL
+# seconds; init_auth points it at the app's database and starts it
+pending_sweeper = Sweeper(None)
+
 def init_auth(app):
-    db.init_app(app)
-    bcrypt.init_app(app)
-    jwt = JWTManager(app)
-    
     # JWT config
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     
-    # Database config
+    # Database config (must be set before db.init_app reads it)
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///financial_risk.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    
+    db.init_app(app)
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
+    jwt = JWTManager(app)
+    
+    @jwt.token_in_blocklist_loader
+    def is_token_revoked(jwt_header, jwt_payload):
+        return jwt_payload['jti'] in revoked_tokens
+    
+    pending_sweeper.sweep_fn = lambda: sweep_pending_registrations(app)
+    pending_sweeper.start()
     
     return jwt
 
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS with the DB_POOL_* and SQLite driver settings"""
+    options = {'pool_pre_ping': DB_POOL_PRE_PING}
+    if database_uri.startswith('sqlite'):
+        if database_uri in ('sqlite://', 'sqlite:///:memory:'):
+            # Flask-SQLAlchemy shares one connection for in-memory databases
+            return options
+        # Pooled connections move between request threads; sqlite3 keeps
+        # compiled statements per connection, so pooling also reuses them
+        options['poolclass'] = QueuePool
+        options['connect_args'] = {
+            'check_same_thread': False,
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            'cached_statements': SQLITE_STATEMENT_CACHE
+        }
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    return options
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLITE_* settings to each new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
 # Password validation
 def validate_password(password):
     if len(password) < 8:
@@ -43,22 +129,54 @@ def validate_password(password):
     
     return True, "Password is valid"
 
-# Email verification (mock - you'll need to implement real email sending)
+# Verification messages are queued and sent by background workers in
+# per-provider batches, so register returns once the user row is committed
+# (see verification_dispatch.py; the transports only log until the
+# SendGrid/Twilio clients are wired in)
+verification_dispatcher = VerificationDispatcher()
+
 def send_verification_email(email, verification_url):
-    print(f"📧 Verification email sent to {email}")
-    print(f"🔗 Verification URL: {verification_url}")
-    # In production, integrate with SendGrid:
-    # from sendgrid import SendGridAPIClient
-    # from sendgrid.helpers.mail import Mail
+    verification_dispatcher.send_email(email, verification_url)
     return True
 
-# SMS verification (mock - you'll need to implement real SMS sending)
 def send_verification_sms(phone_number, code):
-    print(f"📱 Verification SMS sent to {phone_number}")
-    print(f"🔢 Verification code: {code}")
-    # In production, integrate with Twilio or Africa's Talking
+    verification_dispatcher.send_sms(phone_number, code)
     return True
 
+def verify_pending(pending_id, code, unknown_error):
+    """Turn a pending registration into a verified User; returns (user, error)"""
+    pending = db.session.get(PendingRegistration, str(pending_id)) if pending_id else None
+    if pending is None:
+        return None, unknown_error
+    
+    if not pending.is_code_valid(code):
+        if pending.is_expired():
+            db.session.delete(pending)
+            db.session.commit()
+        return None, 'Invalid or expired verification code'
+    
+    user = pending.to_user()
+    db.session.add(user)
+    db.session.delete(pending)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Someone else verified this email or phone number first
+        db.session.rollback()
+        db.session.delete(pending)
+        db.session.commit()
+        return None, 'Email or phone number already registered'
+    return user, None
+
+def sweep_pending_registrations(app):
+    """Delete expired pending registrations; returns how many were removed"""
+    with app.app_context():
+        result = db.session.execute(
+            db.delete(PendingRegistration).where(PendingRegistration.expires_at <= datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
 # Auth routes
 def register_auth_routes(app):
     
@@ -87,40 +205,45 @@ def register_auth_routes(app):
             if not re.match(phone_regex, data['phone_number']):
                 return jsonify({'error': 'Invalid Safaricom phone number format. Use 254XXXXXXXXX'}), 400
             
-            # Check if user already exists
-            if User.query.filter_by(email=data['email']).first():
+            # Check if user already exists (one query for both unique columns)
+            taken = db.session.query(User.email, User.phone_number).filter(db.or_(
+                User.email == data['email'], User.phone_number == data['phone_number']
+            )).all()
+            if any(email == data['email'] for email, _ in taken):
                 return jsonify({'error': 'Email already registered'}), 400
             
-            if User.query.filter_by(phone_number=data['phone_number']).first():
+            if taken:
                 return jsonify({'error': 'Phone number already registered'}), 400
             
-            # Create new user
-            user = User(
+            # The user is only created once the code is verified; until then
+            # the signup waits in pending_registrations (swept after PENDING_TTL_SECONDS)
+            pending = PendingRegistration(
+                id=new_pending_id(),
                 full_name=data['full_name'],
                 email=data['email'],
                 phone_number=data['phone_number'],
-                verification_method=data['verification_method']
+                verification_method=data['verification_method'],
+                verification_code=new_verification_code(),
+                expires_at=datetime.utcnow() + timedelta(seconds=PENDING_TTL_SECONDS)
             )
-            
-            # Generate verification code
-            verification_code = user.generate_verification_code()
-            
-            db.session.add(user)
+            db.session.add(pending)
             db.session.commit()
             
-            # Send verification
+            # Send verification. user_id here is the pending registration's hex id;
+            # verify-email/verify-sms answer with the integer users.id, which is
+            # what set-password takes
             if data['verification_method'] == 'email':
-                verification_url = f"http://localhost:8000/verify-email?user_id={user.id}&code={verification_code}"
+                verification_url = f"http://localhost:8000/verify-email?user_id={pending.id}&code={pending.verification_code}"
                 send_verification_email(data['email'], verification_url)
                 return jsonify({
                     'message': 'Registration successful. Please check your email for verification link.',
-                    'user_id': user.id
+                    'user_id': pending.id
                 })
             else:  # sms
-                send_verification_sms(data['phone_number'], verification_code)
+                send_verification_sms(data['phone_number'], pending.verification_code)
                 return jsonify({
                     'message': 'Registration successful. Please check your SMS for verification code.',
-                    'user_id': user.id,
+                    'user_id': pending.id,
                     'requires_code_input': True
                 })
                 
@@ -130,17 +253,11 @@ def register_auth_routes(app):
     
     @app.route('/api/auth/verify-email', methods=['GET'])
     def verify_email():
-        user_id = request.args.get('user_id')
+        pending_id = request.args.get('user_id')
         code = request.args.get('code')
         
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'Invalid verification link'}), 400
-        
-        if user.is_verification_code_valid(code):
-            user.email_verified = True
-            db.session.commit()
-            
+        user, error = verify_pending(pending_id, code, 'Invalid verification link')
+        if user:
             # Return HTML page for password setup
             html_template = '''
             <!DOCTYPE html>
@@ -219,30 +336,24 @@ def register_auth_routes(app):
             </body>
             </html>
             '''
-            return render_template_string(html_template.replace('{{ user_id }}', user_id))
+            return render_template_string(html_template.replace('{{ user_id }}', str(user.id)))
         else:
-            return jsonify({'error': 'Invalid or expired verification code'}), 400
+            return jsonify({'error': error}), 400
     
     @app.route('/api/auth/verify-sms', methods=['POST'])
     def verify_sms():
         data = request.get_json()
-        user_id = data.get('user_id')
+        pending_id = data.get('user_id')
         code = data.get('code')
         
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'Invalid user'}), 400
-        
-        if user.is_verification_code_valid(code):
-            user.phone_verified = True
-            db.session.commit()
-            
+        user, error = verify_pending(pending_id, code, 'Invalid user')
+        if user:
             return jsonify({
                 'message': 'Phone number verified successfully. Please set your password.',
                 'user_id': user.id
             })
         else:
-            return jsonify({'error': 'Invalid or expired verification code'}), 400
+            return jsonify({'error': error}), 400
     
     @app.route('/api/auth/set-password', methods=['POST'])
     def set_password():
@@ -275,6 +386,9 @@ def register_auth_routes(app):
         if not user or not user.check_password(password):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        if db.session.is_modified(user):
+            db.session.commit()  # password rehashed with the current settings
+        
         if not user.email_verified and not user.phone_verified:
             return jsonify({'error': 'Please verify your account before logging in'}), 401
         
@@ -295,15 +409,26 @@ def register_auth_routes(app):
     @jwt_required()
     def get_current_user():
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        return jsonify({
-            'user': {
+        profile = profile_cache.get(user_id)
+        if profile is None:
+            user = User.query.get(user_id)
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            profile = {
                 'id': user.id,
                 'full_name': user.full_name,
                 'email': user.email,
                 'phone_number': user.phone_number
             }
-        })
+            profile_cache.put(user_id, profile)
+        
+        return jsonify({'user': profile})
+    
+    @app.route('/api/auth/logout', methods=['POST'])
+    @jwt_required()
+    def logout():
+        claims = get_jwt()
+        revoked_tokens.revoke(claims['jti'], claims['exp'])
+        return jsonify({'message': 'Logged out'})
     
     return app
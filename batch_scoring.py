@@ -0,0 +1,96 @@
+"""Batch scoring helpers shared by the /predict/batch endpoints"""
+import json
+import numpy as np
+
+# Upper bound on applicants per request so one call can't exhaust memory
+MAX_BATCH_SIZE = 10000
+
+
+def parse_batch_body(raw, content_type=''):
+    """Parse a JSON array or NDJSON body into (records, errors).
+
+    A body that is not a JSON array (whatever the Content-Type says) is
+    read as NDJSON, one applicant per line. `records` keeps one slot per
+    input applicant (None where the row could not be parsed) and `errors`
+    maps the row index to an error message.
+    """
+    text = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+    records = []
+    errors = {}
+
+    parsed_array = False
+    if 'ndjson' not in content_type:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+        if isinstance(payload, list):
+            records = payload
+            parsed_array = True
+
+    if not parsed_array:
+        # One JSON object per line
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                errors[len(records)] = f'Invalid JSON: {e}'
+                records.append(None)
+
+    if len(records) > MAX_BATCH_SIZE:
+        raise ValueError(f'Batch too large: {len(records)} rows (max {MAX_BATCH_SIZE})')
+
+    for i, record in enumerate(records):
+        if i not in errors and not isinstance(record, dict):
+            errors[i] = 'Each applicant must be a JSON object'
+    return records, errors
+
+
+def risk_level_for(risk_probability):
+    """Bucket a probability into the risk levels used by /predict"""
+    if risk_probability < 0.3:
+        return 'Low'
+    elif risk_probability < 0.6:
+        return 'Medium'
+    elif risk_probability < 0.8:
+        return 'High'
+    return 'Critical'
+
+
+def risk_levels_for(probabilities):
+    """Vectorized risk_level_for over an array of probabilities"""
+    levels = np.array(['Low', 'Medium', 'High', 'Critical'])
+    return levels[np.searchsorted([0.3, 0.6, 0.8], probabilities, side='right')]
+
+
+def score_batch(model, encoder, records, errors=None):
+    """Score many applicants with a single predict_proba call.
+
+    `encoder` is the app's FeatureEncoder. Results come back in input
+    order, one dict per applicant.
+    """
+    matrix, missing, errors = encoder.encode_many(records, errors)
+    valid = np.ones(len(records), dtype=bool)
+    valid[list(errors)] = False
+
+    probabilities = np.zeros(len(records))
+    if valid.any():
+        probabilities[valid] = model.predict_proba(matrix[valid])[:, 1]
+
+    results = []
+    for i in range(len(records)):
+        if i in errors:
+            results.append({'index': i, 'error': errors[i]})
+            continue
+        risk_probability = float(probabilities[i])
+        results.append({
+            'index': i,
+            'riskScore': round(risk_probability, 4),
+            'riskLevel': risk_level_for(risk_probability),
+            'confidence': round(risk_probability * 100, 2),
+            'missingFeatures': missing[i]
+        })
+    return results
@@ -0,0 +1,169 @@
+"""End-to-end benchmark of every API variant.
+
+Starts each server (app.py, app_complete.py, app_robust.py, app_minimal.py,
+async_server.py, inference_app.py, app_with_auth.py) on its own port. It
+then drives the routes that variant has:
+- predict: POST /predict (or the mock /api/predict in app_minimal)
+- api_predict: POST /api/predict with a JWT (app_with_auth)
+- register: POST /api/auth/register with a fresh user each time
+- login: POST /api/auth/login for a verified user
+
+Request bodies are synthetic applicants generated from selected_features.
+It reports throughput, p50/p95/p99 latency, the server's RSS and its cold
+start (seconds from spawn until it answers HTTP; see bench_startup.py for
+import times).
+
+Login runs bcrypt at the configured cost, so it gets its own (smaller)
+request count. Set PASSWORD_HASH_COST to benchmark other costs.
+
+Usage:
+    python benchmarks/bench_api.py [-n 2000] [-c 50] [--only app_complete async_server] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from load_test import run_load, wait_healthy
+from synthetic import REPO_ROOT, PASSWORD, load_features, applicants, new_user
+
+# name -> (script, {scenario: path})
+VARIANTS = {
+    'app': ('app.py', {'predict': '/predict'}),
+    'app_complete': ('app_complete.py', {'predict': '/predict'}),
+    'app_robust': ('app_robust.py', {'predict': '/predict'}),
+    'app_minimal': ('app_minimal.py', {'predict': '/api/predict', 'register': '/api/auth/register',
+                                       'login': '/api/auth/login'}),
+    'async_server': ('async_server.py', {'predict': '/predict', 'register': '/api/auth/register',
+                                         'login': '/api/auth/login'}),
+    'inference_app': ('inference_app.py', {'predict': '/predict'}),
+    'app_with_auth': ('app_with_auth.py', {'api_predict': '/api/predict', 'register': '/api/auth/register',
+                                           'login': '/api/auth/login'}),
+}
+
+
+def post(port, path, body, headers=None):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json', **(headers or {})})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def create_login_user(name, port, db_path):
+    """Register, verify and set a password for one user; returns its login body"""
+    user = new_user(0, run_id=999)
+    registered = post(port, '/api/auth/register', user)
+    if name == 'app_with_auth':
+        # The SMS code is only logged, so read it from the pending registration;
+        # set-password takes the users.id that verify-sms returns
+        with sqlite3.connect(db_path) as conn:
+            code, = conn.execute('SELECT verification_code FROM pending_registrations WHERE id = ?',
+                                 (registered['user_id'],)).fetchone()
+        verified = post(port, '/api/auth/verify-sms', {'user_id': registered['user_id'], 'code': code})
+        post(port, '/api/auth/set-password', {'user_id': verified['user_id'], 'password': PASSWORD})
+    else:
+        post(port, '/api/auth/verify-sms', {'user_id': registered['user_id'],
+                                            'code': registered['verification_code']})
+        post(port, '/api/auth/set-password', {'user_id': registered['user_id'], 'password': PASSWORD})
+    return {'email': user['email'], 'password': PASSWORD}
+
+
+def rss_mb(pid):
+    """(current, peak) resident set size of a process in MB"""
+    current = peak = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                current = int(line.split()[1])
+            elif line.startswith('VmHWM:'):
+                peak = int(line.split()[1])
+    return round(current / 1024, 1), round(peak / 1024, 1)
+
+
+def bench_variant(name, port, args, bodies, workdir):
+    script, routes = VARIANTS[name]
+    db_path = os.path.join(workdir, f'{name}.db')
+    env = dict(os.environ, PORT=str(port), FLASK_DEBUG='0', LOG_LEVEL='WARNING',
+               DATABASE_URL=f'sqlite:///{db_path}')
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, script)], cwd=args.workdir,
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    try:
+        if not wait_healthy(port):
+            print(f"{name:<14} failed to start")
+            return results
+        cold_start = round(time.perf_counter() - started, 2)
+        idle_rss, _ = rss_mb(proc.pid)
+
+        login_body = None
+        if 'login' in routes or 'api_predict' in routes:
+            login_body = create_login_user(name, port, db_path)
+
+        for scenario, path in routes.items():
+            url = f'http://127.0.0.1:{port}{path}'
+            total, headers, scenario_bodies = args.requests, None, bodies
+            if scenario == 'register':
+                run_id = int(time.time())
+                scenario_bodies = lambda i: new_user(i, run_id)  # noqa: E731
+            elif scenario == 'login':
+                total, scenario_bodies = args.login_requests, [login_body]
+            elif scenario == 'api_predict':
+                token = post(port, '/api/auth/login', login_body)['access_token']
+                headers = {'Authorization': f'Bearer {token}'}
+
+            r = asyncio.run(run_load(url, total, args.concurrency, scenario_bodies, headers))
+            r.update(variant=name, scenario=scenario, idle_rss_mb=idle_rss, cold_start_s=cold_start)
+            r['rss_mb'], r['peak_rss_mb'] = rss_mb(proc.pid)
+            results.append(r)
+            print_row(r)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return results
+
+
+def print_row(r):
+    print(f"{r['variant']:<14} {r['scenario']:<12} {r['requests']:>8} {r['errors']:>7} {r['rps']:>9} "
+          f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['rss_mb']:>7} {r['peak_rss_mb']:>8} "
+          f"{r['cold_start_s']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=2000, help='requests per scenario')
+    parser.add_argument('--login-requests', type=int, default=100, help='requests for the login scenario')
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('--only', nargs='+', choices=list(VARIANTS), help='variants to run (default: all)')
+    parser.add_argument('--base-port', type=int, default=5201)
+    parser.add_argument('--workdir', default=REPO_ROOT, help='directory containing models/ (default: repo root)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    bodies = applicants(load_features(os.path.join(args.workdir, 'models')), 1000, seed=args.seed)
+    scratch = tempfile.mkdtemp(prefix='bench_api_')
+
+    print(f"{'variant':<14} {'scenario':<12} {'requests':>8} {'errors':>7} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>7} {'peak MB':>8} {'start s':>7}")
+    results = []
+    try:
+        for offset, name in enumerate(args.only or VARIANTS):
+            results.extend(bench_variant(name, args.base_port + offset, args, bodies, scratch))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Register/login throughput of app_with_auth.py against a local SQLite file.
+
+For each database configuration and thread count, a fresh process opens a
+new SQLite file. It drives POST /api/auth/register (a new pending
+registration each time) and POST /api/auth/login from N threads, each with
+its own Flask test client, and reports req/s, p50/p99 latency and errors
+(for example "database is locked").
+
+Configurations (environment read by auth.py):
+    rollback  SQLITE_JOURNAL_MODE=DELETE SQLITE_SYNCHRONOUS=FULL (SQLite's defaults)
+    wal       SQLITE_JOURNAL_MODE=WAL SQLITE_SYNCHRONOUS=NORMAL (the app's defaults)
+    wal-pool1 as wal, with DB_POOL_SIZE=1 DB_MAX_OVERFLOW=0
+
+Passwords use PBKDF2 at --hash-cost iterations, so the numbers reflect the
+database rather than the password hash.
+
+Usage:
+    python benchmarks/bench_auth_store.py [--threads 1 4 16 64] [-n 2000] [--configs rollback wal]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import REPO_ROOT, PASSWORD, new_user
+
+CONFIGS = {
+    'rollback': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+    'wal-pool1': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL',
+                  'DB_POOL_SIZE': '1', 'DB_MAX_OVERFLOW': '0'},
+}
+
+LOGIN_USERS = 100
+
+
+def drive(app, threads, total, make_request):
+    """Run `total` requests from `threads` threads; returns the result dict"""
+    counter = iter(range(total))
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            path, body = make_request(i)
+            started = time.perf_counter()
+            response = client.post(path, json=body)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors.append(response.get_json().get('error'))
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'rps': round(total / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 2),
+    }
+
+
+def run_worker(args):
+    """In a fresh process: set up the app on an empty database and measure"""
+    sys.path.insert(0, REPO_ROOT)
+    import app_with_auth
+    from models import db, User
+
+    app = app_with_auth.app
+    with app.app_context():
+        for i in range(LOGIN_USERS):
+            body = new_user(i, run_id=1)
+            user = User(full_name=body['full_name'], email=body['email'], phone_number=body['phone_number'],
+                        verification_method='sms', phone_verified=True)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    threads = args.threads[0]
+    register = drive(app, threads, args.requests,
+                     lambda i: ('/api/auth/register', new_user(i, run_id=2)))
+    login = drive(app, threads, args.requests,
+                  lambda i: ('/api/auth/login', {'email': new_user(i % LOGIN_USERS, run_id=1)['email'],
+                                                 'password': PASSWORD}))
+    print(json.dumps({'journal_mode': journal_mode, 'register': register, 'login': login}))
+
+
+def run_configs(args, scratch, results):
+    """One worker process per (config, threads); appends rows to results"""
+    for config in args.configs:
+        for threads in args.threads:
+            db_path = os.path.join(scratch, f'{config}_{threads}.db')
+            env = dict(os.environ, **CONFIGS[config], DATABASE_URL=f'sqlite:///{db_path}', LOG_LEVEL='WARNING',
+                       PASSWORD_HASHER='pbkdf2', PASSWORD_HASH_COST=str(args.hash_cost))
+            output = subprocess.run([sys.executable, '-W', 'ignore', __file__, '--worker', '--threads', str(threads),
+                                     '--requests', str(args.requests)],
+                                    env=env, capture_output=True, text=True)
+            if output.returncode != 0:
+                print(f"{config:<10} {threads:>7} failed: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            r = json.loads(output.stdout.strip().splitlines()[-1])
+            for scenario in ('register', 'login'):
+                row = dict(r[scenario], config=config, threads=threads, scenario=scenario,
+                           journal_mode=r['journal_mode'])
+                results.append(row)
+                print(f"{config:<10} {threads:>7} {scenario:<9} {row['rps']:>9} {row['p50_ms']:>8} "
+                      f"{row['p99_ms']:>8} {row['errors']:>7}")
+                if row['first_error']:
+                    print(f"{'':<10} {'':>7} first error: {row['first_error']}")
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('-n', '--requests', type=int, default=2000, help='requests per scenario')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--hash-cost', type=int, default=1000, help='PBKDF2 iterations for the test users')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    scratch = tempfile.mkdtemp(prefix='bench_auth_store_')
+    print(f"{'config':<10} {'threads':>7} {'scenario':<9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    results = []
+    try:
+        run_configs(args, scratch, results)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'requests': args.requests, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
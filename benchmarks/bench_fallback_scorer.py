@@ -0,0 +1,127 @@
+"""Vectorized vs. loop AdvancedRiskPredictor (app_robust.py's fallback scorer).
+
+LoopRiskPredictor below is the per-feature Python loop the app used
+before the scorer was compiled to arrays. The benchmark checks that both
+give bit-identical scores on synthetic applicants, some with features
+dropped, and then times:
+- loop: LoopRiskPredictor.predict, one applicant at a time
+- predict: AdvancedRiskPredictor.predict, one applicant at a time
+- to_matrix + predict_matrix: a whole batch, from encoded records to
+  scores. This is what /predict/batch pays, so it is the number to
+  compare with loop.
+- predict_matrix only: the array maths on a prebuilt matrix. Building
+  the matrix costs several times more than scoring it, so this row
+  overstates the end-to-end speedup.
+
+Usage:
+    python benchmarks/bench_fallback_scorer.py [--rows 10000] [--model-dir models]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from synthetic import REPO_ROOT, load_features, applicants
+from feature_encoder import FeatureEncoder
+from app_robust import AdvancedRiskPredictor
+
+
+class LoopRiskPredictor(AdvancedRiskPredictor):
+    """The original scorer: one Python pass over feature_names per call"""
+
+    def predict(self, feature_data):
+        base_risk = 0.3
+        weighted_contributions = 0
+        total_applied_weight = 0
+
+        for i, feature in enumerate(self.feature_names):
+            if feature in feature_data:
+                value = feature_data[feature]
+                weight = self.feature_weights[feature]
+
+                if feature == 'managingday2day_score':
+                    contribution = (100 - value) * 0.005 * weight
+                elif feature == 'manage_day2day':
+                    contribution = (10 - min(value, 10)) * 0.03 * weight
+                elif feature == 'tot_savings':
+                    contribution = (1 - min(value / 5000, 1)) * 0.4 * weight
+                elif feature == 'Financial_literacy_index_fnl':
+                    contribution = (100 - value) * 0.004 * weight
+                elif feature == 'financial_status':
+                    contribution = (4 - value) * 0.1 * weight
+                elif feature == 'Age':
+                    contribution = (1 - min(value / 60, 1)) * 0.2 * weight
+                else:
+                    contribution = value * 0.01 * weight
+
+                weighted_contributions += contribution
+                total_applied_weight += weight
+
+        if total_applied_weight > 0:
+            base_risk += weighted_contributions / total_applied_weight
+
+        return max(0.05, min(0.95, base_risk))
+
+
+def make_records(features, n, seed=0):
+    """Encoded applicants as app_robust sees them; every fourth one lacks some features"""
+    rng = random.Random(seed)
+    encoder = FeatureEncoder(features)
+    records = []
+    for i, raw in enumerate(applicants(features, n, seed)):
+        record = {key: encoder.convert(key, value) for key, value in raw.items()}
+        if i % 4 == 3:
+            for feature in rng.sample(features, rng.randint(1, len(features))):
+                record.pop(feature)
+        if i % 7 == 0:
+            record['tot_savings'] = rng.uniform(0, 50000)
+        records.append(record)
+    return records
+
+
+def best_of(fn, runs=3):
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--model-dir', default=os.path.join(REPO_ROOT, 'models'))
+    args = parser.parse_args()
+
+    features = load_features(args.model_dir)
+    records = make_records(features, args.rows)
+    loop, vectorized = LoopRiskPredictor(features), AdvancedRiskPredictor(features)
+
+    expected = [loop.predict(r) for r in records]
+    single = [vectorized.predict(r) for r in records]
+    batch = vectorized.predict_matrix(vectorized.to_matrix(records)).tolist()
+    mismatches = sum(a != b for a, b in zip(expected, single)) + sum(a != b for a, b in zip(expected, batch))
+    print(f"{'✅' if mismatches == 0 else '❌'} {args.rows} applicants, {mismatches} score mismatches "
+          f"(max |diff| {max(abs(a - b) for a, b in zip(expected, batch)):.1e})")
+
+    cases = [
+        ('loop', lambda: [loop.predict(r) for r in records]),
+        ('predict', lambda: [vectorized.predict(r) for r in records]),
+        ('to_matrix + predict_matrix', lambda: vectorized.predict_matrix(vectorized.to_matrix(records))),
+    ]
+    matrix = vectorized.to_matrix(records)
+    cases.append(('predict_matrix only (no to_matrix)', lambda: vectorized.predict_matrix(matrix)))
+
+    baseline = None
+    print(f"{'case':<36} {'us/row':>9} {'rows/s':>12} {'speedup':>8}")
+    for name, fn in cases:
+        seconds = best_of(fn)
+        baseline = baseline or seconds
+        print(f"{name:<36} {seconds * 1e6 / args.rows:>9.2f} {args.rows / seconds:>12,.0f} {baseline / seconds:>8.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Microbenchmarks for feature encoding and predict_proba.
+
+Times FeatureEncoder.encode (row by row) and encode_many, and each
+available engine's predict_proba, at batch sizes from 1 to 10k. Uses
+synthetic applicants.
+
+With --baseline, the results are compared against an earlier --json run.
+The script exits non-zero when any case got slower than --tolerance, so
+it can gate a deploy.
+
+Usage:
+    python benchmarks/bench_inference.py [--sizes 1 10 100 1000 10000] [--json now.json]
+    python benchmarks/bench_inference.py --baseline before.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+from synthetic import REPO_ROOT, load_features, applicants
+from feature_encoder import FeatureEncoder
+from model_loader import load_inference_model
+
+
+def time_call(fn, min_time=0.2, max_runs=10000):
+    """Best-of-3 mean seconds per call, each round running for at least min_time"""
+    fn()
+    best = float('inf')
+    for _ in range(3):
+        runs = 0
+        started = time.perf_counter()
+        while True:
+            fn()
+            runs += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time or runs >= max_runs:
+                break
+        best = min(best, elapsed / runs)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--engines', nargs='+', default=['sklearn', 'native'])
+    parser.add_argument('--model-dir', default=os.path.join(REPO_ROOT, 'models'))
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare against results from an earlier --json run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    features = load_features(args.model_dir)
+    encoder = FeatureEncoder(features)
+    records = applicants(features, max(args.sizes))
+
+    models = {}
+    for engine in args.engines:
+        try:
+            models[engine] = load_inference_model(engine, args.model_dir)
+        except Exception as e:
+            print(f"⚠️ Skipping {engine}: {e}")
+
+    results = {}
+    for size in args.sizes:
+        batch = records[:size]
+        results[f'encode/{size}'] = time_call(lambda: [encoder.encode(r) for r in batch])
+        results[f'encode_many/{size}'] = time_call(lambda: encoder.encode_many(batch))
+        matrix = encoder.encode_many(batch)[0]
+        for engine, model in models.items():
+            results[f'predict_proba[{engine}]/{size}'] = time_call(lambda: model.predict_proba(matrix))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['seconds_per_call']
+
+    print(f"{'case':<32} {'us/call':>12} {'us/row':>9} {'rows/s':>12} {'vs baseline':>12}")
+    regressions = []
+    for case, seconds in results.items():
+        size = int(case.rsplit('/', 1)[1])
+        change = ''
+        if baseline and case in baseline:
+            ratio = seconds / baseline[case] - 1
+            change = f'{ratio:+.1%}'
+            if ratio > args.tolerance:
+                regressions.append(case)
+                change += ' !'
+        print(f"{case:<32} {seconds * 1e6:>12.1f} {seconds * 1e6 / size:>9.2f} {size / seconds:>12,.0f} {change:>12}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'sizes': args.sizes, 'seconds_per_call': results}, f, indent=2)
+
+    if regressions:
+        print(f"❌ {len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Startup time and memory of N workers loading the model in each format.
+
+Starts N fresh Python processes per artifact format, lets each one load the
+model and score a row, then samples RSS and PSS (proportional set size,
+which splits shared pages between the processes using them) while all of
+them are still alive.
+
+Usage:
+    python benchmarks/bench_model_startup.py [--workers 16] [--model-dir models]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+fmt, path = sys.argv[1], sys.argv[2]
+if fmt == 'joblib':
+    import joblib
+    model = joblib.load(path)
+elif fmt == 'joblib-mmap':
+    import joblib
+    model = joblib.load(path, mmap_mode='r')
+else:
+    from native_model import load_native_model
+    model = load_native_model(path, mmap=(fmt == 'native-mmap'))
+loaded = time.perf_counter()
+import numpy as np
+model.predict_proba(np.zeros((1, model.n_features_in_), dtype=np.float32))
+print(json.dumps({{'load_s': loaded - started, 'ready_s': time.perf_counter() - started}}), flush=True)
+sys.stdin.read()
+'''
+
+
+def memory_kb(pid):
+    """(rss_kb, pss_kb) for a live process, from /proc"""
+    rss = pss = 0
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    rss = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def run_format(fmt, path, workers):
+    script = WORKER.format(root=REPO_ROOT)
+    started = time.perf_counter()
+    procs = [
+        subprocess.Popen([sys.executable, '-W', 'ignore', '-c', script, fmt, path],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    timings = []
+    for proc in procs:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f'{fmt} worker failed to load {path}')
+        timings.append(json.loads(line))
+    all_ready = time.perf_counter() - started
+
+    memory = [memory_kb(proc.pid) for proc in procs]
+    for proc in procs:
+        proc.stdin.close()
+        proc.wait()
+
+    load = sorted(t['load_s'] for t in timings)
+    return {
+        'format': fmt,
+        'workers': workers,
+        'median_load_ms': round(load[len(load) // 2] * 1000, 1),
+        'all_ready_s': round(all_ready, 2),
+        'rss_mb_per_worker': round(sum(r for r, _ in memory) / workers / 1024, 1),
+        'pss_mb_total': round(sum(p for _, p in memory) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--model-dir', default=os.path.join(REPO_ROOT, 'models'))
+    args = parser.parse_args()
+
+    candidates = [
+        ('joblib', 'financial_risk_model.pkl'),
+        ('joblib-mmap', 'financial_risk_model.pkl'),
+        ('native', 'financial_risk_model.npz'),
+        ('native-mmap', 'financial_risk_model.native'),
+    ]
+
+    print(f"{'format':<12} {'workers':>7} {'load ms':>8} {'all ready s':>11} {'RSS MB/worker':>13} {'PSS MB total':>12}")
+    for fmt, name in candidates:
+        path = os.path.join(args.model_dir, name)
+        if not os.path.exists(path):
+            print(f"{fmt:<12} skipped ({path} not found)")
+            continue
+        try:
+            r = run_format(fmt, path, args.workers)
+        except RuntimeError as e:
+            print(f"{fmt:<12} failed: {e}")
+            continue
+        print(f"{r['format']:<12} {r['workers']:>7} {r['median_load_ms']:>8} {r['all_ready_s']:>11} "
+              f"{r['rss_mb_per_worker']:>13} {r['pss_mb_total']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Password verification throughput (logins per second) by scheme and cost.
+
+For each scheme/cost pair, fires a burst of concurrent verify() calls
+through a PasswordHasher with 1..N pool workers. Reports the per-login
+latency, total logins/s and logins/s per worker (≈ per core).
+
+Usage:
+    python benchmarks/bench_password_hash.py [--logins 200] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from password_hasher import PasswordHasher  # noqa: E402
+
+CONFIGS = [('bcrypt', 10), ('bcrypt', 12), ('pbkdf2', 100000), ('pbkdf2', 600000)]
+PASSWORD = 'Correct-Horse-9!'
+
+
+def run(scheme, cost, workers, logins):
+    hasher = PasswordHasher(scheme, cost, workers)
+    stored = hasher.hash(PASSWORD)
+    started = time.perf_counter()
+    futures = [hasher.submit_verify(PASSWORD, stored) for _ in range(logins)]
+    wait(futures)
+    elapsed = time.perf_counter() - started
+    assert all(f.result()[0] for f in futures)
+    hasher.pool.shutdown()
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, max(1, (os.cpu_count() or 1) // 2), os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    print(f"{'scheme':<8} {'cost':>7} {'workers':>7} {'ms/login':>9} {'logins/s':>9} {'per worker':>10}")
+    for scheme, cost in CONFIGS:
+        for workers in args.workers:
+            rate = run(scheme, cost, workers, args.logins)
+            print(f"{scheme:<8} {cost:>7} {workers:>7} {workers / rate * 1000:>9.1f} "
+                  f"{rate:>9.1f} {rate / workers:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
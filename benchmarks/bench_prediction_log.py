@@ -0,0 +1,74 @@
+"""Append throughput and startup replay time of prediction_log.PredictionLog.
+
+Appends --entries predictions from --threads threads into a fresh log
+directory, checks that every id is unique, then reopens the log and times
+the replay. Replay only reads segments until the ring buffer is full, so
+its cost follows --ring-size rather than the size of the log on disk.
+
+Usage:
+    python benchmarks/bench_prediction_log.py [--entries 200000] [--threads 1 8] [--ring-size 10000] [--fsync]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import synthetic  # noqa: F401 (puts the repo root on sys.path)
+from prediction_log import PredictionLog
+
+
+def append_all(log, entries, threads):
+    """Append `entries` records from `threads` threads; returns (seconds, ids)"""
+    per_thread = entries // threads
+    ids = [[] for _ in range(threads)]
+
+    def worker(out):
+        for i in range(per_thread):
+            out.append(log.append({'risk_score': 0.42, 'risk_level': 'Medium',
+                                   'timestamp': '2024-01-01T00:00:00'})['id'])
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(ids[t],)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started, [i for chunk in ids for i in chunk]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=200000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--ring-size', type=int, default=10000)
+    parser.add_argument('--segment-mb', type=float, default=4)
+    parser.add_argument('--fsync', action='store_true', help='fsync after every append')
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} {'appends/s':>11} {'unique ids':>10} {'segments':>8} {'replay ms':>9} {'ring':>6}")
+    failed = False
+    for threads in args.threads:
+        scratch = tempfile.mkdtemp(prefix='bench_prediction_log_')
+        options = dict(segment_max_bytes=int(args.segment_mb * 1024 * 1024), max_segments=1000,
+                       ring_size=args.ring_size, fsync=args.fsync)
+        try:
+            log = PredictionLog(scratch, **options)
+            seconds, ids = append_all(log, args.entries, threads)
+            log.close()
+            unique = len(set(ids)) == len(ids)
+            failed |= not unique
+
+            reopened = PredictionLog(scratch, **options)
+            stats = reopened.stats()
+            reopened.close()
+            print(f"{threads:>7} {len(ids) / seconds:>11,.0f} {'yes' if unique else 'NO':>10} "
+                  f"{stats['segments']:>8} {stats['replay_ms']:>9.1f} {stats['ring_size']:>6}")
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Throughput of prefork.py as the worker count grows.
+
+Starts `prefork.py <module> --workers N` for each N and runs the same load
+against /predict (single rows) and /predict/batch (--batch-size rows per
+request). It reports requests/s, rows/s, speedup over one worker, and PSS
+(proportional set size) summed over the master and its workers. Shared
+model pages are counted once across processes, so PSS shows whether
+workers really share the preloaded model.
+
+On a host with C cores, throughput should grow roughly linearly up to
+--workers C. The load generator needs a core of its own, so leave one free.
+
+Usage:
+    python benchmarks/bench_prefork.py [--workers 1 2 4 8] [--module inference_app] [-n 4000] [-c 64]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from load_test import run_load, wait_healthy
+from synthetic import REPO_ROOT, load_features, applicants
+
+
+def pss_mb(pid):
+    """PSS of pid and its direct children in MB"""
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    total = 0
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='inference_app')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('-n', '--requests', type=int, default=4000)
+    parser.add_argument('-c', '--concurrency', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--port', type=int, default=5501)
+    parser.add_argument('--workdir', default=REPO_ROOT, help='directory containing models/ (default: repo root)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    records = applicants(load_features(os.path.join(args.workdir, 'models')), 1000)
+    batches = [records[i:i + args.batch_size] for i in range(0, len(records), args.batch_size)]
+    scenarios = [('/predict', records, 1), ('/predict/batch', batches, args.batch_size)]
+
+    print(f"{'workers':>7} {'route':<15} {'errors':>6} {'req/s':>9} {'rows/s':>10} {'speedup':>8} "
+          f"{'p99 ms':>8} {'PSS MB':>7}")
+    results, single = [], {}
+    for offset, workers in enumerate(args.workers):
+        port = args.port + offset
+        env = dict(os.environ, FLASK_DEBUG='0', LOG_LEVEL='WARNING')
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, 'prefork.py'), args.module,
+                                 '--workers', str(workers), '--port', str(port)],
+                                cwd=args.workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_healthy(port):
+                print(f"{workers:>7} failed to start")
+                continue
+            time.sleep(0.5)
+            for path, bodies, rows in scenarios:
+                r = asyncio.run(run_load(f'http://127.0.0.1:{port}{path}', args.requests, args.concurrency, bodies))
+                r.update(workers=workers, route=path, rows_per_s=round(r['rps'] * rows, 1), pss_mb=pss_mb(proc.pid))
+                single.setdefault(path, r['rps'])
+                r['speedup'] = round(r['rps'] / single[path], 2) if single[path] else 0.0
+                results.append(r)
+                print(f"{workers:>7} {path:<15} {r['errors']:>6} {r['rps']:>9} {r['rows_per_s']:>10} "
+                      f"{r['speedup']:>8} {r['p99_ms']:>8} {r['pss_mb']:>7}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'module': args.module, 'concurrency': args.concurrency, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Import time and cold start of each server entry point.
+
+For every server this reports:
+- import ms: time to import the module in a fresh interpreter, without
+  loading the model (median of --runs)
+- heavy modules: which of pandas/sklearn/scipy/joblib/flask/sqlalchemy
+  that import pulled in
+- cold start s: time from spawning `python <script>` until the first
+  POST /predict succeeds (median of --runs)
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--workdir /path/with/models] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from synthetic import REPO_ROOT, load_features, applicants
+
+HEAVY_MODULES = ['pandas', 'sklearn', 'scipy', 'joblib', 'flask', 'sqlalchemy']
+
+# (name, script, predict path, extra environment)
+SERVERS = [
+    ('app', 'app.py', '/predict', {}),
+    ('app_complete', 'app_complete.py', '/predict', {}),
+    ('app_robust', 'app_robust.py', '/predict', {}),
+    ('async_server', 'async_server.py', '/predict', {}),
+    ('async_server[native]', 'async_server.py', '/predict', {'INFERENCE_ENGINE': 'native'}),
+    ('inference_app', 'inference_app.py', '/predict', {}),
+    ('inference_app[sklearn]', 'inference_app.py', '/predict', {'INFERENCE_ENGINE': 'sklearn'}),
+]
+
+IMPORT_PROBE = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'import_s': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def measure_import(module, workdir, env):
+    """(seconds, heavy modules loaded) for importing module in a fresh process"""
+    script = IMPORT_PROBE.format(root=REPO_ROOT, module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['import_s'], result['heavy']
+
+
+def measure_cold_start(script, port, path, body, workdir, env, timeout=120):
+    """Seconds from spawning the server until its first successful prediction"""
+    url = f'http://127.0.0.1:{port}{path}'
+    data = json.dumps(body).encode()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, script)], cwd=workdir,
+                            env=dict(env, PORT=str(port)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                return None
+            request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    response.read()
+                    return time.perf_counter() - started
+            except urllib.error.HTTPError:
+                return None
+            except OSError:
+                time.sleep(0.01)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--only', nargs='+', help='server names to run (default: all)')
+    parser.add_argument('--port', type=int, default=5301)
+    parser.add_argument('--workdir', default=REPO_ROOT, help='directory containing models/ (default: repo root)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    body = applicants(load_features(os.path.join(args.workdir, 'models')), 1)[0]
+    base_env = dict(os.environ, FLASK_DEBUG='0', LOG_LEVEL='WARNING', INFERENCE_PRELOAD='0')
+
+    print(f"{'server':<24} {'import ms':>10} {'cold start s':>13}  heavy modules")
+    results = []
+    for name, script, path, extra_env in SERVERS:
+        if args.only and name not in args.only:
+            continue
+        env = dict(base_env, **extra_env)
+        module = script[:-3]
+        try:
+            imports = [measure_import(module, args.workdir, env) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<24} import failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        env.pop('INFERENCE_PRELOAD')
+        starts = [measure_cold_start(script, args.port, path, body, args.workdir, env) for _ in range(args.runs)]
+        starts = [s for s in starts if s is not None]
+
+        r = {
+            'server': name,
+            'import_ms': round(median([s for s, _ in imports]) * 1000, 1),
+            'heavy_modules': imports[0][1],
+            'cold_start_s': round(median(starts), 2) if starts else None,
+        }
+        results.append(r)
+        cold_start = r['cold_start_s'] if starts else 'failed'
+        print(f"{name:<24} {r['import_ms']:>10} {cold_start:>13}  {', '.join(r['heavy_modules']) or '-'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
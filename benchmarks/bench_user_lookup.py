@@ -0,0 +1,99 @@
+"""Register/login latency in app_minimal.py as the user base grows.
+
+Fills the in-memory store with N synthetic users, then times a signup
+(register_user, which checks the email/phone indexes and adds a pending
+registration, plus verify_sms, which moves it into users_db and the
+indexes) and login_user. It also times the old full scan of users_db for
+comparison.
+
+Usage:
+    python benchmarks/bench_user_lookup.py [--sizes 1000 100000 1000000] [--ops 2000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import app_minimal  # noqa: E402
+from password_hasher import PasswordHasher  # noqa: E402
+
+# Index lookups are what is measured here, not password hashing
+app_minimal.password_hasher = PasswordHasher('pbkdf2', cost=1, workers=1)
+
+PASSWORD = 'correct-horse'
+
+
+def populate(n):
+    """Grow the store to n verified users with a password set"""
+    password_hash = app_minimal.password_hasher.hash(PASSWORD)
+    for i in range(len(app_minimal.users_db), n):
+        app_minimal.add_user(f'u{i}', {
+            'full_name': f'User {i}',
+            'email': f'user{i}@example.com',
+            'phone_number': f'+2547{i:08d}',
+            'verification_method': 'email',
+            'verified': True,
+            'password_hash': password_hash,
+            'created_at': '2024-01-01T00:00:00'
+        })
+
+
+def linear_find(email):
+    for uid, data in app_minimal.users_db.items():
+        if data['email'] == email:
+            return uid
+    return None
+
+
+def per_op_us(fn, ops):
+    started = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return (time.perf_counter() - started) / ops * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--scan-ops', type=int, default=20, help='ops for the (slow) linear scan baseline')
+    args = parser.parse_args()
+
+    print(f"{'users':>9} {'signup us':>12} {'login us':>9} {'linear scan us':>15}")
+    for n in sorted(args.sizes):
+        populate(n)
+        probe = [f'user{(i * 7919) % n}@example.com' for i in range(max(args.ops, args.scan_ops))]
+
+        def register(i):
+            status, registered = app_minimal.register_user({
+                'full_name': 'New', 'email': f'new{n}-{i}@example.com',
+                'phone_number': f'+2548{n:08d}{i:05d}', 'verification_method': 'email'
+            })
+            status, _ = app_minimal.verify_sms({'user_id': registered['user_id'],
+                                                'code': registered['verification_code']})
+            assert status == 200
+
+        def login(i):
+            status, _ = app_minimal.login_user({'email': probe[i], 'password': PASSWORD})
+            assert status == 200
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            register_us = per_op_us(register, args.ops)
+        login_us = per_op_us(login, args.ops)
+        scan_us = per_op_us(lambda i: linear_find(probe[i]), args.scan_ops)
+
+        # Drop the users registered above so the next size starts clean
+        for i in range(args.ops):
+            uid = app_minimal.users_by_email.pop(f'new{n}-{i}@example.com')
+            app_minimal.users_by_phone.pop(app_minimal.users_db.pop(uid)['phone_number'])
+
+        print(f"{n:>9} {register_us:>12.1f} {login_us:>9.1f} {scan_us:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Register latency of app_with_auth.py with inline vs. queued verification sends.
+
+Each mode runs in a fresh process on a new SQLite file. The verification
+transport is a MemoryTransport that sleeps --provider-ms per call, which
+stands in for a remote email/SMS API. N threads then register new users
+through Flask test clients. The benchmark reports register req/s and
+p50/p99 latency, the time until the last message was delivered, and how
+many provider calls that took.
+
+Modes (environment read by verification_dispatch.py):
+    inline  VERIFICATION_ASYNC=0, each register waits for its send
+    queued  VERIFICATION_ASYNC=1, sends are batched by background workers
+
+Usage:
+    python benchmarks/bench_verification_dispatch.py [--threads 1 16] [-n 500] [--provider-ms 150]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import REPO_ROOT, new_user
+from bench_auth_store import drive
+
+MODES = {
+    'inline': {'VERIFICATION_ASYNC': '0'},
+    'queued': {'VERIFICATION_ASYNC': '1'},
+}
+
+
+def run_worker(args):
+    """In a fresh process: register users against a slow stand-in provider"""
+    sys.path.insert(0, REPO_ROOT)
+    import app_with_auth
+    from auth import verification_dispatcher
+    from verification_dispatch import MemoryTransport
+
+    transport = MemoryTransport(latency_ms=args.provider_ms)
+    verification_dispatcher.transport = transport
+
+    def make_request(i):
+        body = new_user(i, run_id=3)
+        body['verification_method'] = 'email' if i % 2 else 'sms'
+        return '/api/auth/register', body
+
+    started = time.perf_counter()
+    register = drive(app_with_auth.app, args.threads[0], args.requests, make_request)
+    verification_dispatcher.drain(60)
+    register['delivered_s'] = round(time.perf_counter() - started, 2)
+    register['messages'] = sum(len(sent) for sent in transport.sent.values())
+    register['provider_calls'] = sum(transport.batches.values())
+    print(json.dumps(register))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('-n', '--requests', type=int, default=500)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--provider-ms', type=float, default=150, help='simulated provider latency per call')
+    parser.add_argument('--hash-cost', type=int, default=1000, help='PBKDF2 iterations for passwords')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    scratch = tempfile.mkdtemp(prefix='bench_verification_')
+    print(f"{'mode':<7} {'threads':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'delivered s':>11} {'messages':>8} {'calls':>6}")
+    results = []
+    try:
+        for mode in args.modes:
+            for threads in args.threads:
+                db_path = os.path.join(scratch, f'{mode}_{threads}.db')
+                env = dict(os.environ, **MODES[mode], DATABASE_URL=f'sqlite:///{db_path}', LOG_LEVEL='WARNING',
+                           PASSWORD_HASHER='pbkdf2', PASSWORD_HASH_COST=str(args.hash_cost))
+                output = subprocess.run([sys.executable, '-W', 'ignore', __file__, '--worker',
+                                         '--threads', str(threads), '--requests', str(args.requests),
+                                         '--provider-ms', str(args.provider_ms)],
+                                        env=env, capture_output=True, text=True)
+                if output.returncode != 0:
+                    print(f"{mode:<7} {threads:>7} failed: {output.stderr.strip().splitlines()[-1:]}")
+                    continue
+                r = dict(json.loads(output.stdout.strip().splitlines()[-1]), mode=mode, threads=threads)
+                results.append(r)
+                print(f"{mode:<7} {threads:>7} {r['rps']:>9} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7} "
+                      f"{r['delivered_s']:>11} {r['messages']:>8} {r['provider_calls']:>6}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'requests': args.requests, 'provider_ms': args.provider_ms, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
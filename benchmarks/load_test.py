@@ -0,0 +1,200 @@
+"""HTTP load test for the prediction servers.
+
+Opens C keep-alive connections and sends N POST requests in total across
+them, then reports throughput and latency percentiles. Connections that fail
+or return non-2xx responses are counted as errors. Request bodies are
+synthetic applicants (see synthetic.py).
+
+With --compare, each server (app_minimal.py, async_server.py,
+app_complete.py) is started on its own port and loaded in turn.
+
+Usage:
+    python benchmarks/load_test.py --url http://localhost:5000/predict -c 200 -n 20000
+    python benchmarks/load_test.py --compare -c 200 -n 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+from synthetic import REPO_ROOT, load_features, applicants
+
+# (name, script, predict path); app_minimal only has the mock /api/predict
+SERVERS = [
+    ('app_minimal', 'app_minimal.py', '/api/predict'),
+    ('async_server', 'async_server.py', '/predict'),
+    ('app_complete', 'app_complete.py', '/predict'),
+]
+
+
+async def open_connection(host, port, retries=50):
+    for _ in range(retries):
+        try:
+            return await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(0.05)
+    return await asyncio.open_connection(host, port)
+
+
+async def read_response(reader):
+    """Read one HTTP response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length = None
+    keep_alive = not status_line.startswith(b'HTTP/1.0')
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value.strip().lower() == 'keep-alive'
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def worker(host, port, make_request, counter, latencies, errors):
+    reader = writer = None
+    while counter[0] < counter[1]:
+        i = counter[0]
+        counter[0] += 1
+        try:
+            if writer is None:
+                reader, writer = await open_connection(host, port)
+            request = make_request(i)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 300:
+                errors[0] += 1
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            errors[0] += 1
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def build_request(host, port, path, body, headers=None):
+    payload = json.dumps(body).encode()
+    extra = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+    return (
+        f'POST {path} HTTP/1.1\r\n'
+        f'Host: {host}:{port}\r\n'
+        'Content-Type: application/json\r\n'
+        f'Content-Length: {len(payload)}\r\n'
+        f'{extra}'
+        'Connection: keep-alive\r\n\r\n'
+    ).encode() + payload
+
+
+async def run_load(url, total, concurrency, bodies, headers=None):
+    """POST `total` requests; bodies is a list (cycled) or a function of the request index"""
+    parsed = urlparse(url)
+    host, port, path = parsed.hostname, parsed.port or 80, parsed.path or '/'
+    if callable(bodies):
+        make_request = lambda i: build_request(host, port, path, bodies(i), headers)  # noqa: E731
+    else:
+        prebuilt = [build_request(host, port, path, body, headers) for body in bodies]
+        make_request = lambda i: prebuilt[i % len(prebuilt)]  # noqa: E731
+
+    counter, latencies, errors = [0, total], [], [0]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, make_request, counter, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+    return {
+        'requests': total,
+        'errors': errors[0],
+        'seconds': round(elapsed, 2),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def wait_healthy(port, timeout=60):
+    """Wait until the server answers HTTP (any status; not every app has /health)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1):
+                return True
+        except urllib.error.HTTPError:
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def print_row(name, r):
+    print(f"{name:<14} {r['requests']:>8} {r['errors']:>7} {r['rps']:>9} "
+          f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000/predict')
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('-c', '--concurrency', type=int, default=100)
+    parser.add_argument('--compare', action='store_true', help='start and load each server in turn')
+    parser.add_argument('--base-port', type=int, default=5101)
+    parser.add_argument('--workdir', default=REPO_ROOT, help='directory containing models/ (default: repo root)')
+    args = parser.parse_args()
+
+    bodies = applicants(load_features(os.path.join(args.workdir, 'models')), 1000)
+    header = f"{'server':<14} {'requests':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+
+    if not args.compare:
+        print(header)
+        print_row(urlparse(args.url).path, asyncio.run(
+            run_load(args.url, args.requests, args.concurrency, bodies)))
+        return
+
+    print(header)
+    for offset, (name, script, path) in enumerate(SERVERS):
+        port = args.base_port + offset
+        env = dict(os.environ, PORT=str(port), FLASK_DEBUG='0')
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, script)], cwd=args.workdir,
+                                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_healthy(port):
+                print(f"{name:<14} failed to start")
+                continue
+            url = f'http://127.0.0.1:{port}{path}'
+            print_row(name, asyncio.run(run_load(url, args.requests, args.concurrency, bodies)))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
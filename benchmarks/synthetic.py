@@ -0,0 +1,62 @@
+"""Synthetic applicants and users for the benchmarks.
+
+Applicants carry every feature in selected_features.json. Categorical
+features take labels from feature_encoder.CATEGORICAL_MAPPINGS, and numeric
+features take values in plausible ranges. Generation is seeded, so runs
+are reproducible.
+"""
+import json
+import os
+import random
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from feature_encoder import CATEGORICAL_MAPPINGS  # noqa: E402
+
+# feature -> (low, high) for numeric features; anything else is 0..10
+NUMERIC_RANGES = {
+    'Age': (18, 75),
+    'managingday2day_score': (0, 100),
+    'Financial_literacy_index_fnl': (0, 100),
+    'new_fh_score': (0, 100),
+    'fl_score': (0, 100),
+    'copewithrisk_score': (0, 100),
+    'tot_savings': (0, 20000),
+    'Quintiles': (1, 5),
+}
+
+PASSWORD = 'Bench-Pass-123!'
+
+
+def load_features(model_dir=os.path.join(REPO_ROOT, 'models')):
+    with open(os.path.join(model_dir, 'selected_features.json'), 'r') as f:
+        return json.load(f)['selected_features']
+
+
+def applicant(features, rng):
+    record = {}
+    for feature in features:
+        spec = CATEGORICAL_MAPPINGS.get(feature)
+        if spec is not None and spec['values']:
+            record[feature] = rng.choice(list(spec['values']))
+        else:
+            low, high = NUMERIC_RANGES.get(feature, (0, 10))
+            record[feature] = rng.randint(low, high)
+    return record
+
+
+def applicants(features, n, seed=0):
+    rng = random.Random(seed)
+    return [applicant(features, rng) for _ in range(n)]
+
+
+def new_user(i, run_id=0):
+    """Registration body that passes auth.py's email/phone validation"""
+    return {
+        'full_name': f'Bench User {i}',
+        'email': f'bench{run_id}_{i}@example.com',
+        'phone_number': f'2547{(run_id * 1000003 + i) % 10 ** 8:08d}',
+        'verification_method': 'sms'
+    }
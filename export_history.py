@@ -0,0 +1,113 @@
+"""Bulk export of stored prediction feature vectors to Parquet or Arrow.
+
+Streams PredictionHistory rows that have a packed feature_vector (see
+HISTORY_INPUT_STORAGE in app_with_auth.py) straight from the database. Each
+batch of blobs is decoded with a single np.frombuffer into an (N, F) float32
+matrix, and written out with one column per feature. No JSON is parsed,
+and only one batch is held in memory at a time.
+
+Usage:
+    python export_history.py history.parquet
+    python export_history.py history.arrow --since 2024-01-01 --model-version 1.0
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import sqlalchemy as sa
+
+from model_loader import FEATURES_PATH
+
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///instance/financial_risk.db')
+
+
+def iter_batches(engine, batch_size, since=None, user_id=None, model_version=None):
+    """Yield lists of (id, user_id, created_at, model_version, risk_score, risk_level, blob)"""
+    history = sa.Table('prediction_history', sa.MetaData(), autoload_with=engine)
+    query = sa.select(
+        history.c.id, history.c.user_id, history.c.created_at, history.c.model_version,
+        history.c.risk_score, history.c.risk_level, history.c.feature_vector
+    ).where(history.c.feature_vector.isnot(None)).order_by(history.c.id)
+    if since is not None:
+        query = query.where(history.c.created_at >= since)
+    if user_id is not None:
+        query = query.where(history.c.user_id == user_id)
+    if model_version is not None:
+        query = query.where(history.c.model_version == model_version)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for rows in result.partitions(batch_size):
+            yield rows
+
+
+def to_table(rows, feature_names):
+    import pyarrow as pa
+    ids, user_ids, created_at, versions, scores, levels, blobs = zip(*rows)
+    n_features = len(feature_names)
+    matrix = np.frombuffer(b''.join(blobs), dtype='<f4')
+    if matrix.size != len(rows) * n_features:
+        raise ValueError(f'Feature vectors do not match the {n_features} configured features')
+    matrix = matrix.reshape(len(rows), n_features)
+
+    columns = {
+        'id': pa.array(ids, pa.int64()),
+        'user_id': pa.array(user_ids, pa.int64()),
+        'created_at': pa.array(created_at, pa.timestamp('us')),
+        'model_version': pa.array(versions, pa.string()),
+        'risk_score': pa.array(scores, pa.float64()),
+        'risk_level': pa.array(levels, pa.string()),
+    }
+    for j, name in enumerate(feature_names):
+        columns[name] = pa.array(matrix[:, j])
+    return pa.table(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export stored prediction feature vectors')
+    parser.add_argument('output', help='output .parquet, .arrow or .feather file')
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    parser.add_argument('--features', default=FEATURES_PATH, help='selected_features.json the vectors were encoded with')
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--since', type=datetime.fromisoformat, default=None, help='only rows created at or after this time')
+    parser.add_argument('--user-id', type=int, default=None)
+    parser.add_argument('--model-version', default=None)
+    args = parser.parse_args()
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with open(args.features, 'r') as f:
+        feature_names = json.load(f)['selected_features']
+
+    engine = sa.create_engine(args.database_url)
+    writer = None
+    rows_written = 0
+    started = time.perf_counter()
+    try:
+        for rows in iter_batches(engine, args.batch_size, args.since, args.user_id, args.model_version):
+            table = to_table(rows, feature_names)
+            if writer is None:
+                if args.output.endswith('.parquet'):
+                    writer = pq.ParquetWriter(args.output, table.schema)
+                else:
+                    writer = pa.ipc.new_file(args.output, table.schema)
+            writer.write_table(table)
+            rows_written += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    if writer is None:
+        print("⚠️ No predictions with stored feature vectors found")
+        return 1
+    print(f"✅ Exported {rows_written} rows in {elapsed:.1f}s -> {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
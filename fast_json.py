@@ -0,0 +1,85 @@
+"""JSON encode/decode layer for the API servers.
+
+Uses orjson when it is installed and falls back to the stdlib json module.
+JSON_BACKEND=json forces the fallback.
+
+    loads / dumps        bytes in, bytes out; numpy scalars and arrays are accepted
+    json_response        Flask response around encoded bytes, skipping jsonify
+    use_fast_json(app)   makes jsonify and request.get_json() use the same backend
+    now_iso()            request timestamps without pandas
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+try:
+    if JSON_BACKEND == 'json':
+        raise ImportError
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), default=_default)
+
+    def dumps(obj):
+        return _encoder.encode(obj).encode()
+
+    def loads(data):
+        return json.loads(data)
+
+
+def now_iso():
+    """Local time as an ISO 8601 string, as pd.Timestamp.now().isoformat() gave"""
+    return datetime.now().isoformat()
+
+
+def json_response(app, body, status=200):
+    """Flask response around already-encoded JSON bytes (skips jsonify)"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+
+_provider_class = None
+
+
+def use_fast_json(app):
+    """Make app's jsonify/get_json use this module's backend"""
+    global _provider_class
+    if _provider_class is None:
+        from flask.json.provider import DefaultJSONProvider
+
+        class FastJSONProvider(DefaultJSONProvider):
+            def dumps(self, obj, **kwargs):
+                return dumps(obj).decode()
+
+            def loads(self, s, **kwargs):
+                return loads(s)
+
+            def response(self, *args, **kwargs):
+                obj = self._prepare_response_obj(args, kwargs)
+                return self._app.response_class(dumps(obj), mimetype='application/json')
+
+        _provider_class = FastJSONProvider
+    app.json = _provider_class(app)
@@ -0,0 +1,163 @@
+"""Feature encoding for the financial risk model.
+
+The categorical mappings used to live inline in each /predict handler and
+were rebuilt on every request. They are declared once here and compiled
+into a fixed per-column plan when the encoder is created at load time.
+"""
+import json
+
+import numpy as np
+
+# feature -> {'values': label -> code, 'default': code for unknown labels}
+# 'numeric': True means digit strings are parsed as numbers before lookup
+CATEGORICAL_MAPPINGS = {
+    'Loan_usage': {
+        'values': {'Personal': 1, 'Business': 2, 'Education': 3, 'Emergency': 4, 'Other': 5},
+        'default': 0
+    },
+    'county': {
+        'values': {'Nairobi': 1, 'Mombasa': 2, 'Kisumu': 3, 'Nakuru': 4, 'Eldoret': 5, 'Other': 6},
+        'default': 0
+    },
+    'Sex': {
+        'values': {'Male': 1},
+        'default': 2
+    },
+    'Marital': {
+        'values': {'Single': 1, 'Married': 2, 'Divorced': 3, 'Widowed': 4},
+        'default': 0
+    },
+    'Education': {
+        'values': {'Primary': 1, 'Secondary': 2, 'College': 3, 'University': 4, 'Postgraduate': 5},
+        'default': 0
+    },
+    'financial_status': {
+        'values': {'Poor': 1, 'Fair': 2, 'Good': 3, 'Excellent': 4},
+        'default': 0
+    },
+    'Quintiles': {
+        'values': {},
+        'default': 3,
+        'numeric': True
+    },
+}
+
+
+class FeatureEncoder:
+    """Encode applicant dicts into rows ordered like `selected_features`"""
+
+    def __init__(self, selected_features, mappings=None):
+        self.selected_features = list(selected_features)
+        self.n_features = len(self.selected_features)
+        mappings = CATEGORICAL_MAPPINGS if mappings is None else mappings
+
+        # Lookup tables are built once: label -> float code
+        self._lookups = {}
+        for feature, spec in mappings.items():
+            table = {label: float(code) for label, code in spec['values'].items()}
+            self._lookups[feature] = (table, float(spec['default']), spec.get('numeric', False))
+
+        # Column plan in model order: (feature name, lookup or None)
+        self._plan = tuple(
+            (feature, self._lookups.get(feature)) for feature in self.selected_features
+        )
+
+    @classmethod
+    def from_config(cls, features_path, mappings=None):
+        """Build an encoder from a selected_features.json file"""
+        with open(features_path, 'r') as f:
+            feature_config = json.load(f)
+        return cls(feature_config.get('selected_features', []), mappings)
+
+    def convert(self, feature, value):
+        """Map a categorical label to its code; other values pass through"""
+        lookup = self._lookups.get(feature)
+        if lookup is None or not isinstance(value, str):
+            return value
+        table, default, numeric = lookup
+        if numeric and value.isdigit():
+            return int(value)
+        return table.get(value, default)
+
+    def _values(self, record):
+        """Encode one record into a list of floats plus its missing features"""
+        values = []
+        missing = []
+        append = values.append
+        # One try around the loop keeps the per-feature path free of exception setup
+        try:
+            for feature, lookup in self._plan:
+                if feature not in record:
+                    missing.append(feature)
+                    append(0.0)
+                    continue
+                value = record[feature]
+                if lookup is not None and isinstance(value, str):
+                    table, default, numeric = lookup
+                    if numeric and value.isdigit():
+                        append(float(value))
+                    else:
+                        append(table.get(value, default))
+                else:
+                    append(float(value))
+        except (TypeError, ValueError) as e:
+            raise type(e)(f'Invalid value for {feature}: {e}') from None
+        return values, missing
+
+    def encode(self, record):
+        """Encode one applicant into a (F,) float32 row.
+
+        Returns (row, missing_features). Missing features are encoded as 0.
+        Raises ValueError/TypeError, naming the feature, for values that are
+        not numeric.
+        """
+        values, missing = self._values(record)
+        return np.array(values, dtype=np.float32), missing
+
+    def encode_many(self, records, errors=None):
+        """Encode many applicants into one (N, F) float32 matrix.
+
+        Returns (matrix, missing, errors). Rows listed in `errors` are skipped,
+        and rows that fail to encode are zeroed and added to `errors`.
+        """
+        errors = dict(errors or {})
+        matrix = np.zeros((len(records), self.n_features), dtype=np.float32)
+        missing = [[] for _ in records]
+
+        for i, record in enumerate(records):
+            if i in errors:
+                continue
+            try:
+                matrix[i], missing[i] = self._values(record)
+            except (TypeError, ValueError) as e:
+                errors[i] = str(e)
+
+        return matrix, missing, errors
+
+    def encode_columns(self, columns, n_rows):
+        """Encode column arrays (e.g. one chunk of a CSV) into an (N, F) matrix.
+
+        `columns` maps feature name -> 1-D array. Absent columns and empty
+        cells are encoded as 0 like missing features in the API. Returns
+        (matrix, invalid) where `invalid` flags rows with unconvertible values.
+        """
+        matrix = np.zeros((n_rows, self.n_features), dtype=np.float32)
+        invalid = np.zeros(n_rows, dtype=bool)
+
+        for j, (feature, lookup) in enumerate(self._plan):
+            values = columns.get(feature)
+            if values is None:
+                continue
+            if values.dtype == object:
+                converted = np.zeros(n_rows, dtype=np.float64)
+                for i, value in enumerate(values):
+                    if value is None or value != value:
+                        continue
+                    try:
+                        converted[i] = float(self.convert(feature, value))
+                    except (TypeError, ValueError):
+                        invalid[i] = True
+                values = converted
+            matrix[:, j] = np.nan_to_num(values.astype(np.float32), nan=0.0)
+
+        return matrix, invalid
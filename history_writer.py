@@ -0,0 +1,230 @@
+"""Write-behind persistence for PredictionHistory rows.
+
+/api/predict used to add and commit one PredictionHistory row per request,
+so every prediction waited on a database round trip and fsync. Rows are
+now queued in memory and written by a background thread in one bulk
+INSERT once `flush_size` rows are waiting or the oldest has waited
+`flush_interval_ms`. If the database rejects a row, the batch is retried
+in halves so only the offending rows are dropped. The queue is drained on
+shutdown (atexit) and its depth is reported through stats().
+
+Every row gets its id up front, so /api/predict can return predictionId
+even though the row is written later. Ids are reserved in blocks of
+HISTORY_ID_BLOCK from the id_blocks table, one UPDATE per block, so
+several worker processes never hand out the same id.
+
+add() never waits on the database: if the queue is full (the database is
+stalled or too slow), the row is dropped, logged and counted in
+stats()['rows_dropped'], and the id returned for it is never written.
+
+Set HISTORY_WRITE_BEHIND=0 to write each row synchronously again.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from models import db, IdBlock, PredictionHistory
+from app_logging import get_logger
+
+HISTORY_WRITE_BEHIND = os.getenv('HISTORY_WRITE_BEHIND', '1') == '1'
+HISTORY_FLUSH_SIZE = int(os.getenv('HISTORY_FLUSH_SIZE', '500'))
+HISTORY_FLUSH_INTERVAL_MS = float(os.getenv('HISTORY_FLUSH_INTERVAL_MS', '200'))
+HISTORY_MAX_QUEUE = int(os.getenv('HISTORY_MAX_QUEUE', '100000'))
+HISTORY_ID_BLOCK = int(os.getenv('HISTORY_ID_BLOCK', '1000'))
+
+logger = get_logger('history_writer')
+
+# Errors caused by the rows themselves (constraint violations, bad values)
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class HistoryWriter:
+    """Buffer PredictionHistory rows and insert them in batches"""
+
+    def __init__(self, app, enabled=HISTORY_WRITE_BEHIND, flush_size=HISTORY_FLUSH_SIZE,
+                 flush_interval_ms=HISTORY_FLUSH_INTERVAL_MS, max_queue=HISTORY_MAX_QUEUE,
+                 id_block=HISTORY_ID_BLOCK):
+        self.app = app
+        self.enabled = enabled
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.id_block = max(1, int(id_block))
+
+        # Ids reserved for this process: next to hand out, and end of the block
+        self._id_lock = threading.Lock()
+        self._next_id = self._id_end = 0
+
+        # Bounded so a stalled database can't eat memory; add() drops rows when full
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        # Held across the stopped check and the put, so no row lands behind close()'s sentinel
+        self._submit_lock = threading.Lock()
+        self._stopped = False
+
+        # Metrics
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+
+        self._thread = None
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _restart_after_fork(self):
+        """fork() doesn't copy the writer thread; the child gets its own queue and writer.
+
+        Rows queued in the parent stay with the parent, which still flushes them.
+        """
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        # The parent keeps handing out the rest of its block
+        self._id_lock = threading.Lock()
+        self._next_id = self._id_end = 0
+        self.rows_written = self.rows_failed = self.rows_dropped = self.flushes = 0
+        if not self._stopped:
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def _reserve_ids(self):
+        """Reserve the next id_block ids in the id_blocks table; returns (first, end)"""
+        blocks = IdBlock.__table__
+        name = PredictionHistory.__tablename__
+        while True:
+            try:
+                with db.engine.begin() as conn:
+                    updated = conn.execute(blocks.update().where(blocks.c.name == name)
+                                           .values(next_id=blocks.c.next_id + self.id_block)).rowcount
+                    if updated:
+                        end = conn.execute(select(blocks.c.next_id).where(blocks.c.name == name)).scalar()
+                        return end - self.id_block, end
+                    # First block: continue after the rows already in the table
+                    first = conn.execute(select(func.coalesce(func.max(PredictionHistory.id), 0) + 1)).scalar()
+                    conn.execute(blocks.insert().values(name=name, next_id=first + self.id_block))
+                    return first, first + self.id_block
+            except IntegrityError:
+                continue  # another process created the row first; reserve from it
+
+    def new_id(self):
+        """Next prediction history id for this process"""
+        with self._id_lock:
+            if self._next_id >= self._id_end:
+                self._next_id, self._id_end = self._reserve_ids()
+            self._next_id += 1
+            return self._next_id - 1
+
+    def add(self, **row):
+        """Record one prediction; returns its id (the row may still be queued)"""
+        row.setdefault('created_at', datetime.utcnow())
+        row['id'] = self.new_id()
+        with self._submit_lock:
+            queued = self.enabled and not self._stopped
+            if queued:
+                try:
+                    self._queue.put_nowait(row)
+                except queue.Full:
+                    with self._lock:
+                        self.rows_dropped += 1
+                    logger.error("❌ Prediction history queue full (%d rows), dropping row for user %s",
+                                 self._queue.maxsize, row.get('user_id'))
+        if not queued:
+            db.session.add(PredictionHistory(**row))
+            db.session.commit()
+        return row['id']
+
+    def close(self):
+        """Stop the writer after flushing everything already queued"""
+        with self._submit_lock:
+            if self._stopped or self._thread is None:
+                return
+            self._stopped = True
+            # The writer keeps draining, so this only waits for a moment if the queue is full
+            self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Block for the first row, then gather more until size or time limit"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        rows = [first]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(rows) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            try:
+                row = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                # Write what we have, then stop on the next loop
+                self._queue.put(None)
+                break
+            rows.append(row)
+        return rows
+
+    def _run(self):
+        while True:
+            rows = self._collect()
+            if rows is None:
+                return
+            self._flush(rows)
+
+    def _flush(self, rows):
+        started = time.perf_counter()
+        with self.app.app_context():
+            written = self._insert(rows)
+        with self._lock:
+            self.rows_written += written
+            self.rows_failed += len(rows) - written
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _insert(self, rows):
+        """Insert rows in one statement; if a row is rejected, bisect so only bad rows are dropped.
+
+        Returns how many rows were written. Errors that aren't about a row
+        (database down, locked, ...) fail the whole batch as before.
+        """
+        try:
+            db.session.execute(PredictionHistory.__table__.insert(), rows)
+            db.session.commit()
+            return len(rows)
+        except ROW_ERRORS as e:
+            db.session.rollback()
+            if len(rows) == 1:
+                logger.error("❌ Dropping prediction history row for user %s: %s", rows[0].get('user_id'), e)
+                return 0
+            logger.warning("⚠️ Writing %d prediction history rows failed, retrying in halves: %s", len(rows), e)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("❌ Failed to write %d prediction history rows: %s", len(rows), e)
+            return 0
+        middle = len(rows) // 2
+        return self._insert(rows[:middle]) + self._insert(rows[middle:])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'write_behind': self.enabled,
+                'queue_depth': self._queue.qsize(),
+                'flush_size': self.flush_size,
+                'flush_interval_ms': self.flush_interval * 1000,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'rows_failed': self.rows_failed,
+                'rows_dropped': self.rows_dropped,
+                'mean_rows_per_flush': round(self.rows_written / self.flushes, 2) if self.flushes else 0.0,
+                'last_flush_ms': round(self.last_flush_ms, 3)
+            }
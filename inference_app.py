@@ -0,0 +1,198 @@
+"""Slim inference-only entry point.
+
+Serves the model and nothing else: no Flask, pandas, database or auth, so a
+worker is ready as soon as numpy and the model are loaded. INFERENCE_ENGINE
+defaults to 'auto' here, which serves from the native artifact and only
+imports joblib/sklearn when no native artifact exists.
+
+The model is loaded when the module is imported (INFERENCE_PRELOAD=0 to
+skip), so a prefork server loads it once in the master. preload() then
+calls gc.freeze(): the garbage collector stops scanning the preloaded
+objects, so forked workers don't write to those pages and keep sharing
+them copy-on-write.
+
+Routes:
+    GET  /health, /metrics
+    POST /predict, /predict/batch
+
+Usage:
+    PORT=5000 python inference_app.py             # threaded wsgiref server
+    gunicorn --preload -w 4 inference_app:app     # any WSGI server works
+"""
+import gc
+import os
+from http import HTTPStatus
+
+from app_logging import get_logger
+from batch_scoring import parse_batch_body, score_batch, risk_level_for
+from fast_json import loads, dumps, now_iso
+from model_loader import ModelRegistry, MODEL_DIR
+from prediction_cache import PredictionCache
+from stage_metrics import StageMetrics
+
+logger = get_logger('inference_app')
+
+PORT = int(os.getenv('PORT', '5000'))
+ENGINE = os.getenv('INFERENCE_ENGINE', 'auto')
+PRELOAD = os.getenv('INFERENCE_PRELOAD', '1') == '1'
+MAX_BODY_BYTES = int(os.getenv('INFERENCE_MAX_BODY_BYTES', str(16 * 1024 * 1024)))
+
+registry = ModelRegistry(engine=ENGINE, model_dir=MODEL_DIR)
+prediction_cache = PredictionCache()
+latency = StageMetrics()
+
+registry.on_swap(lambda bundle: prediction_cache.clear())
+
+STATUS_LINES = {status.value: f'{status.value} {status.phrase}' for status in HTTPStatus}
+BASE_HEADERS = [
+    ('Content-Type', 'application/json'),
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Content-Type, Authorization'),
+]
+
+
+def preload():
+    """Load the model if needed, then freeze the heap for copy-on-write sharing"""
+    if registry.current() is None:
+        try:
+            bundle = registry.reload()
+            logger.info("📊 Model loaded (version %s, %s)", bundle.version, type(bundle.model).__name__)
+        except Exception as e:
+            logger.error("❌ Model not loaded, /predict disabled: %s", e)
+    gc.collect()
+    gc.freeze()
+    return registry.current()
+
+
+def predict_one(bundle, body):
+    stopwatch = latency.stopwatch()
+    try:
+        data = loads(body)
+    except ValueError:
+        return 400, {'error': 'Invalid JSON body'}
+    if not isinstance(data, dict):
+        return 400, {'error': 'Body must be a JSON object'}
+    stopwatch.lap('parse')
+
+    feature_vector, missing_features = bundle.encoder.encode(data)
+    stopwatch.lap('encode')
+
+    cache_key = PredictionCache.make_key(feature_vector, bundle.generation)
+    risk_probability = prediction_cache.get(cache_key)
+    if risk_probability is None:
+        risk_probability = float(bundle.model.predict_proba(feature_vector.reshape(1, -1))[0][1])
+        prediction_cache.put(cache_key, risk_probability)
+    stopwatch.lap('inference')
+
+    result = {
+        'riskScore': round(risk_probability, 4),
+        'riskLevel': risk_level_for(risk_probability),
+        'confidence': round(risk_probability * 100, 2),
+        'featuresUsed': len(feature_vector),
+        'missingFeatures': missing_features,
+        'timestamp': now_iso()
+    }
+    stopwatch.total()
+    return 200, result
+
+
+def predict_many(bundle, body, content_type):
+    stopwatch = latency.stopwatch()
+    try:
+        records, errors = parse_batch_body(body, content_type)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    stopwatch.lap('batch_parse')
+
+    results = score_batch(bundle.model, bundle.encoder, records, errors)
+    stopwatch.lap('batch_score')
+    stopwatch.total('batch_total')
+    return 200, {
+        'results': results,
+        'count': len(results),
+        'failed': sum(1 for r in results if 'error' in r),
+        'timestamp': now_iso()
+    }
+
+
+def dispatch(environ):
+    """Route one request; returns (status, response dict or None)"""
+    method = environ['REQUEST_METHOD']
+    path = environ.get('PATH_INFO') or '/'
+
+    if method == 'OPTIONS':
+        return 200, None
+
+    if method == 'GET':
+        if path == '/health':
+            bundle = registry.current()
+            return 200, {
+                'status': 'healthy',
+                'mode': 'inference',
+                'model_loaded': bundle is not None,
+                'model_version': bundle.version if bundle else None,
+                'engine': type(bundle.model).__name__ if bundle else None,
+                'pid': os.getpid()
+            }
+        if path == '/metrics':
+            return 200, {'latency': latency.stats(), 'prediction_cache': prediction_cache.stats()}
+        return 404, {'error': 'Not found'}
+
+    if method != 'POST':
+        return 405, {'error': 'Method not allowed'}
+    if path not in ('/predict', '/predict/batch'):
+        return 404, {'error': 'Not found'}
+
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return 400, {'error': 'Invalid Content-Length'}
+    if length > MAX_BODY_BYTES:
+        return 413, {'error': f'Body too large (max {MAX_BODY_BYTES} bytes)'}
+    body = environ['wsgi.input'].read(length)
+
+    # One bundle for the whole request, even if a reload happens meanwhile
+    bundle = registry.current()
+    if bundle is None:
+        return 500, {'error': 'Model not loaded'}
+    if path == '/predict/batch':
+        return predict_many(bundle, body, environ.get('CONTENT_TYPE', ''))
+    return predict_one(bundle, body)
+
+
+def app(environ, start_response):
+    """WSGI entry point"""
+    try:
+        status, result = dispatch(environ)
+    except Exception as e:
+        logger.error("❌ Request failed: %s", e)
+        status, result = 500, {'error': str(e)}
+
+    payload = b'' if result is None else dumps(result)
+    start_response(STATUS_LINES[status], BASE_HEADERS + [('Content-Length', str(len(payload)))])
+    return [payload]
+
+
+if PRELOAD:
+    preload()
+
+
+if __name__ == '__main__':
+    import socketserver
+    from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+    class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = make_server('0.0.0.0', PORT, app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    logger.info("🚀 Inference server on http://localhost:%d (pid %d)", PORT, os.getpid())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Server stopped")
@@ -0,0 +1,161 @@
+"""Micro-batching for single-row /predict requests.
+
+Concurrent requests are queued and scored together in one model call once
+either `max_batch_size` rows are waiting or the oldest row has waited
+`max_wait_ms`. Each caller blocks only until its own row is scored.
+
+Rows are submitted together with the model they should be scored by, so a
+flush that straddles a model reload scores each row on the model its
+request started with.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into batched model calls"""
+
+    def __init__(self, score_fn, max_batch_size=32, max_wait_ms=2.0, wait_samples=2048):
+        # score_fn(matrix, model) takes an (N, F) matrix and returns N probabilities
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Held across the stopped check and the put, so no row lands behind close()'s sentinel
+        self._submit_lock = threading.Lock()
+        self._stopped = False
+
+        # Metrics
+        self._batches = 0
+        self._rows = 0
+        self._size_counts = {}
+        self._waits = deque(maxlen=wait_samples)
+        self._max_wait_seen = 0.0
+
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _restart_after_fork(self):
+        """fork() doesn't copy the worker thread; start a fresh queue and worker in the child"""
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        if not self._stopped:
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, feature_vector, model=None, timeout=None):
+        """Queue one feature row and block until its probability is ready"""
+        row = np.asarray(feature_vector, dtype=np.float32)
+        future = Future()
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError('Micro-batcher is stopped')
+            self._queue.put((row, time.perf_counter(), future, model))
+        return future.result(timeout)
+
+    def close(self):
+        """Stop the worker after flushing anything already queued"""
+        with self._submit_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Block for the first row, then gather more until size or time limit"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[1] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Flush what we have, then stop on the next loop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        # Group rows by model (normally a single group)
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[3]), []).append(item)
+
+        for items in groups.values():
+            matrix = np.vstack([row for row, _, _, _ in items])
+            try:
+                probabilities = self.score_fn(matrix, items[0][3])
+            except Exception as e:
+                for _, _, future, _ in items:
+                    future.set_exception(e)
+            else:
+                for i, (_, _, future, _) in enumerate(items):
+                    future.set_result(float(probabilities[i]))
+        self._record(batch, started)
+
+    def _record(self, batch, flushed_at):
+        size = len(batch)
+        with self._lock:
+            self._batches += 1
+            self._rows += size
+            self._size_counts[size] = self._size_counts.get(size, 0) + 1
+            for _, enqueued_at, _, _ in batch:
+                wait = flushed_at - enqueued_at
+                self._waits.append(wait)
+                if wait > self._max_wait_seen:
+                    self._max_wait_seen = wait
+
+    def stats(self):
+        """Batch size and queue wait metrics for tuning latency vs throughput"""
+        with self._lock:
+            waits = sorted(self._waits)
+            size_counts = dict(sorted(self._size_counts.items()))
+            batches, rows = self._batches, self._rows
+            max_wait_seen = self._max_wait_seen
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 3)
+
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize(),
+            'batches': batches,
+            'rows': rows,
+            'mean_batch_size': round(rows / batches, 2) if batches else 0.0,
+            'batch_size_counts': size_counts,
+            'queue_wait_ms': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(max_wait_seen * 1000, 3)
+            }
+        }
@@ -0,0 +1,192 @@
+"""Shared model loading for the API servers.
+
+Set INFERENCE_ENGINE=native to serve from the NumPy artifact written by
+native_model.py instead of unpickling the sklearn estimator. When the
+memory-mapped directory artifact exists it is preferred over the .npz, so
+all workers on a host share one read-only copy of the model arrays.
+INFERENCE_ENGINE=auto does the same but falls back to sklearn quietly; in
+either case joblib/sklearn are only imported when the pickle is loaded.
+
+ModelRegistry holds the live (model, features, encoder, version) bundle
+and can reload it without restarting the server, either on request or by
+watching the model files.
+"""
+import hmac
+import itertools
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from app_logging import get_logger
+
+logger = get_logger('model_loader')
+
+MODEL_DIR = os.getenv('MODEL_DIR', 'models')
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'sklearn')
+
+# Hot reload: poll interval for model file changes (0 = off) and the
+# token required by the /admin/reload endpoints (unset = endpoints refuse)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '0'))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+MODEL_PATH = os.path.join(MODEL_DIR, 'financial_risk_model.pkl')
+NATIVE_MODEL_PATH = os.path.join(MODEL_DIR, 'financial_risk_model.npz')
+NATIVE_MODEL_DIR = os.path.join(MODEL_DIR, 'financial_risk_model.native')
+FEATURES_PATH = os.path.join(MODEL_DIR, 'selected_features.json')
+
+
+def find_native_artifact(model_dir=None):
+    """Path of the native artifact to serve from (.native dir first), or None"""
+    model_dir = model_dir or MODEL_DIR
+    for name in ('financial_risk_model.native', 'financial_risk_model.npz'):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_inference_model(engine=None, model_dir=None):
+    """Load the model with the configured engine ('sklearn', 'native' or 'auto')"""
+    engine = engine or INFERENCE_ENGINE
+    model_dir = model_dir or MODEL_DIR
+
+    if engine in ('native', 'auto'):
+        path = find_native_artifact(model_dir)
+        if path is not None:
+            from native_model import load_native_model
+            model = load_native_model(path)
+            logger.info("⚡ Native inference engine loaded from %s", path)
+            return model
+        if engine == 'native':
+            logger.warning("⚠️ No native model artifact in %s, falling back to sklearn", model_dir)
+        else:
+            logger.info("📦 No native model artifact in %s, loading the sklearn pickle", model_dir)
+    elif engine != 'sklearn':
+        raise ValueError(f'Unknown INFERENCE_ENGINE: {engine}')
+
+    import joblib
+    return joblib.load(os.path.join(model_dir, 'financial_risk_model.pkl'))
+
+
+# Everything a request needs from one model version; swapped as a unit.
+# `version` comes from selected_features.json and often stays the same
+# across re-exports, so `generation` (unique per load in this process) is
+# what prediction caches key on
+ModelBundle = namedtuple('ModelBundle', ['model', 'selected_features', 'encoder', 'version', 'loaded_at',
+                                         'generation'])
+_generations = itertools.count(1)
+
+
+def admin_token_ok(token):
+    """True if token matches ADMIN_TOKEN; with no ADMIN_TOKEN set nothing does"""
+    if not ADMIN_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def load_bundle(engine=None, model_dir=None):
+    """Load model, feature list and encoder into a new ModelBundle"""
+    from feature_encoder import FeatureEncoder
+
+    model_dir = model_dir or MODEL_DIR
+    model = load_inference_model(engine, model_dir)
+    with open(os.path.join(model_dir, 'selected_features.json'), 'r') as f:
+        feature_config = json.load(f)
+    selected_features = feature_config.get('selected_features', [])
+    return ModelBundle(
+        model=model,
+        selected_features=selected_features,
+        encoder=FeatureEncoder(selected_features),
+        version=feature_config.get('version'),
+        loaded_at=time.time(),
+        generation=next(_generations)
+    )
+
+
+def smoke_test(bundle, rows=8):
+    """Score a small synthetic batch; raises ValueError if the bundle is unusable"""
+    n_features = len(bundle.selected_features)
+    expected = getattr(bundle.model, 'n_features_in_', n_features)
+    if n_features == 0 or expected != n_features:
+        raise ValueError(f'Feature list has {n_features} features but model expects {expected}')
+
+    rng = np.random.default_rng(0)
+    batch = np.vstack([
+        np.zeros((1, n_features), dtype=np.float32),
+        rng.integers(0, 6, size=(rows - 1, n_features)).astype(np.float32)
+    ])
+    probabilities = np.asarray(bundle.model.predict_proba(batch))[:, 1]
+    if probabilities.shape != (rows,) or not np.all((probabilities >= 0) & (probabilities <= 1)):
+        raise ValueError('Smoke batch produced invalid probabilities')
+
+
+class ModelRegistry:
+    """Holds the live ModelBundle and swaps it atomically on reload.
+
+    Handlers call current() once per request and use that bundle
+    throughout, so in-flight requests finish on the bundle they started
+    with while new requests pick up the reloaded one.
+    """
+
+    def __init__(self, engine=None, model_dir=None):
+        self.engine = engine
+        self.model_dir = model_dir or MODEL_DIR
+        self._bundle = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+
+    def current(self):
+        return self._bundle
+
+    def on_swap(self, callback):
+        """Call callback(new_bundle) after every successful swap"""
+        self._listeners.append(callback)
+
+    def reload(self):
+        """Load, validate and swap in a new bundle; the old one stays on failure"""
+        with self._reload_lock:
+            bundle = load_bundle(self.engine, self.model_dir)
+            smoke_test(bundle)
+            self._bundle = bundle
+        for callback in self._listeners:
+            callback(bundle)
+        return bundle
+
+    def _artifact_mtimes(self):
+        mtimes = {}
+        for name in ('financial_risk_model.pkl', 'financial_risk_model.npz',
+                     'financial_risk_model.native', 'selected_features.json'):
+            path = os.path.join(self.model_dir, name)
+            if os.path.isdir(path):
+                path = os.path.join(path, 'meta.json')
+            if os.path.exists(path):
+                mtimes[name] = os.path.getmtime(path)
+        return mtimes
+
+    def watch(self, interval=5.0):
+        """Poll the model files in a background thread and reload on change"""
+        if self._watcher is not None:
+            return self._watcher
+
+        def run():
+            seen = self._artifact_mtimes()
+            while True:
+                time.sleep(interval)
+                mtimes = self._artifact_mtimes()
+                if mtimes == seen:
+                    continue
+                seen = mtimes
+                try:
+                    bundle = self.reload()
+                    logger.info("🔄 Model reloaded (version %s)", bundle.version)
+                except Exception as e:
+                    logger.error("❌ Model reload failed, keeping current model: %s", e)
+
+        self._watcher = threading.Thread(target=run, name='model-watcher', daemon=True)
+        self._watcher.start()
+        return self._watcher
@@ -1,10 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from datetime import datetime, timedelta
+from datetime import datetime
 import secrets
+from password_hasher import password_hasher
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -13,29 +12,53 @@ class User(db.Model):
     full_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone_number = db.Column(db.String(15), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=True)  # Null until verified
+    password_hash = db.Column(db.String(255), nullable=True)  # Null until set after verification
     email_verified = db.Column(db.Boolean, default=False)
     phone_verified = db.Column(db.Boolean, default=False)
     verification_method = db.Column(db.String(10))  # 'email' or 'sms'
-    verification_code = db.Column(db.String(6))
-    verification_code_expiry = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        # Upgrades the stored hash in place if the hasher settings changed;
+        # the caller commits it
+        matches, new_hash = password_hasher.verify(password, self.password_hash)
+        if new_hash:
+            self.password_hash = new_hash
+        return matches
+
+class PendingRegistration(db.Model):
+    """A signup waiting for its verification code; becomes a User once verified"""
+    __tablename__ = 'pending_registrations'
+    
+    id = db.Column(db.String(16), primary_key=True)  # random, see pending_registrations.new_pending_id
+    full_name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone_number = db.Column(db.String(15), nullable=False)
+    verification_method = db.Column(db.String(10), nullable=False)
+    verification_code = db.Column(db.String(6), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # the sweeper deletes by range
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def is_expired(self):
+        return self.expires_at <= datetime.utcnow()
     
-    def generate_verification_code(self):
-        self.verification_code = ''.join(secrets.choice('0123456789') for i in range(6))
-        self.verification_code_expiry = datetime.utcnow() + timedelta(minutes=30)
-        return self.verification_code
+    def is_code_valid(self, code):
+        return not self.is_expired() and secrets.compare_digest(self.verification_code, str(code or ''))
     
-    def is_verification_code_valid(self, code):
-        return (self.verification_code == code and 
-                self.verification_code_expiry > datetime.utcnow())
+    def to_user(self):
+        """The verified User this signup becomes"""
+        return User(
+            full_name=self.full_name,
+            email=self.email,
+            phone_number=self.phone_number,
+            verification_method=self.verification_method,
+            email_verified=self.verification_method == 'email',
+            phone_verified=self.verification_method == 'sms'
+        )
 
 class PredictionHistory(db.Model):
     __tablename__ = 'prediction_history'
@@ -45,6 +68,36 @@ class PredictionHistory(db.Model):
     risk_score = db.Column(db.Float, nullable=False)
     risk_level = db.Column(db.String(20), nullable=False)
     input_data = db.Column(db.Text)  # JSON string of input features
+    feature_vector = db.Column(db.LargeBinary)  # little-endian float32, in selected_features order
+    model_version = db.Column(db.String(32))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref=db.backref('predictions', lazy=True))
+    
+    # Serves /api/predictions/history (newest first per user) without a sort;
+    # id breaks ties between rows written in the same instant
+    __table_args__ = (
+        db.Index('ix_prediction_history_user_created', user_id, created_at.desc(), id.desc()),
+    )
+
+class IdBlock(db.Model):
+    """Next unreserved id of a table whose ids are handed out in blocks (see history_writer.py)"""
+    __tablename__ = 'id_blocks'
+    
+    name = db.Column(db.String(64), primary_key=True)  # table name
+    next_id = db.Column(db.Integer, nullable=False)
+
+def upgrade_schema(engine):
+    """Add columns and indexes introduced after a table was first created"""
+    inspector = db.inspect(engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
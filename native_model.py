@@ -0,0 +1,307 @@
+"""Pure-NumPy inference engine for the financial risk model.
+
+`export_model` flattens a fitted sklearn model into a handful of contiguous
+arrays and saves them to a .npz file. Each tree is stored as a perfect
+binary tree of the ensemble's depth (feature index and threshold per split
+node, value per leaf), so children are implicit: node i goes to 2i+1 or
+2i+2. `NativeModel` scores whole batches by walking every tree one level
+at a time across all rows, so it needs neither sklearn nor pickle at
+serving time.
+
+Artifacts come in two formats:
+  * `<name>.npz` - a single compact file, read fully into each process
+  * `<name>.native/` - a directory with meta.json and one raw .npy file per
+    array. These are opened with mmap_mode='r', so every worker on a host
+    shares the same read-only pages through the OS page cache. A re-export
+    writes new files and renames them over the old ones (meta.json last),
+    so mapped files are never changed underneath a running worker.
+
+Usage:
+    python native_model.py models/financial_risk_model.pkl models/financial_risk_model.npz
+    python native_model.py models/financial_risk_model.npz models/financial_risk_model.native
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Rows scored per tree walk; keeps the (rows x trees) work arrays in cache
+CHUNK_SIZE = 256
+
+# Perfect-tree layout stores 2**depth leaves per tree
+MAX_EXPORT_DEPTH = 12
+
+
+def _float32_floor(threshold):
+    """Largest float32 <= threshold.
+
+    sklearn compares float32 inputs against float64 thresholds; for a
+    float32 x, `x <= t` is the same as `x <= _float32_floor(t)`.
+    """
+    t32 = np.float32(threshold)
+    if t32 > threshold:
+        t32 = np.nextafter(t32, np.float32(-np.inf))
+    return t32
+
+
+def _flatten_trees(trees, leaf_value):
+    """Lay sklearn trees out as perfect binary trees of a common depth.
+
+    Leaves above the bottom level become splits with an infinite
+    threshold whose subtree repeats the leaf value. Returns a dict of
+    arrays plus the depth.
+    """
+    depth = max(tree.tree_.max_depth for tree in trees)
+    if depth > MAX_EXPORT_DEPTH:
+        raise ValueError(f'Trees of depth {depth} are too deep for native export (max {MAX_EXPORT_DEPTH})')
+    n_split = 2 ** depth - 1
+    n_leaf = 2 ** depth
+
+    feature = np.zeros((len(trees), n_split), dtype=np.int32)
+    threshold = np.full((len(trees), n_split), np.inf, dtype=np.float32)
+    value = np.zeros((len(trees), n_leaf), dtype=np.float64)
+
+    for k, tree in enumerate(trees):
+        t = tree.tree_
+        values = leaf_value(t)
+        stack = [(0, 0, 0)]  # (sklearn node, perfect-tree position, level)
+        while stack:
+            node, pos, level = stack.pop()
+            if level == depth:
+                value[k, pos - n_split] = values[node]
+                continue
+            if t.children_left[node] == -1:
+                # Leaf above the bottom level: always go left, same value below
+                stack.append((node, 2 * pos + 1, level + 1))
+                stack.append((node, 2 * pos + 2, level + 1))
+                continue
+            feature[k, pos] = t.feature[node]
+            threshold[k, pos] = _float32_floor(t.threshold[node])
+            stack.append((t.children_left[node], 2 * pos + 1, level + 1))
+            stack.append((t.children_right[node], 2 * pos + 2, level + 1))
+
+    return {
+        'feature': feature.ravel(),
+        'threshold': threshold.ravel(),
+        'value': value.ravel(),
+    }, depth
+
+
+def export_arrays(model):
+    """Flatten a fitted sklearn classifier into (meta, arrays)"""
+    name = type(model).__name__
+    classes = getattr(model, 'classes_', [0, 1])
+    if len(classes) != 2:
+        raise ValueError(f'Only binary classifiers are supported, got {len(classes)} classes')
+    meta = {'estimator': name, 'n_features': int(model.n_features_in_)}
+
+    if name == 'GradientBoostingClassifier':
+        arrays, depth = _flatten_trees(model.estimators_[:, 0], lambda t: t.value[:, 0, 0])
+        # Constant raw prediction from the init estimator (log-odds of the prior)
+        if model.init_ == 'zero':
+            init_raw = 0.0
+        else:
+            x0 = np.zeros((1, model.n_features_in_), dtype=np.float32)
+            eps = np.finfo(np.float32).eps
+            p = np.clip(model.init_.predict_proba(x0)[0, 1], eps, 1 - eps)
+            init_raw = float(np.log(p / (1 - p)))
+        meta.update(kind='gradient_boosting', depth=int(depth), n_trees=len(model.estimators_),
+                    learning_rate=float(model.learning_rate), init_raw=init_raw)
+
+    elif name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        def leaf_proba(t):
+            counts = t.value[:, 0, :]
+            return counts[:, 1] / counts.sum(axis=1)
+        arrays, depth = _flatten_trees(model.estimators_, leaf_proba)
+        meta.update(kind='forest', depth=int(depth), n_trees=len(model.estimators_))
+
+    elif hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+        arrays = {
+            'coef': np.asarray(model.coef_, dtype=np.float64).ravel(),
+            'intercept': np.asarray(model.intercept_, dtype=np.float64).ravel()[:1],
+        }
+        meta.update(kind='linear')
+
+    else:
+        raise ValueError(f'Unsupported model type for native export: {name}')
+
+    return meta, arrays
+
+
+def _write_replace(path, write):
+    """Write a file next to path with write(f), then rename it over path.
+
+    Processes that already memory-map the old file keep reading the old
+    inode; truncating it in place could give them torn data or SIGBUS.
+    """
+    tmp = f'{path}.tmp-{os.getpid()}'
+    try:
+        with open(tmp, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def save_artifact(meta, arrays, path):
+    """Write arrays as a .npz file, or as a memory-mappable directory"""
+    if path.endswith('.npz'):
+        _write_replace(path, lambda f: np.savez(f, meta=np.array(json.dumps(meta)), **arrays))
+        return
+
+    os.makedirs(path, exist_ok=True)
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    for name, array in arrays.items():
+        _write_replace(os.path.join(path, f'{name}.npy'), lambda f: np.save(f, array))
+    # meta.json is swapped in last so a half-written directory never looks
+    # complete; its shapes let the loader reject a mix of old and new arrays
+    meta = dict(meta, arrays=sorted(arrays), shapes={name: list(a.shape) for name, a in arrays.items()})
+    _write_replace(os.path.join(path, 'meta.json'), lambda f: f.write(json.dumps(meta, indent=2).encode()))
+
+
+def export_model(model, path):
+    """Export a fitted sklearn model to a native artifact (.npz or directory)"""
+    meta, arrays = export_arrays(model)
+    save_artifact(meta, arrays, path)
+    return meta
+
+
+def _sigmoid(raw):
+    return 1.0 / (1.0 + np.exp(-raw))
+
+
+class NativeModel:
+    """Vectorized evaluator over exported model arrays.
+
+    Exposes `predict_proba` like sklearn so it can stand in for the
+    unpickled estimator in the apps.
+    """
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.kind = meta['kind']
+        self.n_features_in_ = meta['n_features']
+        self.classes_ = np.array([0, 1])
+        self.arrays = arrays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        if self.kind != 'linear':
+            self.n_trees = meta['n_trees']
+            self.depth = meta['depth']
+            self.n_split = 2 ** self.depth - 1
+            # Offsets of each tree's split nodes and leaves in the flat arrays
+            self._split_base = (np.arange(self.n_trees, dtype=np.int32) * self.n_split)[None, :]
+            self._leaf_base = (np.arange(self.n_trees, dtype=np.int32) * (self.n_split + 1) - self.n_split)[None, :]
+
+    def _tree_sum(self, X):
+        """Sum of leaf values over all trees for each row of X"""
+        n, n_features = X.shape
+        flat_X = X.ravel()
+        row_base = (np.arange(n, dtype=np.int32) * n_features)[:, None]
+        pos = np.zeros((n, self.n_trees), dtype=np.int32)
+        for _ in range(self.depth):
+            node = pos + self._split_base
+            go_left = flat_X.take(row_base + self.feature.take(node)) <= self.threshold.take(node)
+            pos = 2 * pos + 2 - go_left
+        return self.value.take(pos + self._leaf_base).sum(axis=1)
+
+    def _positive_proba(self, X):
+        if self.kind == 'linear':
+            return _sigmoid(X @ self.coef + self.intercept[0])
+        if self.kind == 'gradient_boosting':
+            raw = self.meta['init_raw'] + self.meta['learning_rate'] * self._tree_sum(X)
+            return _sigmoid(raw)
+        return self._tree_sum(X) / self.n_trees
+
+    def predict_risk(self, X):
+        """Probability of class 1 (risky) for each row, shape (N,)"""
+        # sklearn trees see float32 inputs; linear models keep float64
+        X = np.ascontiguousarray(X, dtype=np.float64 if self.kind == 'linear' else np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f'X has {X.shape[1]} features, but model expects {self.n_features_in_}')
+        if X.shape[0] <= CHUNK_SIZE:
+            return self._positive_proba(X)
+        return np.concatenate([
+            self._positive_proba(X[start:start + CHUNK_SIZE])
+            for start in range(0, X.shape[0], CHUNK_SIZE)
+        ])
+
+    def predict_proba(self, X):
+        """(N, 2) class probabilities, same layout as sklearn"""
+        p = self.predict_risk(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return (self.predict_risk(X) >= 0.5).astype(np.int64)
+
+
+def load_native_model(path, mmap=True):
+    """Load an artifact written by export_model.
+
+    Directory artifacts are memory-mapped read-only unless mmap=False.
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {
+            # asarray drops the np.memmap subclass but keeps the mapping
+            name: np.asarray(np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode))
+            for name in meta.pop('arrays')
+        }
+        for name, shape in meta.pop('shapes', {}).items():
+            if list(arrays[name].shape) != shape:
+                raise ValueError(f'{name}.npy does not match meta.json (artifact is being rewritten?)')
+        return NativeModel(meta, arrays)
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        arrays = {name: data[name] for name in data.files if name != 'meta'}
+    return NativeModel(meta, arrays)
+
+
+def verify(model, native, n_features, n_rows=2000, seed=0):
+    """Max absolute difference between sklearn and native probabilities"""
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 100, size=(n_rows, n_features)).astype(np.float32)
+    return float(np.abs(model.predict_proba(X)[:, 1] - native.predict_risk(X)).max())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    source, target = sys.argv[1], sys.argv[2]
+
+    if source.endswith('.npz') or os.path.isdir(source):
+        # Convert between native formats without needing sklearn
+        native = load_native_model(source, mmap=False)
+        save_artifact(native.meta, native.arrays, target)
+        print(f"✅ Converted {source} to {target}")
+        sys.exit(0)
+
+    import joblib
+    model = joblib.load(source)
+    meta = export_model(model, target)
+    native = load_native_model(target)
+    print(f"✅ Exported {meta['estimator']} ({meta['kind']}) to {target}")
+
+    diff = verify(model, native, meta['n_features'])
+    print(f"🎯 Max |sklearn - native| probability difference: {diff:.2e}")
+
+    x = np.zeros((1, meta['n_features']), dtype=np.float32)
+    for label, fn in [('sklearn', model.predict_proba), ('native', native.predict_proba)]:
+        runs = 200
+        started = time.perf_counter()
+        for _ in range(runs):
+            fn(x)
+        print(f"⏱️ {label}: {(time.perf_counter() - started) / runs * 1e6:.1f} µs per single-row call")
@@ -0,0 +1,144 @@
+"""Password hashing shared by the Flask apps (models.User) and app_minimal.py.
+
+Hashes are self-describing, so the scheme and cost can be changed through
+the environment without invalidating stored passwords:
+
+    $2b$12$...                          bcrypt, cost = log2 rounds
+    pbkdf2_sha256$600000$salt$hash      PBKDF2-HMAC-SHA256, cost = iterations
+    <64 hex chars>                      legacy unsalted SHA-256 (app_minimal)
+
+verify() reports a replacement hash whenever the stored one uses another
+scheme or cost, so callers can upgrade it on successful login.
+
+At most PASSWORD_HASH_WORKERS hashes run at once, so a login burst can't
+take every core (bcrypt and hashlib release the GIL, so they do run in
+parallel). hash() and verify() do the work in the calling thread once a
+slot is free. Async callers use submit_hash()/submit_verify(), which run
+it in a small thread pool and return a future the event loop can await
+with asyncio.wrap_future.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'bcrypt')
+PASSWORD_HASH_COST = os.getenv('PASSWORD_HASH_COST')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+
+DEFAULT_COSTS = {'bcrypt': 12, 'pbkdf2': 600000}
+
+_LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a bounded worker pool"""
+
+    def __init__(self, scheme=PASSWORD_HASHER, cost=PASSWORD_HASH_COST, workers=PASSWORD_HASH_WORKERS):
+        if scheme not in DEFAULT_COSTS:
+            raise ValueError(f"Unknown password hasher '{scheme}' (expected bcrypt or pbkdf2)")
+        self.scheme = scheme
+        self.cost = int(cost) if cost else DEFAULT_COSTS[scheme]
+        self.workers = max(1, int(workers))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    @property
+    def pool(self):
+        # Created on first use so importing this module starts no threads
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+        return self._pool
+
+    def _limited(self, fn, *args):
+        with self._slots:
+            return fn(*args)
+
+    def hash(self, password):
+        return self._limited(self._hash, password)
+
+    def verify(self, password, stored):
+        """(matches, new_hash); new_hash is set when a match should be rehashed"""
+        return self._limited(self._verify_and_upgrade, password, stored)
+
+    def submit_hash(self, password):
+        """Future resolving to hash()'s result"""
+        return self.pool.submit(self._limited, self._hash, password)
+
+    def submit_verify(self, password, stored):
+        """Future resolving to verify()'s result"""
+        return self.pool.submit(self._limited, self._verify_and_upgrade, password, stored)
+
+    def needs_rehash(self, stored):
+        scheme, cost = self._identify(stored)
+        return scheme != self.scheme or cost != self.cost
+
+    def _hash(self, password):
+        if self.scheme == 'bcrypt':
+            return bcrypt.hashpw(self._bcrypt_bytes(password), bcrypt.gensalt(self.cost)).decode('ascii')
+        salt = secrets.token_bytes(16)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.cost)
+        return f'pbkdf2_sha256${self.cost}${_b64(salt)}${_b64(digest)}'
+
+    def _verify_and_upgrade(self, password, stored):
+        if not stored or password is None:
+            return False, None
+        if not self._check(password, stored):
+            return False, None
+        if self.needs_rehash(stored):
+            return True, self._hash(password)
+        return True, None
+
+    def _check(self, password, stored):
+        scheme, _ = self._identify(stored)
+        try:
+            if scheme == 'bcrypt':
+                return bcrypt.checkpw(self._bcrypt_bytes(password), stored.encode('ascii'))
+            if scheme == 'pbkdf2':
+                _, iterations, salt, digest = stored.split('$')
+                candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(salt), int(iterations))
+                return hmac.compare_digest(candidate, _unb64(digest))
+        except ValueError:
+            return False  # malformed stored hash
+        if scheme == 'sha256':
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        return False
+
+    @staticmethod
+    def _identify(stored):
+        """(scheme, cost) of a stored hash; (None, None) if unrecognised or malformed"""
+        try:
+            if stored.startswith('$2'):
+                return 'bcrypt', int(stored.split('$')[2])
+            if stored.startswith('pbkdf2_sha256$'):
+                return 'pbkdf2', int(stored.split('$')[1])
+        except (ValueError, IndexError):
+            return None, None
+        if _LEGACY_SHA256.match(stored):
+            return 'sha256', None
+        return None, None
+
+    @staticmethod
+    def _bcrypt_bytes(password):
+        # bcrypt only uses the first 72 bytes; newer releases reject longer input
+        return password.encode()[:72]
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,153 @@
+"""Pending (unverified) registrations, kept apart from the users table.
+
+A signup used to become a users row (or a users_db entry in
+app_minimal.py) straight away, with its verification code stored on it.
+Abandoned signups then stayed in the hot table forever. A signup now
+waits here until its code is verified. Only then is the user created, and
+anything left unverified past PENDING_TTL_SECONDS is swept away.
+
+- ExpiringMap: the in-memory store app_minimal.py uses. Lookups by id are
+  O(1) dict hits. Every entry has the same TTL, so insertion order is
+  expiry order and sweep() only walks the expired front of the map.
+- Sweeper: runs a cleanup function every PENDING_SWEEP_INTERVAL seconds in
+  a background thread. auth.py uses it to delete expired rows from the
+  pending_registrations table (expires_at is indexed).
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from app_logging import get_logger
+
+PENDING_TTL_SECONDS = float(os.getenv('PENDING_TTL_SECONDS', str(30 * 60)))
+PENDING_SWEEP_INTERVAL = float(os.getenv('PENDING_SWEEP_INTERVAL', '60'))
+PENDING_MAX = int(os.getenv('PENDING_MAX', '100000'))
+
+logger = get_logger('pending_registrations')
+
+
+def new_pending_id():
+    """Random id for a pending registration (not guessable, unlike a row counter)"""
+    return secrets.token_hex(8)
+
+
+def new_verification_code():
+    return ''.join(secrets.choice('0123456789') for i in range(6))
+
+
+class ExpiringMap:
+    """Thread-safe dict whose entries expire `ttl_seconds` after insertion"""
+
+    def __init__(self, ttl_seconds=PENDING_TTL_SECONDS, max_size=PENDING_MAX):
+        self.ttl = float(ttl_seconds)
+        self.max_size = max(1, int(max_size))
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            # Full: drop the oldest signups rather than grow without bound
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def get(self, key):
+        """Value for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                return None
+            return entry[1]
+
+    def pop(self, key):
+        """Remove and return the value for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def sweep(self):
+        """Drop expired entries; returns how many were removed"""
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            while self._entries:
+                key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at >= now:
+                    break
+                del self._entries[key]
+                removed += 1
+            self.expired += removed
+        return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'ttl_seconds': self.ttl,
+                    'expired': self.expired, 'evicted': self.evicted}
+
+
+class Sweeper:
+    """Call `sweep_fn()` every `interval` seconds in a daemon thread"""
+
+    def __init__(self, sweep_fn, interval=PENDING_SWEEP_INTERVAL, name='pending-sweeper'):
+        self.sweep_fn = sweep_fn
+        self.interval = float(interval)
+        self.name = name
+        self.runs = 0
+        self.removed = 0
+        self.last_sweep_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _restart_after_fork(self):
+        """fork() doesn't copy the sweeper thread; start one in the child if the parent had one"""
+        if self._thread is not None and not self._stop.is_set():
+            self._thread = None
+            self.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        started = time.perf_counter()
+        try:
+            removed = self.sweep_fn() or 0
+        except Exception as e:
+            logger.error("❌ Pending registration sweep failed: %s", e)
+            return 0
+        self.runs += 1
+        self.removed += removed
+        self.last_sweep_ms = (time.perf_counter() - started) * 1000
+        if removed:
+            logger.info("🧹 Removed %d expired pending registrations", removed)
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def stats(self):
+        return {'interval_s': self.interval, 'runs': self.runs, 'removed': self.removed,
+                'last_sweep_ms': round(self.last_sweep_ms, 3)}
@@ -0,0 +1,93 @@
+"""LRU/TTL cache of model predictions.
+
+Entries are keyed by a hash of the encoded feature vector plus the model
+bundle's generation, so resubmitted applicant profiles (form retries,
+dashboard refreshes) skip inference. A request still finishing on the old
+bundle after a reload stores its score under the old generation, where no
+new request looks. Call clear() on reload to free those entries.
+
+The cache itself takes any hashable key; auth.py also uses it for user
+profiles.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '10000'))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '300'))
+
+
+class PredictionCache:
+    """Thread-safe, size-bounded LRU cache with per-entry expiry"""
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL):
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(feature_vector, model_version):
+        """Hash of the float32 feature row and the model version (use ModelBundle.generation)"""
+        row = np.ascontiguousarray(feature_vector, dtype=np.float32)
+        digest = hashlib.blake2b(row.tobytes(), digest_size=16)
+        digest.update(str(model_version).encode())
+        return digest.digest()
+
+    def get(self, key):
+        """Cached value for key, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (e.g. after a model reload)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,215 @@
+"""Append-only, segment-rotated prediction log with a ring buffer of recent entries.
+
+app_minimal.py kept every prediction in a Python list that grew without
+limit, numbered them with len(list) + 1 (racy once requests overlap) and
+lost them on restart. PredictionLog replaces that list:
+
+- Each entry is one JSON line, {"id": ..., ...}, appended to the current
+  segment file `<directory>/predictions-<first id>.jsonl`. A segment is
+  flushed after every append, so a crash loses at most the line being
+  written.
+- A segment that grows past `segment_max_bytes` is closed and a new one
+  started. Only the newest `max_segments` are kept, so disk use is bounded
+  too.
+- Ids come from a counter under the append lock, so they are unique and
+  increasing even with concurrent requests.
+- The newest `ring_size` entries stay in memory (a deque plus an id index)
+  for recent()/get(). Older ids are found by bisecting the segment names,
+  which hold each segment's first id, and scanning that one file.
+- Startup replay only reads the newest segments, back to front, until the
+  ring is full, and parses only the lines that go into it. A torn last
+  line from a crash is truncated away, and the next id continues after
+  the last one on disk.
+
+An empty PREDICTION_LOG_DIR keeps the log in memory only (ring buffer
+without persistence).
+"""
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from app_logging import get_logger
+from fast_json import loads, dumps
+
+PREDICTION_LOG_DIR = os.getenv('PREDICTION_LOG_DIR', 'prediction_log')
+PREDICTION_LOG_SEGMENT_BYTES = int(os.getenv('PREDICTION_LOG_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+PREDICTION_LOG_MAX_SEGMENTS = int(os.getenv('PREDICTION_LOG_MAX_SEGMENTS', '16'))
+PREDICTION_LOG_RING_SIZE = int(os.getenv('PREDICTION_LOG_RING_SIZE', '10000'))
+PREDICTION_LOG_FSYNC = os.getenv('PREDICTION_LOG_FSYNC', '0') == '1'
+
+SEGMENT_NAME = re.compile(r'^predictions-(\d+)\.jsonl$')
+
+logger = get_logger('prediction_log')
+
+
+def segment_name(first_id):
+    return f'predictions-{first_id:012d}.jsonl'
+
+
+class PredictionLog:
+    """Persistent, bounded log of predictions with atomic ids"""
+
+    def __init__(self, directory=PREDICTION_LOG_DIR, segment_max_bytes=PREDICTION_LOG_SEGMENT_BYTES,
+                 max_segments=PREDICTION_LOG_MAX_SEGMENTS, ring_size=PREDICTION_LOG_RING_SIZE,
+                 fsync=PREDICTION_LOG_FSYNC):
+        self.directory = directory or None
+        self.segment_max_bytes = max(1, int(segment_max_bytes))
+        self.max_segments = max(1, int(max_segments))
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._ring = deque(maxlen=max(1, int(ring_size)))
+        self._by_id = {}
+        self._segments = []  # first id of each segment on disk, oldest first
+        self._file = None
+        self._file_size = 0
+        self._next_id = 1
+        self.replay_ms = 0.0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._replay()
+
+    def _path(self, first_id):
+        return os.path.join(self.directory, segment_name(first_id))
+
+    def _replay(self):
+        """Rebuild the segment index, the ring and the next id from disk"""
+        started = time.perf_counter()
+        self._segments = sorted(int(m.group(1)) for m in map(SEGMENT_NAME.match, os.listdir(self.directory)) if m)
+
+        recent = []
+        for first_id in reversed(self._segments):
+            entries = self._read_segment(first_id, self._ring.maxlen - len(recent),
+                                         repair=first_id == self._segments[-1])
+            if entries and self._next_id == 1:
+                self._next_id = entries[-1]['id'] + 1
+            recent[:0] = entries
+            if len(recent) >= self._ring.maxlen:
+                break
+        if self._next_id == 1 and self._segments:
+            # Only empty segments: continue after the newest segment's first id
+            self._next_id = self._segments[-1]
+
+        for entry in recent:
+            self._remember(entry)
+        if self._segments:
+            self._open(self._segments[-1])
+        self.replay_ms = (time.perf_counter() - started) * 1000
+        logger.info("✅ Prediction log: %d segments, %d recent entries, next id %d (replayed in %.1f ms)",
+                    len(self._segments), len(self._ring), self._next_id, self.replay_ms)
+
+    def _read_segment(self, first_id, limit, repair=False):
+        """Last `limit` entries of one segment; with repair, cut off a torn last line"""
+        path = self._path(first_id)
+        with open(path, 'rb') as f:
+            lines = f.read().splitlines(keepends=True)
+        if lines and repair:
+            try:
+                if not lines[-1].endswith(b'\n'):
+                    raise ValueError('incomplete line')
+                loads(lines[-1])
+            except ValueError:
+                lines.pop()
+                good_bytes = sum(map(len, lines))
+                logger.warning("⚠️ Truncating torn entry at byte %d of %s", good_bytes, path)
+                with open(path, 'r+b') as f:
+                    f.truncate(good_bytes)
+        # Only the lines that end up in the ring are parsed
+        entries = []
+        for line in lines[-limit:]:
+            try:
+                entries.append(loads(line))
+            except ValueError:
+                logger.warning("⚠️ Skipping unreadable entry in %s", path)
+        return entries
+
+    def _open(self, first_id):
+        self._file = open(self._path(first_id), 'ab')
+        self._file_size = self._file.tell()
+
+    def _rotate(self, first_id):
+        """Start a new segment beginning at first_id and drop the oldest beyond max_segments"""
+        if self._file is not None:
+            self._file.close()
+        self._segments.append(first_id)
+        self._open(first_id)
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments.pop(0)
+            try:
+                os.remove(self._path(oldest))
+            except OSError as e:
+                logger.error("❌ Could not remove old prediction log segment %s: %s", oldest, e)
+
+    def _remember(self, entry):
+        if len(self._ring) == self._ring.maxlen:
+            self._by_id.pop(self._ring[0]['id'], None)
+        self._ring.append(entry)
+        self._by_id[entry['id']] = entry
+
+    def append(self, record):
+        """Log one prediction; returns the entry with its new id"""
+        with self._lock:
+            entry = {'id': self._next_id, **record}
+            if self.directory:
+                line = dumps(entry) + b'\n'
+                if self._file is None or (self._file_size and self._file_size + len(line) > self.segment_max_bytes):
+                    self._rotate(entry['id'])
+                self._file.write(line)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self._file_size += len(line)
+            self._next_id += 1
+            self._remember(entry)
+            return entry
+
+    def recent(self, limit=None):
+        """Newest entries first, from memory"""
+        with self._lock:
+            entries = list(self._ring)
+        entries.reverse()
+        return entries[:limit] if limit is not None else entries
+
+    def get(self, entry_id):
+        """Entry with this id from the ring or the segment holding it, or None"""
+        with self._lock:
+            entry = self._by_id.get(entry_id)
+            if entry is not None or not self.directory:
+                return entry
+            i = bisect.bisect_right(self._segments, entry_id) - 1
+            if i < 0:
+                return None
+            first_id = self._segments[i]
+        try:
+            with open(self._path(first_id), 'rb') as f:
+                # Entries are written compactly with "id" first, so a prefix
+                # match finds the line without parsing the others
+                for line in f:
+                    if line.startswith(b'{"id":%d,' % entry_id) or line.startswith(b'{"id":%d}' % entry_id):
+                        return loads(line)
+        except OSError:
+            pass  # rotated away meanwhile
+        return None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'next_id': self._next_id,
+                'segments': len(self._segments),
+                'max_segments': self.max_segments,
+                'segment_bytes': self._file_size,
+                'ring_size': len(self._ring),
+                'ring_max': self._ring.maxlen,
+                'replay_ms': round(self.replay_ms, 3)
+            }
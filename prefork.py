@@ -0,0 +1,275 @@
+"""Prefork launcher: one preloaded model, N worker processes.
+
+The master imports the app module, loads the model and selected_features
+once (the module's preload() or load_model()), binds the listening socket
+and freezes the heap with gc.freeze(). It then forks the workers. Each
+worker inherits the socket and the loaded model, and the model's pages stay
+shared copy-on-write. The .native artifact is also mmap'd, so it is shared
+through the page cache as well. Workers accept from the one socket, so
+requests spread across cores.
+
+Recycling and control:
+    --max-requests N   a worker exits after N requests (plus up to
+                       --max-requests-jitter more) and is replaced
+    SIGHUP             reload the model in the master, start a new set of
+                       workers from it, then retire the old ones gracefully
+    SIGTTIN / SIGTTOU  add / remove one worker
+    SIGTERM / SIGINT   stop; workers finish their in-flight request, and any
+                       still running after --graceful-timeout are killed
+
+Serves any module with a WSGI `app`: inference_app (default), app,
+app_complete, app_robust or app_with_auth. A module can define post_fork()
+to run in each worker after the fork (app_with_auth uses it to drop the
+master's database connections). Under prefork, /admin/reload and
+MODEL_WATCH_INTERVAL only affect a single worker, so use SIGHUP instead.
+app_minimal.py and async_server.py are not WSGI apps and keep their own
+servers. app_minimal's users also live in process memory, so it can't be
+split across workers.
+
+Usage:
+    python prefork.py inference_app --workers 4 --port 5000
+    PREFORK_WORKERS=8 PREFORK_MAX_REQUESTS=10000 python prefork.py app_complete
+"""
+import argparse
+import gc
+import importlib
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+from app_logging import get_logger
+
+logger = get_logger('prefork')
+
+PORT = int(os.getenv('PORT', '5000'))
+PREFORK_WORKERS = int(os.getenv('PREFORK_WORKERS', str(os.cpu_count() or 1)))
+PREFORK_MAX_REQUESTS = int(os.getenv('PREFORK_MAX_REQUESTS', '0'))
+PREFORK_MAX_REQUESTS_JITTER = int(os.getenv('PREFORK_MAX_REQUESTS_JITTER', '0'))
+PREFORK_GRACEFUL_TIMEOUT = float(os.getenv('PREFORK_GRACEFUL_TIMEOUT', '30'))
+PREFORK_BACKLOG = int(os.getenv('PREFORK_BACKLOG', '2048'))
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class WorkerServer(WSGIServer):
+    """wsgiref server on a socket inherited from the master (no bind/listen)"""
+
+    timeout = 1.0
+
+    def __init__(self, sock, app):
+        super().__init__(sock.getsockname()[:2], QuietHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.server_name, self.server_port = sock.getsockname()[:2]
+        self.setup_environ()
+        self.set_app(app)
+        self.requests_handled = 0
+
+    def process_request(self, request, client_address):
+        super().process_request(request, client_address)
+        self.requests_handled += 1
+
+
+class Master:
+    def __init__(self, module_name, host, port, workers, max_requests=0, max_requests_jitter=0,
+                 graceful_timeout=30.0):
+        self.module_name = module_name
+        self.address = (host, port)
+        self.num_workers = max(1, workers)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+
+        self.module = None
+        self.socket = None
+        self.workers = {}       # pid -> start time
+        self.retiring = set()   # pids sent SIGTERM but not yet reaped
+        self._signals = []
+
+    # Master
+
+    def setup(self):
+        """Import and preload the app, bind the socket and freeze the heap"""
+        self.module = importlib.import_module(self.module_name)
+        self.preload()
+
+        self.socket = socket.create_server(self.address, backlog=PREFORK_BACKLOG)
+        # Workers poll with a timeout, so a connection another worker took can't block them
+        self.socket.setblocking(False)
+
+        gc.collect()
+        gc.freeze()
+
+    def preload(self):
+        preload = getattr(self.module, 'preload', None) or getattr(self.module, 'load_model', None)
+        if preload is not None:
+            preload()
+
+    def run(self):
+        self.setup()
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+
+        logger.info("🚀 Prefork master %d serving %s on http://%s:%d with %d workers",
+                    os.getpid(), self.module_name, self.address[0], self.address[1], self.num_workers)
+        self.manage_workers()
+        while True:
+            self.reap_workers()
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self.stop()
+                    return
+                if signum == signal.SIGHUP:
+                    self.reload()
+                elif signum == signal.SIGTTIN:
+                    self.num_workers += 1
+                elif signum == signal.SIGTTOU and self.num_workers > 1:
+                    self.num_workers -= 1
+            self.manage_workers()
+            time.sleep(0.2)
+
+    def active_workers(self):
+        return [pid for pid in self.workers if pid not in self.retiring]
+
+    def manage_workers(self):
+        """Spawn or retire workers until the active count matches num_workers"""
+        active = self.active_workers()
+        for _ in range(self.num_workers - len(active)):
+            self.spawn_worker()
+        for pid in sorted(active, key=self.workers.get)[:max(0, len(active) - self.num_workers)]:
+            self.retire(pid)
+
+    def retire(self, pid):
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap_workers(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.workers.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif os.waitstatus_to_exitcode(status) != 0:
+                logger.warning("⚠️ Worker %d exited with status %d", pid, os.waitstatus_to_exitcode(status))
+
+    def reload(self):
+        """Reload the model in the master, then replace every worker"""
+        registry = getattr(self.module, 'registry', None)
+        if registry is None:
+            self.preload()
+        else:
+            try:
+                bundle = registry.reload()
+            except Exception as e:
+                logger.error("❌ Model reload failed, keeping current workers: %s", e)
+                return
+            logger.info("🔄 Model reloaded (version %s), recycling workers", bundle.version)
+        gc.collect()
+        gc.freeze()
+        old = self.active_workers()
+        for _ in range(self.num_workers):
+            self.spawn_worker()
+        for pid in old:
+            self.retire(pid)
+
+    def stop(self):
+        """Ask every worker to finish its current request, then kill stragglers"""
+        logger.info("👋 Stopping %d workers", len(self.workers))
+        for pid in list(self.workers):
+            self.retire(pid)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap_workers()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            logger.warning("⚠️ Worker %d did not stop in %ss, killing it", pid, self.graceful_timeout)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.workers.pop(pid, None)
+        self.socket.close()
+
+    # Worker
+
+    def spawn_worker(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+
+        # Child: runs the worker loop, then exits through the normal interpreter
+        # shutdown so atexit handlers (log and history flushes) still run
+        exit_code = 0
+        try:
+            self.run_worker()
+        except Exception as e:
+            logger.error("❌ Worker %d crashed: %s", os.getpid(), e)
+            exit_code = 1
+        sys.exit(exit_code)
+
+    def run_worker(self):
+        stopping = []
+        self._signals = []
+        self.workers = {}
+        self.retiring = set()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+        for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_IGN)
+
+        post_fork = getattr(self.module, 'post_fork', None)
+        if post_fork is not None:
+            post_fork()
+
+        limit = 0
+        if self.max_requests > 0:
+            limit = self.max_requests + random.randint(0, max(0, self.max_requests_jitter))
+
+        server = WorkerServer(self.socket, self.module.app)
+        while not stopping and not (limit and server.requests_handled >= limit):
+            server.handle_request()
+        if limit and server.requests_handled >= limit:
+            logger.info("♻️ Worker %d recycled after %d requests", os.getpid(), server.requests_handled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('module', nargs='?', default='inference_app', help='module with a WSGI `app`')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('-w', '--workers', type=int, default=PREFORK_WORKERS)
+    parser.add_argument('--max-requests', type=int, default=PREFORK_MAX_REQUESTS,
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=PREFORK_MAX_REQUESTS_JITTER,
+                        help='random extra requests per worker, so workers do not recycle together')
+    parser.add_argument('--graceful-timeout', type=float, default=PREFORK_GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    Master(args.module, args.host, args.port, args.workers, args.max_requests,
+           args.max_requests_jitter, args.graceful_timeout).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Offline bulk scoring of applicant files.
+
+Reads a CSV or Parquet file in fixed-size chunks, encodes each chunk with
+the same categorical mappings as the API (feature_encoder.py), scores it in
+one vectorized call and appends the results to the output file. Only a
+bounded number of chunks is held in memory at any time, however large the
+input is.
+
+Usage:
+    python score_file.py portfolio.csv scores.csv
+    python score_file.py portfolio.parquet scores.parquet --workers 8 --engine native
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_scoring import risk_levels_for
+from feature_encoder import FeatureEncoder
+from model_loader import load_inference_model, MODEL_DIR
+
+# Per-process model state (loaded once in each pool worker)
+_model = None
+_encoder = None
+
+
+def _init_scorer(engine, model_dir):
+    global _model, _encoder
+    _model = load_inference_model(engine, model_dir)
+    _encoder = FeatureEncoder.from_config(os.path.join(model_dir, 'selected_features.json'))
+
+
+def score_columns(columns, n_rows):
+    """Encode and score one chunk; returns (probabilities, invalid rows)"""
+    matrix, invalid = _encoder.encode_columns(columns, n_rows)
+    probabilities = np.full(n_rows, np.nan)
+    if (~invalid).any():
+        probabilities[~invalid] = _model.predict_proba(matrix[~invalid])[:, 1]
+    return probabilities, invalid
+
+
+def read_chunks(path, chunk_size, columns):
+    """Yield (n_rows, {column name: array}), `chunk_size` rows at a time"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        wanted = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=wanted):
+            yield batch.num_rows, {name: batch.column(name).to_numpy(zero_copy_only=False)
+                                   for name in batch.schema.names}
+    else:
+        import pandas as pd
+        header = pd.read_csv(path, nrows=0).columns
+        wanted = [c for c in columns if c in header]
+        for frame in pd.read_csv(path, chunksize=chunk_size, usecols=wanted):
+            yield len(frame), {name: frame[name].to_numpy() for name in frame.columns}
+
+
+class ResultWriter:
+    """Append scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, path, id_column):
+        self.path = path
+        self.id_column = id_column
+        self._parquet = None
+        self._header_written = False
+        self._file = None if path.endswith('.parquet') else open(path, 'w', newline='')
+        # csv.writer quotes ids containing commas, quotes or newlines
+        self._csv = csv.writer(self._file) if self._file is not None else None
+
+    def write(self, ids, probabilities, invalid):
+        levels = risk_levels_for(np.nan_to_num(probabilities)).astype(object)
+        levels[invalid] = 'Invalid'
+        scores = np.round(probabilities, 4)
+
+        if self._csv is not None:
+            if not self._header_written:
+                self._csv.writerow((self.id_column, 'risk_score', 'risk_level'))
+                self._header_written = True
+            self._csv.writerows(
+                (i, '' if s != s else s, level) for i, s, level in zip(ids, scores.tolist(), levels)
+            )
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({
+            self.id_column: ids,
+            'risk_score': scores,
+            'risk_level': levels.astype(str),
+        })
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.path, table.schema)
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a CSV/Parquet file of applicants in chunks')
+    parser.add_argument('input', help='input .csv or .parquet file')
+    parser.add_argument('output', help='output .csv or .parquet file')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='rows per chunk (default 50000)')
+    parser.add_argument('--workers', type=int, default=1, help='score chunks in N processes (default 1)')
+    parser.add_argument('--engine', default=None, help="'sklearn' or 'native' (default INFERENCE_ENGINE)")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--id-column', default=None,
+                        help='input column copied to the output (default: row number)')
+    args = parser.parse_args()
+
+    _init_scorer(args.engine, args.model_dir)
+    columns = list(_encoder.selected_features)
+    if args.id_column and args.id_column not in columns:
+        columns.append(args.id_column)
+
+    writer = ResultWriter(args.output, args.id_column or 'row')
+    pool = ProcessPoolExecutor(args.workers, initializer=_init_scorer,
+                               initargs=(args.engine, args.model_dir)) if args.workers > 1 else None
+
+    # Chunks in flight; results are written in input order
+    pending = deque()
+    max_pending = max(1, args.workers) * 2
+    rows = 0
+    started = time.perf_counter()
+
+    def write_oldest():
+        ids, result = pending.popleft()
+        probabilities, invalid = result.result() if pool is not None else result
+        writer.write(ids, probabilities, invalid)
+
+    try:
+        for n_rows, chunk in read_chunks(args.input, args.chunk_size, columns):
+            if args.id_column:
+                ids = chunk[args.id_column]
+            else:
+                ids = np.arange(rows, rows + n_rows)
+            rows += n_rows
+
+            if pool is not None:
+                pending.append((ids, pool.submit(score_columns, chunk, n_rows)))
+                if len(pending) >= max_pending:
+                    write_oldest()
+            else:
+                pending.append((ids, score_columns(chunk, n_rows)))
+                write_oldest()
+
+        while pending:
+            write_oldest()
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Per-stage latency histograms for the prediction endpoints.
+
+Each stage of a request (JSON parse, feature encoding, inference, risk
+bucketing, serialization, DB write) is timed with a Stopwatch and recorded
+in a fixed-bucket histogram. Recording costs one perf_counter() call, a
+bit_length() and a counter increment, so it can stay on in production.
+
+Buckets are powers of two in microseconds (1µs, 2µs, 4µs, ... ~67s).
+Percentiles are reported as the upper bound of the bucket they fall in,
+so they may overstate latency by up to 2x.
+"""
+import threading
+import time
+
+N_BUCKETS = 27
+
+
+class LatencyHistogram:
+    """Log2-bucketed latency counts for one stage"""
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        bucket = min(int(seconds * 1e6).bit_length(), N_BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound (ms) of the bucket holding the p-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(2 ** bucket / 1000, self.max * 1000)
+        return self.max * 1000
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 4) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50), 4),
+            'p95_ms': round(self.percentile(0.95), 4),
+            'p99_ms': round(self.percentile(0.99), 4),
+            'max_ms': round(self.max * 1000, 4),
+            'buckets_le_ms': {2 ** b / 1000: n for b, n in enumerate(self.counts) if n}
+        }
+
+
+class StageMetrics:
+    """Histograms keyed by stage name"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def stopwatch(self):
+        return Stopwatch(self)
+
+    def stats(self):
+        with self._lock:
+            return {stage: h.summary() for stage, h in self._histograms.items()}
+
+
+class Stopwatch:
+    """Times consecutive stages of one request"""
+
+    __slots__ = ('metrics', 'started', 'last')
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or start) under `stage`"""
+        now = time.perf_counter()
+        self.metrics.observe(stage, now - self.last)
+        self.last = now
+
+    def total(self, stage='total'):
+        self.metrics.observe(stage, time.perf_counter() - self.started)
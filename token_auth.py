@@ -0,0 +1,139 @@
+"""Signed access tokens and an in-process revocation set.
+
+A token is `<payload>.<signature>`. The payload is base64url JSON
+{"sub", "exp", "jti"} and the signature is an HMAC-SHA256 of it. verify()
+only needs the secret, so checking a token costs one HMAC and no user
+lookup.
+
+Logout revokes a token by its jti. RevocationSet keeps each revoked id only
+until the token would have expired anyway, and holds at most
+TOKEN_REVOCATION_MAX ids. When it is full, ids whose tokens have expired
+go first; only then are valid ids dropped (soonest to expire first), with
+a warning. The set lives in process memory, so with prefork.py each
+worker keeps its own.
+
+TOKEN_SECRET defaults to JWT_SECRET, then to a random per-process key
+(tokens stop working on restart, as app_minimal's in-memory users do).
+"""
+import base64
+import hashlib
+import heapq
+import hmac
+import os
+import secrets
+import threading
+import time
+
+from app_logging import get_logger
+from fast_json import loads, dumps
+
+TOKEN_SECRET = os.getenv('TOKEN_SECRET') or os.getenv('JWT_SECRET') or secrets.token_hex(32)
+TOKEN_TTL_SECONDS = float(os.getenv('TOKEN_TTL_SECONDS', str(24 * 3600)))
+TOKEN_REVOCATION_MAX = int(os.getenv('TOKEN_REVOCATION_MAX', '100000'))
+
+logger = get_logger('token_auth')
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+def bearer_token(authorization):
+    """Token from an `Authorization: Bearer <token>` header value, or None"""
+    if authorization and authorization[:7].lower() == 'bearer ':
+        return authorization[7:].strip() or None
+    return None
+
+
+class RevocationSet:
+    """Bounded set of revoked token ids, each kept until its token expires"""
+
+    def __init__(self, max_size=TOKEN_REVOCATION_MAX):
+        self.max_size = max(1, int(max_size))
+        self._entries = {}  # jti -> exp (unix seconds)
+        self._by_expiry = []  # heap of (exp, jti); may hold stale pairs for ids already gone
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def revoke(self, jti, expires_at):
+        if expires_at < time.time():
+            return
+        with self._lock:
+            self._entries[jti] = expires_at
+            heapq.heappush(self._by_expiry, (expires_at, jti))
+            self._prune(time.time())
+
+    def __contains__(self, jti):
+        with self._lock:
+            expires_at = self._entries.get(jti)
+            if expires_at is None:
+                return False
+            if expires_at < time.time():
+                del self._entries[jti]
+                return False
+            return True
+
+    def _prune(self, now):
+        # Ids are revoked in any order, so expiry order comes from the heap:
+        # first forget every id whose token has expired, and only if the set
+        # is still over max_size drop valid ids, soonest-expiring first
+        heap = self._by_expiry
+        while heap and (heap[0][0] < now or len(self._entries) > self.max_size):
+            expires_at, jti = heapq.heappop(heap)
+            if self._entries.get(jti) != expires_at:
+                continue  # stale pair: already removed or re-revoked
+            del self._entries[jti]
+            if expires_at >= now:
+                self.dropped += 1
+                logger.warning("⚠️ Revocation set full (%d), forgot a revoked token that is still valid",
+                               self.max_size)
+        # Lookups delete expired ids without touching the heap; don't let
+        # their pairs pile up
+        if len(heap) > 2 * self.max_size:
+            self._by_expiry = [(exp, jti) for jti, exp in self._entries.items()]
+            heapq.heapify(self._by_expiry)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'dropped': self.dropped}
+
+
+class TokenSigner:
+    """Issue and verify HMAC-signed tokens"""
+
+    def __init__(self, secret=TOKEN_SECRET, ttl_seconds=TOKEN_TTL_SECONDS, revoked=None):
+        self._key = secret.encode() if isinstance(secret, str) else secret
+        self.ttl = float(ttl_seconds)
+        self.revoked = revoked if revoked is not None else RevocationSet()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._key, payload, hashlib.sha256).digest())
+
+    def issue(self, subject):
+        claims = {'sub': subject, 'exp': int(time.time() + self.ttl), 'jti': secrets.token_hex(8)}
+        payload = _b64encode(dumps(claims))
+        return (payload + b'.' + self._sign(payload)).decode()
+
+    def verify(self, token):
+        """Claims of a valid, unexpired, unrevoked token, else None"""
+        try:
+            payload, signature = token.encode().split(b'.')
+        except (AttributeError, ValueError):
+            return None
+        if not hmac.compare_digest(self._sign(payload), signature):
+            return None
+        try:
+            claims = loads(_b64decode(payload))
+        except ValueError:
+            return None
+        if claims['exp'] < time.time() or claims['jti'] in self.revoked:
+            return None
+        return claims
+
+    def revoke(self, claims):
+        """Revoke the token these (verified) claims came from"""
+        self.revoked.revoke(claims['jti'], claims['exp'])
@@ -0,0 +1,358 @@
+"""Background delivery of verification emails and SMS.
+
+register used to call the email/SMS provider inline, so every signup
+waited on a remote API. Messages are now queued per channel ('email',
+'sms') and a collector thread per channel gathers up to that channel's
+batch size (or whatever arrived within `max_wait_ms`) and hands the batch
+to a pool of `workers` sender threads. One transport call then delivers
+the whole batch, which is how bulk provider APIs are meant to be used.
+
+A batch whose send raises is retried after an exponential backoff
+(`backoff_ms` * 2**(attempt - 1), capped at `backoff_max_ms`, with
+jitter), up to `max_attempts` sends per message. After that its messages
+are dropped and counted as failed. Retries wait in the collector's delay
+heap rather than holding a sender thread.
+
+At most `max_queue` messages are held at once, counting those queued,
+waiting to retry, batched and being sent. send() never blocks: during a
+provider outage, a message that doesn't fit is logged and counted as
+rejected, and register carries on.
+
+Transports implement send_batch(channel, messages):
+    LogTransport     logs each message (the providers are not wired up yet)
+    MemoryTransport  keeps sent messages in memory and can simulate slow or
+                     failing providers; a stand-in for tests and benchmarks
+
+VERIFICATION_TRANSPORT picks one ('log' or 'memory'). Set
+VERIFICATION_ASYNC=0 to send inline again.
+"""
+import atexit
+import heapq
+import os
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from app_logging import get_logger
+
+VERIFICATION_ASYNC = os.getenv('VERIFICATION_ASYNC', '1') == '1'
+VERIFICATION_TRANSPORT = os.getenv('VERIFICATION_TRANSPORT', 'log')
+VERIFICATION_WORKERS = int(os.getenv('VERIFICATION_WORKERS', '4'))
+VERIFICATION_EMAIL_BATCH_SIZE = int(os.getenv('VERIFICATION_EMAIL_BATCH_SIZE', '100'))
+VERIFICATION_SMS_BATCH_SIZE = int(os.getenv('VERIFICATION_SMS_BATCH_SIZE', '20'))
+VERIFICATION_MAX_WAIT_MS = float(os.getenv('VERIFICATION_MAX_WAIT_MS', '50'))
+VERIFICATION_MAX_ATTEMPTS = int(os.getenv('VERIFICATION_MAX_ATTEMPTS', '5'))
+VERIFICATION_BACKOFF_MS = float(os.getenv('VERIFICATION_BACKOFF_MS', '500'))
+VERIFICATION_BACKOFF_MAX_MS = float(os.getenv('VERIFICATION_BACKOFF_MAX_MS', '30000'))
+VERIFICATION_MAX_QUEUE = int(os.getenv('VERIFICATION_MAX_QUEUE', '100000'))
+VERIFICATION_DRAIN_TIMEOUT = float(os.getenv('VERIFICATION_DRAIN_TIMEOUT', '10'))
+
+logger = get_logger('verification_dispatch')
+
+
+class Message:
+    """One verification message: a URL for email, a code for SMS"""
+
+    __slots__ = ('channel', 'recipient', 'body', 'attempts', 'not_before', 'queued_at')
+
+    def __init__(self, channel, recipient, body):
+        self.channel = channel
+        self.recipient = recipient
+        self.body = body
+        self.attempts = 0
+        self.not_before = 0.0
+        self.queued_at = time.monotonic()
+
+    def __repr__(self):
+        return f'Message({self.channel!r}, {self.recipient!r})'
+
+
+class LogTransport:
+    """Log each message instead of calling a provider"""
+
+    # In production, replace with a SendGrid client for email (one request
+    # can carry many personalizations) and Twilio or Africa's Talking for SMS
+
+    def send_batch(self, channel, messages):
+        for message in messages:
+            if channel == 'email':
+                logger.info("📧 Verification email sent to %s", message.recipient)
+                logger.info("🔗 Verification URL: %s", message.body)
+            else:
+                logger.info("📱 Verification SMS sent to %s", message.recipient)
+                logger.info("🔢 Verification code: %s", message.body)
+
+
+class MemoryTransport:
+    """Record sent messages in memory; optionally slow down or fail sends"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = max(0.0, float(latency_ms)) / 1000.0
+        self.sent = defaultdict(list)  # channel -> [Message]
+        self.batches = defaultdict(int)
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1):
+        """Make the next `count` send_batch calls raise ConnectionError"""
+        with self._lock:
+            self._failures += count
+
+    def send_batch(self, channel, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._failures:
+                self._failures -= 1
+                raise ConnectionError(f'Simulated {channel} provider failure')
+            self.sent[channel].extend(messages)
+            self.batches[channel] += 1
+
+    def last(self, channel, recipient):
+        """Body of the latest message sent to recipient on channel, or None"""
+        with self._lock:
+            for message in reversed(self.sent[channel]):
+                if message.recipient == recipient:
+                    return message.body
+        return None
+
+    def clear(self):
+        with self._lock:
+            self.sent.clear()
+            self.batches.clear()
+            self._failures = 0
+
+
+TRANSPORTS = {'log': LogTransport, 'memory': MemoryTransport}
+
+
+def make_transport(name=VERIFICATION_TRANSPORT):
+    try:
+        return TRANSPORTS[name]()
+    except KeyError:
+        raise ValueError(f'Unknown VERIFICATION_TRANSPORT: {name}') from None
+
+
+class VerificationDispatcher:
+    """Queue verification messages and deliver them in per-channel batches"""
+
+    def __init__(self, transport=None, enabled=VERIFICATION_ASYNC, workers=VERIFICATION_WORKERS,
+                 batch_sizes=None, max_wait_ms=VERIFICATION_MAX_WAIT_MS, max_attempts=VERIFICATION_MAX_ATTEMPTS,
+                 backoff_ms=VERIFICATION_BACKOFF_MS, backoff_max_ms=VERIFICATION_BACKOFF_MAX_MS,
+                 max_queue=VERIFICATION_MAX_QUEUE):
+        self.transport = transport if transport is not None else make_transport()
+        self.enabled = enabled
+        self.workers = max(1, int(workers))
+        self.batch_sizes = batch_sizes or {'email': VERIFICATION_EMAIL_BATCH_SIZE, 'sms': VERIFICATION_SMS_BATCH_SIZE}
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff = max(0.0, float(backoff_ms)) / 1000.0
+        self.backoff_max = max(self.backoff, float(backoff_max_ms) / 1000.0)
+        self.max_queue = max(1, int(max_queue))
+
+        self._stopped = False
+        self._start()
+        if self.enabled:
+            atexit.register(self.close)
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _start(self):
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0  # queued, waiting to retry, batched or being sent; at most max_queue
+        self._counts = {channel: defaultdict(int) for channel in self.batch_sizes}
+        self._queues = {}
+        self._batches = queue.Queue()
+        self._collectors, self._senders = [], []
+        if not self.enabled:
+            return
+        # Unbounded queues: send() bounds the total through _pending, so puts never block
+        self._queues = {channel: queue.Queue() for channel in self.batch_sizes}
+        for channel in self.batch_sizes:
+            self._collectors.append(threading.Thread(target=self._collect_loop, args=(channel,),
+                                                     name=f'verification-{channel}', daemon=True))
+        for i in range(self.workers):
+            self._senders.append(threading.Thread(target=self._send_loop, name=f'verification-sender-{i}',
+                                                  daemon=True))
+        for thread in self._collectors + self._senders:
+            thread.start()
+
+    def _restart_after_fork(self):
+        """fork() doesn't copy the dispatcher threads; the child gets its own queues and workers.
+
+        Messages queued in the parent stay with the parent, which still sends them.
+        """
+        if not self._stopped:
+            self._start()
+
+    def send(self, channel, recipient, body):
+        """Queue one message (or send it now when disabled); returns False if it was dropped"""
+        if channel not in self.batch_sizes:
+            raise ValueError(f'Unknown verification channel: {channel}')
+        message = Message(channel, recipient, body)
+        if not self.enabled or self._stopped:
+            error = self._deliver(channel, [message])
+            if error is not None:
+                logger.error("❌ Sending verification %s to %s failed: %s", channel, recipient, error)
+                with self._lock:
+                    self._counts[channel]['failed'] += 1
+            return error is None
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._counts[channel]['rejected'] += 1
+                full = True
+            else:
+                self._pending += 1
+                self._counts[channel]['queued'] += 1
+                full = False
+        if full:
+            logger.error("❌ Verification queue full (%d messages), dropping %s to %s",
+                         self.max_queue, channel, recipient)
+            return False
+        self._queues[channel].put_nowait(message)
+        return True
+
+    def send_email(self, email, verification_url):
+        return self.send('email', email, verification_url)
+
+    def send_sms(self, phone_number, code):
+        return self.send('sms', phone_number, code)
+
+    def _collect_loop(self, channel):
+        """Gather ready messages into batches; park retries until their backoff ends"""
+        incoming = self._queues[channel]
+        batch_size = self.batch_sizes[channel]
+        delayed = []  # heap of (not_before, seq, message)
+        seq = 0
+        batch, deadline = [], None
+        while True:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now and len(batch) < batch_size:
+                batch.append(heapq.heappop(delayed)[2])
+                deadline = deadline or now + self.max_wait
+            if batch and (len(batch) >= batch_size or now >= deadline):
+                self._batches.put((channel, batch))
+                batch, deadline = [], None
+                continue
+
+            # Sleep until the batch deadline, the next retry, or a new message
+            wake = [t for t in (deadline, delayed[0][0] if delayed else None) if t is not None]
+            try:
+                message = incoming.get(timeout=max(0.0, min(wake) - now)) if wake else incoming.get()
+            except queue.Empty:
+                continue
+            if message is None:
+                if batch:
+                    self._batches.put((channel, batch))
+                # Retries still waiting are given up on at shutdown
+                for _, _, parked in delayed:
+                    self._give_up(parked, 'shutdown')
+                return
+            if message.not_before > time.monotonic():
+                seq += 1
+                heapq.heappush(delayed, (message.not_before, seq, message))
+                continue
+            batch.append(message)
+            deadline = deadline or time.monotonic() + self.max_wait
+
+    def _send_loop(self):
+        while True:
+            item = self._batches.get()
+            if item is None:
+                return
+            self._send_batch(*item)
+
+    def _deliver(self, channel, messages):
+        """One transport call; returns the exception or None"""
+        for message in messages:
+            message.attempts += 1
+        try:
+            self.transport.send_batch(channel, messages)
+        except Exception as e:
+            return e
+        with self._lock:
+            counts = self._counts[channel]
+            counts['sent'] += len(messages)
+            counts['batches'] += 1
+            counts['latency_ms_total'] += sum(time.monotonic() - m.queued_at for m in messages) * 1000
+        return None
+
+    def _send_batch(self, channel, messages):
+        error = self._deliver(channel, messages)
+        if error is None:
+            self._done(len(messages))
+            return
+        logger.warning("⚠️ Sending %d verification %s message(s) failed: %s", len(messages), channel, error)
+        retry = []
+        for message in messages:
+            if message.attempts >= self.max_attempts or self._stopped:
+                self._give_up(message, error)
+                continue
+            delay = min(self.backoff * 2 ** (message.attempts - 1), self.backoff_max)
+            message.not_before = time.monotonic() + delay * random.uniform(0.5, 1.0)
+            retry.append(message)
+        with self._lock:
+            self._counts[channel]['retried'] += len(retry)
+        for message in retry:
+            self._queues[channel].put(message)
+
+    def _give_up(self, message, reason):
+        logger.error("❌ Giving up on verification %s to %s after %d attempt(s): %s",
+                     message.channel, message.recipient, message.attempts, reason)
+        with self._lock:
+            self._counts[message.channel]['failed'] += 1
+        self._done(1)
+
+    def _done(self, count):
+        with self._lock:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def drain(self, timeout=None):
+        """Wait until every queued message is sent or given up; returns True if idle"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
+
+    def close(self, timeout=VERIFICATION_DRAIN_TIMEOUT):
+        """Send what is queued (waiting up to `timeout`), then stop the workers"""
+        if self._stopped or not self.enabled:
+            return
+        self.drain(timeout)
+        self._stopped = True
+        for channel_queue in self._queues.values():
+            channel_queue.put(None)
+        for thread in self._collectors:
+            thread.join()
+        # Collectors have handed over their last batches; now stop the senders
+        for _ in self._senders:
+            self._batches.put(None)
+        for thread in self._senders:
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            channels = {}
+            for channel, counts in self._counts.items():
+                sent = counts['sent']
+                channels[channel] = {
+                    'queued': counts['queued'],
+                    'sent': sent,
+                    'retried': counts['retried'],
+                    'failed': counts['failed'],
+                    'rejected': counts['rejected'],
+                    'batches': counts['batches'],
+                    'batch_size': self.batch_sizes[channel],
+                    'mean_batch_size': round(sent / counts['batches'], 2) if counts['batches'] else 0.0,
+                    'mean_delivery_ms': round(counts['latency_ms_total'] / sent, 3) if sent else 0.0,
+                }
+            return {
+                'async': self.enabled,
+                'transport': type(self.transport).__name__,
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_queue': self.max_queue,
+                'channels': channels
+            }